@@ -1,30 +1,47 @@
 import streamlit as st
 import pandas as pd
 import pickle
-from utils.code_executor import CodeExecutor
-from utils.problem_generator import ProblemGenerator
-from utils.difficulty_analyzer import DifficultyAnalyzer
-from utils.embeddings import EmbeddingsManager
+from utils import resources, tracing
 import time
+import uuid
 
 class AdaptiveInterviewApp:
     def __init__(self):
+        # Streamlit reruns this script on every interaction; heavy components are
+        # process-wide and built lazily, per-session state lives in st.session_state
         self.initialize_session_state()
-        self.code_executor = CodeExecutor()
-        self.problem_generator = ProblemGenerator()
-        self.difficulty_analyzer = DifficultyAnalyzer()
-        self.embeddings_manager = EmbeddingsManager()
+
+    @property
+    def service(self):
+        # Generation, grading and difficulty go through the service API: in-process
+        # by default, or a remote service when ADAPTIVE_SERVICE_URL is set
+        return resources.get_service()
 
     def initialize_session_state(self):
+        if 'user_id' not in st.session_state:
+            # Keep the user id in the URL so a reload (or another replica) resumes the session
+            st.session_state.user_id = st.query_params.get('user') or str(uuid.uuid4())
+            st.query_params['user'] = st.session_state.user_id
         if 'current_problem' not in st.session_state:
-            st.session_state.current_problem = None
-        if 'problems_history' not in st.session_state:
-            st.session_state.problems_history = []
+            # Also refreshes the service's tracks in case another replica served this user
+            saved_state = self.service.start_session(st.session_state.user_id)
+            st.session_state.current_problem = saved_state.get('current_problem')
+            st.session_state.difficulty_level = saved_state.get('difficulty_level') or 'medium'
+            st.session_state.start_time = saved_state.get('start_time')
         if 'difficulty_level' not in st.session_state:
             st.session_state.difficulty_level = 'medium'
         if 'start_time' not in st.session_state:
             st.session_state.start_time = None
 
+    def save_session_state(self):
+        current_problem = st.session_state.current_problem
+        self.service.save_user_state(
+            st.session_state.user_id,
+            current_problem['id'] if current_problem else None,
+            st.session_state.difficulty_level,
+            st.session_state.start_time
+        )
+
     def render_sidebar(self):
         with st.sidebar:
             st.title("Interview Preparation Settings")
@@ -41,13 +58,20 @@ class AdaptiveInterviewApp:
                 self.generate_new_problem(problem_type, company_name, job_description)
 
     def generate_new_problem(self, problem_type, company_name=None, job_description=None):
-        st.session_state.current_problem = self.problem_generator.generate_problem(
+        st.session_state.difficulty_level = self.service.get_difficulty(
+            st.session_state.user_id,
+            problem_type
+        )
+        st.session_state.current_problem = self.service.generate_problem(
             problem_type,
             st.session_state.difficulty_level,
             company_name,
-            job_description
+            job_description,
+            user_id=st.session_state.user_id
         )
         st.session_state.start_time = time.time()
+        self.service.save_problem(st.session_state.user_id, st.session_state.current_problem)
+        self.save_session_state()
 
     def render_problem_section(self):
         if st.session_state.current_problem:
@@ -77,9 +101,10 @@ class AdaptiveInterviewApp:
 
     def run_solution(self, user_code):
         execution_time = time.time() - st.session_state.start_time
-        result = self.code_executor.execute_code(
+        result = self.service.execute_code(
             user_code,
-            st.session_state.current_problem
+            st.session_state.current_problem,
+            user_id=st.session_state.user_id
         )
         
         if result['success']:
@@ -87,22 +112,38 @@ class AdaptiveInterviewApp:
             self.update_difficulty(True, execution_time)
         else:
             st.error(f"Test cases failed: {result['error']}")
+            self.update_difficulty(False, execution_time)
             if st.button("Show Edge Cases"):
                 st.code(st.session_state.current_problem['edge_cases'])
 
+        if result.get('query_stats') and 'efficiency' in result['query_stats']:
+            self.render_query_stats(result['query_stats'])
+
+    def render_query_stats(self, stats):
+        st.metric("Query Efficiency", f"{stats['efficiency']['score']}/100")
+        issues = (
+            [f"Correlated subquery: {detail}" for detail in stats['correlated_subqueries']]
+            + [f"Index not used: {detail}" for detail in stats['missing_index']]
+            + [f"Full table scan: {table}" for table in stats['full_scans']]
+            + [f"Temp B-tree for {purpose}" for purpose in stats['temp_btrees']]
+        )
+        for issue in issues:
+            st.caption(issue)
+        with st.expander("Query Plan"):
+            st.code("\n".join(stats['plan']))
+            st.write(f"{stats['elapsed_ms']:.1f} ms, {stats['vm_steps']:,} VM steps, {stats['result_rows']} rows")
+
     def update_difficulty(self, passed, execution_time):
         problem_stats = {
             'difficulty': st.session_state.difficulty_level,
             'passed': passed,
             'execution_time': execution_time,
-            'problem_id': st.session_state.current_problem['id']
+            'problem_id': st.session_state.current_problem['id'],
+            'type': st.session_state.current_problem['type']
         }
-        st.session_state.problems_history.append(problem_stats)
-        
-        new_difficulty = self.difficulty_analyzer.calculate_next_difficulty(
-            st.session_state.problems_history
-        )
-        st.session_state.difficulty_level = new_difficulty
+        result = self.service.record_attempt(st.session_state.user_id, problem_stats)
+        st.session_state.difficulty_level = result['difficulty_level']
+        self.save_session_state()
 
     def run(self):
         st.title("Adaptive Interview Preparation Platform")
@@ -111,12 +152,24 @@ class AdaptiveInterviewApp:
         self.render_problem_section()
         
         # Display performance analytics
-        if st.session_state.problems_history:
+        df = self.service.get_history_frame(st.session_state.user_id)
+        if not df.empty:
             st.subheader("Your Performance")
-            df = pd.DataFrame(st.session_state.problems_history)
             st.line_chart(df['execution_time'])
             st.write(f"Current Difficulty Level: {st.session_state.difficulty_level}")
 
+        if tracing.is_enabled():
+            self.render_performance_panel()
+
+    def render_performance_panel(self):
+        with st.expander("Performance"):
+            spans = tracing.summary()
+            if spans:
+                st.dataframe(pd.DataFrame(spans))
+            recent = tracing.recent_spans(20)
+            if recent:
+                st.dataframe(pd.DataFrame(recent)[['name', 'duration_ms', 'counts', 'error']])
+
 if __name__ == "__main__":
     app = AdaptiveInterviewApp()
     app.run()
@@ -0,0 +1,493 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from utils.llm import set_llm_backend
+from utils.simulator import PROBLEM_TYPES, TYPE_CONCEPTS, TITLE_WORDS
+from utils.sql_engines import available_engines
+
+DEFAULT_THRESHOLD = 0.5  # Fractional slowdown over baseline that counts as a regression; shared hosts drift by ~1.4x
+MIN_DELTA_MS = 1.0  # Smaller absolute differences are within run-to-run noise on a shared host
+DEFAULT_REPEATS = 15  # Samples per benchmark; compare() gates on their minimum
+GATED_TIMING = 'min_ms'  # Best-of is the most stable statistic under background load
+
+# Parameter grids; quick mode keeps the smaller values only
+SIZES = {
+    'dataset_rows': [1000, 10000, 100000],
+    'python_input': [100, 10000, 100000],
+    'bank_size': [1000, 10000, 50000],
+    'history_length': [10, 100, 1000, 10000],
+    'generated_rows': [100, 1000, 10000]
+}
+QUICK_SIZES = {name: values[:2] for name, values in SIZES.items()}
+
+PYTHON_SOLUTION = """
+def solve(values):
+    totals = {}
+    for value in values:
+        totals[value % 10] = totals.get(value % 10, 0) + value
+    return [[key, total] for key, total in sorted(totals.items())]
+"""
+
+SQL_SOLUTION = "SELECT category, COUNT(*) AS n, SUM(amount) AS total FROM sales GROUP BY category ORDER BY category"
+
+PANDAS_SOLUTION = """
+result = sales.groupby('category', as_index=False).agg(n=('amount', 'size'), total=('amount', 'sum'))
+"""
+
+
+class SizedStubLLM:
+    """Offline LLM stand-in returning CSV with a fixed number of rows, or JSON test cases."""
+
+    def __init__(self, rows: int, seed: int = 0):
+        self.rows = rows
+        self.rng = random.Random(seed)
+
+    def __call__(self, prompt: str) -> str:
+        if 'Create a test case' in prompt:
+            return json.dumps({'input': [self.rng.randint(0, 100)], 'expected_output': 0})
+        lines = ['id,category,amount']
+        lines.extend(
+            f"{i},{self.rng.choice('abcdefgh')},{self.rng.randint(1, 1000)}" for i in range(self.rows)
+        )
+        return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def _working_directory(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _measure(func, repeats: int, setup=None, min_sample_ms: float = 10.0) -> Dict[str, float]:
+    """
+    Time func() after one warm-up call and return per-call milliseconds over
+    repeats samples. Without setup, fast calls are looped (like timeit's
+    autorange) until each sample takes at least min_sample_ms, which keeps
+    sub-millisecond results stable. setup(), if given, runs untimed before
+    every call and disables looping.
+    """
+    if setup:
+        setup()
+    start = time.perf_counter()
+    func()
+    first_ms = (time.perf_counter() - start) * 1000
+    number = 1 if setup else max(1, int(min_sample_ms / max(first_ms, 1e-3)))
+
+    samples = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    samples = np.asarray(samples)
+    return {
+        'median_ms': float(np.median(samples)),
+        'min_ms': float(samples.min()),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'repeats': repeats,
+        'number': number
+    }
+
+
+def _calibration_ms(repeats: int = 7) -> float:
+    """
+    Best-of time of a fixed Python + numpy workload. compare() scales
+    baselines by the ratio of this figure so a slower or busier machine is
+    not reported as a regression.
+    """
+    matrix = np.random.default_rng(0).random((200, 200))
+
+    def workload():
+        total = 0
+        for i in range(200000):
+            total += i * i
+        for _ in range(10):
+            matrix @ matrix
+        return total
+
+    return _measure(workload, repeats)['min_ms']
+
+
+def _synthetic_problem(rng: random.Random, index: int) -> Dict[str, Any]:
+    problem_type = PROBLEM_TYPES[index % len(PROBLEM_TYPES)]
+    words = rng.sample(TITLE_WORDS, 3)
+    concepts = rng.sample(TYPE_CONCEPTS[problem_type], 3)
+    return {
+        'id': f"bench-{index}",
+        'type': problem_type,
+        'difficulty': rng.choice(['easy', 'medium', 'hard']),
+        'title': ' '.join(words).title() + f" {index}",
+        'description': f"Process {' and '.join(words)} records using {', '.join(concepts)} (variant {index}).",
+        'concepts_tested': concepts
+    }
+
+
+class BenchmarkSuite:
+    """
+    Offline benchmarks of CodeExecutor, EmbeddingsManager, DifficultyAnalyzer
+    and DataGenerator across input sizes. LLM calls go to a stub and all
+    files are written under a scratch directory.
+    """
+
+    def __init__(
+        self,
+        quick: bool = False,
+        repeats: int = DEFAULT_REPEATS,
+        seed: int = 0,
+        work_dir: Optional[str] = None
+    ):
+        self.quick = quick
+        self.sizes = QUICK_SIZES if quick else SIZES
+        self.repeats = repeats
+        self.seed = seed
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='adaptive_bench_')
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def _record(self, name: str, params: Dict[str, Any], timing: Dict[str, float]) -> None:
+        key = name + '[' + ','.join(f"{k}={v}" for k, v in params.items()) + ']'
+        self.results[key] = dict(timing, params=params)
+        print(f"  {key:55s} {timing['median_ms']:12.3f} ms", file=sys.stderr)
+
+    def run(self, only: Optional[List[str]] = None) -> Dict[str, Any]:
+        groups = {
+            'executor': self.bench_executor,
+            'embeddings': self.bench_embeddings,
+            'analyzer': self.bench_analyzer,
+            'data_generator': self.bench_data_generator
+        }
+        # Calibrate around each group so drift in machine speed during the
+        # run is attributed to the group it happened in
+        group_calibration = {}
+        calibration = _calibration_ms()
+        with _working_directory(self.work_dir):
+            for name, bench in groups.items():
+                if only and name not in only:
+                    continue
+                print(f"{name}:", file=sys.stderr)
+                bench()
+                after = _calibration_ms()
+                group_calibration[name] = (calibration + after) / 2
+                calibration = after
+        calibration = float(np.mean(list(group_calibration.values()))) if group_calibration else calibration
+        return {
+            'meta': {
+                'calibration_ms': calibration,
+                'group_calibration_ms': group_calibration,
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'cpu_count': os.cpu_count(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'quick': self.quick,
+                'repeats': self.repeats,
+                'seed': self.seed,
+                'gated_timing': GATED_TIMING
+            },
+            'results': self.results
+        }
+
+    def _write_sales(self, rows: int) -> Dict[str, str]:
+        """Write a sales table of the given size and the expected SQL/Pandas outputs."""
+        rng = np.random.default_rng(self.seed)
+        sales = pd.DataFrame({
+            'id': np.arange(rows),
+            'category': rng.choice(list('abcdefgh'), rows),
+            'amount': rng.integers(1, 1000, rows)
+        })
+        os.makedirs('bench_data', exist_ok=True)
+        files = {
+            'sales': f"bench_data/sales_{rows}.csv",
+            'sql_expected': f"bench_data/sales_{rows}_sql_expected.csv",
+            'pandas_expected': f"bench_data/sales_{rows}_pandas_expected.csv"
+        }
+        sales.to_csv(files['sales'], index=False)
+
+        conn = sqlite3.connect(':memory:')
+        sales.to_sql('sales', conn, index=False)
+        pd.read_sql_query(SQL_SOLUTION, conn).to_csv(files['sql_expected'], index=False)
+        conn.close()
+
+        namespace = {'pd': pd, 'sales': sales}
+        exec(PANDAS_SOLUTION, namespace)
+        namespace['result'].to_csv(files['pandas_expected'], index=False)
+        return files
+
+    def bench_executor(self) -> None:
+        from utils.code_executor import CodeExecutor
+        executor = CodeExecutor()
+
+        for size in self.sizes['python_input']:
+            values = list(range(size))
+            expected = [[r, sum(v for v in values if v % 10 == r)] for r in range(min(size, 10))]
+            problem = {
+                'type': 'Python',
+                'function_name': 'solve',
+                'test_cases': [{'input': [values], 'output': expected}]
+            }
+            result = executor.execute_python(PYTHON_SOLUTION, problem)
+            if not result['success']:
+                raise RuntimeError(f"Python benchmark solution failed: {result}")
+            self._record('executor.python', {'input': size},
+                         _measure(lambda: executor.execute_python(PYTHON_SOLUTION, problem), self.repeats))
+
+        for rows in self.sizes['dataset_rows']:
+            files = self._write_sales(rows)
+            sql_problem = {
+                'type': 'SQL',
+                'sample_data': [{'table_name': 'sales', 'file': files['sales']}],
+                'expected_output': files['sql_expected']
+            }
+            pandas_problem = {
+                'type': 'Pandas',
+                'sample_data': [{'variable_name': 'sales', 'file': files['sales']}],
+                'expected_output': files['pandas_expected']
+            }
+            for label, method, code, problem in (
+                ('executor.sql', executor.execute_sql, SQL_SOLUTION, sql_problem),
+                ('executor.pandas', executor.execute_pandas, PANDAS_SOLUTION, pandas_problem)
+            ):
+                result = method(code, problem)
+                if not result['success']:
+                    raise RuntimeError(f"{label} benchmark solution failed: {result.get('error')}")
+                self._record(label, {'rows': rows},
+                             _measure(lambda: method(code, problem), self.repeats))
+
+            # Pandas grading in forks of a pre-warmed per-problem template (needs a problem
+            # id), measured at every size regardless of the executor's size cutoff
+            if executor.snapshots is not None:
+                executor.snapshot_min_bytes = 0
+                problem = dict(pandas_problem, id=f"bench_pandas_{rows}")
+                result = executor.execute_pandas(PANDAS_SOLUTION, problem)
+                if not result['success']:
+                    raise RuntimeError(f"executor.pandas (snapshot) benchmark solution failed: {result.get('error')}")
+                self._record('executor.pandas', {'rows': rows, 'mode': 'snapshot'},
+                             _measure(lambda: executor.execute_pandas(PANDAS_SOLUTION, problem), self.repeats))
+
+            # Optional engines are benchmarked when installed, under their own keys
+            for engine in available_engines():
+                if engine == 'sqlite':
+                    continue
+                problem = dict(sql_problem, sql_engine=engine)
+                result = executor.execute_sql(SQL_SOLUTION, problem)
+                if not result['success']:
+                    raise RuntimeError(f"executor.sql ({engine}) benchmark solution failed: {result.get('error')}")
+                self._record('executor.sql', {'rows': rows, 'engine': engine},
+                             _measure(lambda: executor.execute_sql(SQL_SOLUTION, problem), self.repeats))
+
+        if executor.snapshots is not None:
+            executor.snapshots.close()
+
+    def bench_embeddings(self) -> None:
+        from utils.embeddings import EmbeddingsManager
+        rng = random.Random(self.seed)
+        for bank_size in self.sizes['bank_size']:
+            manager = EmbeddingsManager(data_dir=f"embeddings_{bank_size}")
+            problems = [_synthetic_problem(rng, i) for i in range(bank_size)]
+            start = time.perf_counter()
+            manager.add_problems(problems)
+            self._record('embeddings.add_problems', {'bank': bank_size}, {
+                'median_ms': (time.perf_counter() - start) * 1000, 'min_ms': None, 'p95_ms': None, 'repeats': 1
+            })
+
+            counter = itertools.count(bank_size)
+            self._record('embeddings.add_problem', {'bank': bank_size},
+                         _measure(lambda: manager.add_problem(_synthetic_problem(rng, next(counter))), self.repeats))
+
+            query_ids = [problems[rng.randrange(bank_size)]['id'] for _ in range(100)]
+            for exact in (False, True):
+                self._record(
+                    'embeddings.find_similar_problems',
+                    {'bank': bank_size, 'exact': exact, 'queries': len(query_ids)},
+                    _measure(lambda: [manager.find_similar_problems(pid, 5, exact=exact) for pid in query_ids],
+                             self.repeats)
+                )
+            manager.store.close()
+
+    def bench_analyzer(self) -> None:
+        from utils.difficulty_analyzer import DifficultyAnalyzer
+        rng = random.Random(self.seed)
+        analyzer = DifficultyAnalyzer()
+        for length in self.sizes['history_length']:
+            history = [
+                {
+                    'difficulty': rng.choice(['easy', 'medium', 'hard']),
+                    'passed': rng.random() < 0.6,
+                    'execution_time': rng.uniform(30, 2000),
+                    'problem_id': f"p{i}",
+                    'type': rng.choice(PROBLEM_TYPES)
+                }
+                for i in range(length)
+            ]
+            self._record('analyzer.calculate_next_difficulty', {'history': length},
+                         _measure(lambda: analyzer.calculate_next_difficulty(history), self.repeats))
+            self._record('analyzer.analyze_performance_patterns', {'history': length},
+                         _measure(lambda: analyzer.analyze_performance_patterns(history), self.repeats))
+
+            def replay():
+                for attempt in history:
+                    analyzer.record_attempt('bench-user', attempt['type'], attempt['difficulty'],
+                                            attempt['passed'], attempt['execution_time'])
+            self._record('analyzer.record_attempt_replay', {'history': length},
+                         _measure(replay, self.repeats, setup=lambda: analyzer.online_model.set_tracks('bench-user', {})))
+
+    def bench_data_generator(self) -> None:
+        from utils.data_generator import DataGenerator
+        generator = DataGenerator()
+        generator.ensure_directories(force=True)  # Relative to the scratch directory
+        specs = {
+            'SQL': {
+                'type': 'SQL',
+                'schema': [
+                    {'table_name': name, 'columns': ['id', 'category', 'amount'], 'sample_data_parameters': {}}
+                    for name in ('orders', 'customers')
+                ],
+                'task': 'Total amount per category'
+            },
+            'Pandas': {
+                'type': 'Pandas',
+                'datasets': [
+                    {'name': name, 'columns': ['id', 'category', 'amount'], 'generation_params': {}}
+                    for name in ('orders', 'customers')
+                ],
+                'tasks': ['Total amount per category']
+            },
+            'Python': {
+                'type': 'Python',
+                'test_cases': [{'input': [i], 'output': i} for i in range(50)],
+                'edge_cases': ['empty input', 'negative values']
+            }
+        }
+        for rows in self.sizes['generated_rows']:
+            set_llm_backend(SizedStubLLM(rows, self.seed))
+            for problem_type, spec in specs.items():
+                if problem_type == 'Python' and rows != self.sizes['generated_rows'][0]:
+                    continue  # Python data does not depend on the row count
+                self._record('data_generator.generate_problem_data',
+                             {'type': problem_type, 'rows': rows if problem_type != 'Python' else 0},
+                             _measure(lambda: generator.generate_problem_data(spec), self.repeats))
+        set_llm_backend(None)
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_ms: float = MIN_DELTA_MS,
+    normalize: bool = True
+) -> Dict[str, Any]:
+    """
+    Compare best-of (min_ms) timings with a baseline. A benchmark regresses
+    when it is more than threshold slower (and by more than min_delta_ms);
+    a baseline entry may set its own 'threshold'. Single-sample workloads
+    (no min_ms) are reported as ungated rather than compared. With
+    normalize, baseline timings are first scaled by the machines'
+    calibration ratio, per benchmark group where both runs recorded one.
+    """
+    report = {'regressions': [], 'improvements': [], 'unchanged': [], 'missing': [], 'new': [], 'ungated': []}
+    scale = 1.0
+    if normalize and current['meta'].get('calibration_ms') and baseline['meta'].get('calibration_ms'):
+        scale = current['meta']['calibration_ms'] / baseline['meta']['calibration_ms']
+    report['scale'] = scale
+    group_scales = {}
+    if normalize:
+        current_groups = current['meta'].get('group_calibration_ms', {})
+        for group, ms in baseline['meta'].get('group_calibration_ms', {}).items():
+            if ms and current_groups.get(group):
+                group_scales[group] = current_groups[group] / ms
+    current_results = current['results']
+    baseline_results = baseline['results']
+    for name, base in baseline_results.items():
+        if name not in current_results:
+            report['missing'].append({'name': name})
+            continue
+        if base.get(GATED_TIMING) is None or current_results[name].get(GATED_TIMING) is None:
+            report['ungated'].append({'name': name})
+            continue
+        group_scale = group_scales.get(name.split('.')[0], scale)
+        before, after = base[GATED_TIMING] * group_scale, current_results[name][GATED_TIMING]
+        ratio = after / before if before else float('inf')
+        limit = base.get('threshold', threshold)
+        entry = {'name': name, 'baseline_ms': before, 'current_ms': after, 'ratio': ratio}
+        if ratio > 1 + limit and after - before > min_delta_ms:
+            report['regressions'].append(entry)
+        elif ratio < 1 / (1 + limit) and before - after > min_delta_ms:
+            report['improvements'].append(entry)
+        else:
+            report['unchanged'].append(entry)
+    report['new'] = [{'name': name} for name in current_results if name not in baseline_results]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the utils modules")
+    parser.add_argument('--quick', action='store_true', help="Smaller size grid for fast checks")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='*', choices=['executor', 'embeddings', 'analyzer', 'data_generator'])
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Baseline results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS, help="Noise floor for regressions")
+    parser.add_argument('--no-normalize', action='store_true', help="Compare raw timings across machines")
+    parser.add_argument('--update-baseline', action='store_true', help="Write the results to --baseline")
+    args = parser.parse_args()
+
+    results = BenchmarkSuite(quick=args.quick, repeats=args.repeats, seed=args.seed).run(args.only)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        return
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    report = compare(results, baseline, args.threshold, args.min_delta_ms, normalize=not args.no_normalize)
+    if report['regressions']:
+        # A burst of host load can slow a whole group; only report regressions
+        # that show up again when their groups are measured a second time
+        groups = sorted({entry['name'].split('.')[0] for entry in report['regressions']})
+        print(f"Re-measuring {', '.join(groups)} to confirm regressions", file=sys.stderr)
+        rerun = BenchmarkSuite(quick=args.quick, repeats=args.repeats, seed=args.seed).run(groups)
+        rerun_report = compare(rerun, baseline, args.threshold, args.min_delta_ms, normalize=not args.no_normalize)
+        confirmed = {entry['name'] for entry in rerun_report['regressions']}
+        report['unchanged'].extend(entry for entry in report['regressions'] if entry['name'] not in confirmed)
+        report['regressions'] = [entry for entry in report['regressions'] if entry['name'] in confirmed]
+    print(f"Baseline timings scaled by x{report['scale']:.2f} for machine speed")
+    for label in ('regressions', 'improvements'):
+        for entry in report[label]:
+            print(f"{label[:-1].upper():12s} {entry['name']:55s} "
+                  f"{entry['baseline_ms']:10.3f} -> {entry['current_ms']:10.3f} ms (x{entry['ratio']:.2f})")
+    print(f"{len(report['regressions'])} regressions, {len(report['improvements'])} improvements, "
+          f"{len(report['unchanged'])} unchanged, {len(report['missing'])} missing, {len(report['new'])} new, "
+          f"{len(report['ungated'])} ungated")
+    if report['regressions']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
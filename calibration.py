@@ -0,0 +1,203 @@
+import json
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional
+
+DIFFICULTY_LEVELS = ['easy', 'medium', 'hard']
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class CalibrationResult:
+    """
+    Fitted user abilities and problem difficulties on a shared logit scale,
+    plus the difficulty-level cutoffs and time thresholds derived from them.
+    """
+
+    def __init__(
+        self,
+        user_ability: Dict[str, float],
+        problem_difficulty: Dict[str, float],
+        level_cutoffs: List[float],
+        time_weights: Dict[str, Dict[str, float]],
+        elo_k: float = 0.1
+    ):
+        self.user_ability = user_ability
+        self.problem_difficulty = problem_difficulty
+        self.level_cutoffs = level_cutoffs  # Upper bounds of 'easy' and 'medium'
+        self.time_weights = time_weights
+        self.elo_k = elo_k  # Step size for online updates between batch fits
+
+    def ability(self, user_id: str) -> float:
+        return self.user_ability.get(user_id, 0.0)
+
+    def problem_level(self, problem_id: str) -> Optional[str]:
+        """Calibrated difficulty level, or None for problems never attempted."""
+        if problem_id not in self.problem_difficulty:
+            return None
+        idx = int(np.searchsorted(self.level_cutoffs, self.problem_difficulty[problem_id], side='right'))
+        return DIFFICULTY_LEVELS[idx]
+
+    def problem_levels(self) -> Dict[str, str]:
+        """Calibrated difficulty level of every attempted problem."""
+        problem_ids = list(self.problem_difficulty)
+        idx = np.searchsorted(self.level_cutoffs, [self.problem_difficulty[pid] for pid in problem_ids], side='right')
+        return {pid: DIFFICULTY_LEVELS[i] for pid, i in zip(problem_ids, idx)}
+
+    def target_difficulty(self, user_id: str, target_success: float = 0.7) -> float:
+        """Problem difficulty at which this user's predicted success is target_success."""
+        return self.ability(user_id) - float(np.log(target_success / (1 - target_success)))
+
+    def success_probability(self, user_id: str, problem_id: str) -> float:
+        return float(_sigmoid(self.ability(user_id) - self.problem_difficulty.get(problem_id, 0.0)))
+
+    def update(self, user_id: str, problem_id: str, passed: bool) -> None:
+        """Elo-style online update of one user and problem after an attempt."""
+        surprise = float(passed) - self.success_probability(user_id, problem_id)
+        self.user_ability[user_id] = self.ability(user_id) + self.elo_k * surprise
+        self.problem_difficulty[problem_id] = self.problem_difficulty.get(problem_id, 0.0) - self.elo_k * surprise
+
+    def select_problem(
+        self,
+        user_id: str,
+        candidate_ids: List[str],
+        target_success: float = 0.7
+    ) -> Optional[str]:
+        """
+        Pick the candidate whose predicted success probability for this user is
+        closest to target_success. Uncalibrated candidates count as average.
+        """
+        if not candidate_ids:
+            return None
+        target_difficulty = self.target_difficulty(user_id, target_success)
+        difficulties = np.array([self.problem_difficulty.get(pid, 0.0) for pid in candidate_ids])
+        return candidate_ids[int(np.argmin(np.abs(difficulties - target_difficulty)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'user_ability': self.user_ability,
+            'problem_difficulty': self.problem_difficulty,
+            'level_cutoffs': self.level_cutoffs,
+            'time_weights': self.time_weights,
+            'elo_k': self.elo_k
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'CalibrationResult':
+        return cls(**state)
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> 'CalibrationResult':
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class IRTCalibrator:
+    """
+    Batch Rasch (1PL IRT) calibration: P(pass) = sigmoid(ability - difficulty).
+
+    Fitted by alternating diagonal Newton steps whose gradients and Hessians
+    are per-user / per-problem sums computed with np.bincount, so memory and
+    time are linear in the number of attempts.
+    """
+
+    def __init__(
+        self,
+        l2: float = 0.1,
+        max_iter: int = 100,
+        tol: float = 1e-5,
+        time_quantiles: tuple = (0.25, 0.75),
+        min_time_samples: int = 20
+    ):
+        self.l2 = l2  # Gaussian prior strength; keeps rarely-seen users/problems near 0
+        self.max_iter = max_iter
+        self.tol = tol
+        self.time_quantiles = time_quantiles  # Quantiles of passing times used as fast/slow
+        self.min_time_samples = min_time_samples
+
+    def fit(
+        self,
+        attempts: pd.DataFrame,
+        default_time_weights: Optional[Dict[str, Dict[str, float]]] = None
+    ) -> CalibrationResult:
+        """
+        Fit from an attempts table with user_id, problem_id and passed columns.
+        With difficulty and execution_time columns, level proportions and
+        fast/slow time thresholds are calibrated too.
+        """
+        user_idx, users = pd.factorize(attempts['user_id'])
+        problem_idx, problems = pd.factorize(attempts['problem_id'])
+        y = attempts['passed'].to_numpy(dtype=np.float64)
+        n_users, n_problems = len(users), len(problems)
+
+        theta = np.zeros(n_users)
+        b = np.zeros(n_problems)
+        for _ in range(self.max_iter):
+            residual, weight = self._residuals(theta, b, user_idx, problem_idx, y)
+            theta_step = (
+                (np.bincount(user_idx, weights=residual, minlength=n_users) - self.l2 * theta)
+                / (np.bincount(user_idx, weights=weight, minlength=n_users) + self.l2)
+            )
+            theta += theta_step
+
+            residual, weight = self._residuals(theta, b, user_idx, problem_idx, y)
+            b_step = (
+                (-np.bincount(problem_idx, weights=residual, minlength=n_problems) - self.l2 * b)
+                / (np.bincount(problem_idx, weights=weight, minlength=n_problems) + self.l2)
+            )
+            b += b_step
+
+            if max(np.abs(theta_step).max(initial=0), np.abs(b_step).max(initial=0)) < self.tol:
+                break
+
+        level_cutoffs = self._level_cutoffs(attempts, problem_idx, b)
+        levels = np.searchsorted(level_cutoffs, b, side='right')[problem_idx]
+        return CalibrationResult(
+            user_ability=dict(zip(users, theta.tolist())),
+            problem_difficulty=dict(zip(problems, b.tolist())),
+            level_cutoffs=level_cutoffs,
+            time_weights=self._time_weights(attempts, levels, y, default_time_weights)
+        )
+
+    def _residuals(self, theta, b, user_idx, problem_idx, y):
+        p = _sigmoid(theta[user_idx] - b[problem_idx])
+        return y - p, p * (1 - p)
+
+    def _level_cutoffs(self, attempts: pd.DataFrame, problem_idx: np.ndarray, b: np.ndarray) -> List[float]:
+        """
+        Cut the difficulty scale so each level keeps the share of problems it
+        had under the original labels (thirds if there are no labels).
+        """
+        shares = np.full(len(DIFFICULTY_LEVELS), 1.0 / len(DIFFICULTY_LEVELS))
+        if 'difficulty' in attempts:
+            labels = pd.Series(attempts['difficulty'].to_numpy()).groupby(problem_idx).first()
+            counts = labels.value_counts().reindex(DIFFICULTY_LEVELS, fill_value=0).to_numpy()
+            if counts.sum() > 0:
+                shares = counts / counts.sum()
+        return np.quantile(b, np.cumsum(shares)[:-1]).tolist()
+
+    def _time_weights(
+        self,
+        attempts: pd.DataFrame,
+        levels: np.ndarray,
+        y: np.ndarray,
+        default_time_weights: Optional[Dict[str, Dict[str, float]]]
+    ) -> Dict[str, Dict[str, float]]:
+        """Fast/slow thresholds per calibrated level from passing attempts' times."""
+        time_weights = {level: dict(w) for level, w in (default_time_weights or {}).items()}
+        if 'execution_time' not in attempts:
+            return time_weights
+        times = attempts['execution_time'].to_numpy(dtype=np.float64)
+        for idx, level in enumerate(DIFFICULTY_LEVELS):
+            level_times = times[(levels == idx) & (y == 1)]
+            if len(level_times) >= self.min_time_samples:
+                fast, slow = np.quantile(level_times, self.time_quantiles)
+                if slow > fast:
+                    time_weights[level] = {'fast': float(fast), 'slow': float(slow)}
+        return time_weights
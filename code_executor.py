@@ -1,31 +1,150 @@
 import sys
 import io
+import os
+import contextvars
 import pandas as pd
-import sqlite3
+import threading
 from contextlib import contextmanager, redirect_stdout
 import traceback
+from utils import sandbox, tracing
+from utils.sql_engines import SQL_ENGINES, efficiency_score, engine_for_problem
+
+_captured_stdout: contextvars.ContextVar = contextvars.ContextVar('captured_stdout', default=None)
+_proxy_lock = threading.Lock()
+
+
+class _StdoutProxy:
+    """
+    Installed once as sys.stdout: writes go to the current context's capture
+    buffer, if any, else to the real stream. Concurrent submissions each
+    capture their own prints without swapping sys.stdout under a lock.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def _target(self):
+        target = _captured_stdout.get()
+        return self._stream if target is None else target
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+def _install_stdout_proxy():
+    # Reinstalled if something else has replaced sys.stdout since
+    if isinstance(sys.stdout, _StdoutProxy):
+        return
+    with _proxy_lock:
+        if not isinstance(sys.stdout, _StdoutProxy):
+            sys.stdout = _StdoutProxy(sys.stdout)
+
+
+def _read_csv(path):
+    if tracing.is_enabled():
+        tracing.add('bytes_read', os.path.getsize(path))
+    return pd.read_csv(path)
+
+
+@contextmanager
+def _discard_output():
+    # Only for single-threaded sandbox children, which own their sys.stdout
+    with redirect_stdout(io.StringIO()) as new_out:
+        yield new_out
+
+
+def _prepare_pandas(problem_data):
+    """A Pandas problem's loaded datasets (by variable name) and expected output."""
+    sample_data = {}
+    with tracing.span('execute_pandas.load_data'):
+        for data_file in problem_data['sample_data']:
+            sample_data[data_file['variable_name']] = _read_csv(data_file['file'])
+    return {
+        'sample_data': sample_data,
+        'expected_output': problem_data['expected_output']
+    }
+
+
+def _grade_pandas(state, user_code, capture_output=_discard_output):
+    """Run a submission against prepared Pandas problem state and compare its result."""
+    # Create namespace with sample data
+    namespace = {'pd': pd, **state['sample_data']}
+    
+    # Execute user's code
+    with tracing.span('execute_pandas.exec'), capture_output():
+        exec(user_code, namespace)
+    
+    # Get the result variable
+    if 'result' not in namespace:
+        return {
+            'success': False,
+            'error': "Your code must create a 'result' variable with the final DataFrame"
+        }
+    
+    result_df = namespace['result']
+    expected_df = state.get('expected_df')
+    if expected_df is None:
+        expected_df = _read_csv(state['expected_output'])
+    
+    # Compare with expected output
+    if not result_df.equals(expected_df):
+        return {
+            'success': False,
+            'error': "Your result doesn't match the expected output"
+        }
+    
+    return {'success': True}
+
+
+def _prepare_pandas_snapshot(problem_data):
+    # Templates also hold the expected output, so runs read no files at all
+    state = _prepare_pandas(problem_data)
+    state['expected_df'] = _read_csv(state['expected_output'])
+    return state
+
 
 class CodeExecutor:
-    def __init__(self):
+    def __init__(self, snapshots=None):
         self.timeout = 10  # seconds
+        self.sql_engines = dict(SQL_ENGINES)  # Selected per problem by problem_data['sql_engine']
+        # Pandas runs fork from a pre-warmed template per problem where the
+        # platform allows; ADAPTIVE_SNAPSHOTS=0 (or snapshots=False) disables it
+        if snapshots is None:
+            snapshots = os.environ.get('ADAPTIVE_SNAPSHOTS', '1') != '0'
+        self.snapshots = sandbox.SnapshotPool(self.timeout) if snapshots and sandbox.supported() else None
+        # Below this much data, loading it is cheaper than a fork's page faults
+        self.snapshot_min_bytes = 512 * 1024
+
+    def register_sql_engine(self, name, engine_class):
+        self.sql_engines[name] = engine_class
 
     def execute_code(self, user_code, problem_data):
-        if problem_data['type'] == 'Python':
-            return self.execute_python(user_code, problem_data)
-        elif problem_data['type'] == 'SQL':
-            return self.execute_sql(user_code, problem_data)
-        else:  # Pandas
-            return self.execute_pandas(user_code, problem_data)
+        with tracing.span('execute_code', type=problem_data['type']) as span:
+            if problem_data['type'] == 'Python':
+                result = self.execute_python(user_code, problem_data)
+            elif problem_data['type'] == 'SQL':
+                result = self.execute_sql(user_code, problem_data)
+            else:  # Pandas
+                result = self.execute_pandas(user_code, problem_data)
+            span.set('success', result['success'])
+        return result
 
     @contextmanager
     def capture_output(self):
+        # Per-context buffer behind the stdout proxy; safe across concurrent sessions
+        _install_stdout_proxy()
         new_out = io.StringIO()
-        old_out = sys.stdout
+        token = _captured_stdout.set(new_out)
         try:
-            sys.stdout = new_out
-            yield sys.stdout
+            yield new_out
         finally:
-            sys.stdout = old_out
+            _captured_stdout.reset(token)
 
     def execute_python(self, user_code, problem_data):
         try:
@@ -33,7 +152,7 @@ class CodeExecutor:
             namespace = {}
             
             # Execute the user's code
-            with self.capture_output():
+            with tracing.span('execute_python.exec'), self.capture_output():
                 exec(user_code, namespace)
             
             # Run test cases
@@ -68,29 +187,39 @@ class CodeExecutor:
             }
 
     def execute_sql(self, user_code, problem_data):
+        engine_name = engine_for_problem(problem_data)
+        if engine_name not in self.sql_engines:
+            return {'success': False, 'error': f"Unknown SQL engine: {engine_name}"}
+        engine = None
         try:
-            # Create in-memory SQLite database
-            conn = sqlite3.connect(':memory:')
+            # Create an in-memory database for the problem's engine
+            engine = self.sql_engines[engine_name]()
             
-            # Load sample data from CSV
-            for table_info in problem_data['sample_data']:
-                df = pd.read_csv(table_info['file'])
-                df.to_sql(table_info['table_name'], conn, index=False)
+            # Load sample data from CSV/Parquet
+            with tracing.span('execute_sql.load_data', engine=engine_name):
+                if tracing.is_enabled():
+                    for table_info in problem_data['sample_data']:
+                        tracing.add('bytes_read', os.path.getsize(table_info['file']))
+                engine.load_tables(problem_data['sample_data'])
             
             # Execute user's query
-            result_df = pd.read_sql_query(user_code, conn)
+            with tracing.span('execute_sql.query', engine=engine_name):
+                result = engine.query(user_code)
+            
+            query_stats = self._query_stats(engine, user_code, problem_data)
             
             # Compare with expected output
-            expected_df = pd.read_csv(problem_data['expected_output'])
+            expected = engine.load_expected(problem_data['expected_output'])
             
             # Check if results match
-            if not result_df.equals(expected_df):
+            if not engine.results_match(result, expected):
                 return {
                     'success': False,
-                    'error': "Query result doesn't match expected output"
+                    'error': "Query result doesn't match expected output",
+                    'query_stats': query_stats
                 }
             
-            return {'success': True}
+            return {'success': True, 'query_stats': query_stats}
             
         except Exception as e:
             return {
@@ -99,41 +228,61 @@ class CodeExecutor:
                 'traceback': traceback.format_exc()
             }
         finally:
-            conn.close()
+            if engine is not None:
+                engine.close()
+
+    def _query_stats(self, engine, user_code, problem_data):
+        """
+        Plan and execution stats of the submission, with an efficiency score
+        against problem_data['reference_query'] when the problem has one.
+        Profiling problems never fail grading.
+        """
+        try:
+            with tracing.span('execute_sql.profile'):
+                stats = engine.profile(user_code)
+                if stats is None:
+                    return None
+                reference = None
+                if problem_data.get('reference_query'):
+                    reference = engine.profile(problem_data['reference_query'])
+                    stats['reference'] = reference
+                stats['efficiency'] = efficiency_score(stats, reference)
+                return stats
+        except Exception as e:
+            return {'error': str(e)}
+
+    def _snapshot_version(self, problem_data):
+        """
+        Modification times of the problem's data files, which identify the
+        data a template was loaded from, or None if the snapshot path
+        shouldn't be used for it.
+        """
+        if self.snapshots is None or not problem_data.get('id'):
+            return None
+        try:
+            paths = [data_file['file'] for data_file in problem_data['sample_data']]
+            stats = [os.stat(path) for path in paths + [problem_data['expected_output']]]
+        except (KeyError, OSError):
+            return None  # Let the in-process path report it
+        if sum(stat.st_size for stat in stats[:len(paths)]) < self.snapshot_min_bytes:
+            return None
+        return tuple(stat.st_mtime_ns for stat in stats)
 
     def execute_pandas(self, user_code, problem_data):
+        version = self._snapshot_version(problem_data)
+        if version is not None:
+            with tracing.span('execute_pandas.snapshot'):
+                result = self.snapshots.run(
+                    problem_data['id'], problem_data, user_code, _prepare_pandas_snapshot, _grade_pandas,
+                    version=version
+                )
+            if result is not None:
+                return result
+        
         try:
-            # Load the sample data
-            sample_data = {}
-            for data_file in problem_data['sample_data']:
-                df = pd.read_csv(data_file['file'])
-                sample_data[data_file['variable_name']] = df
-            
-            # Create namespace with sample data
-            namespace = {'pd': pd, **sample_data}
-            
-            # Execute user's code
-            with self.capture_output():
-                exec(user_code, namespace)
-            
-            # Get the result variable
-            if 'result' not in namespace:
-                return {
-                    'success': False,
-                    'error': "Your code must create a 'result' variable with the final DataFrame"
-                }
-            
-            result_df = namespace['result']
-            expected_df = pd.read_csv(problem_data['expected_output'])
-            
-            # Compare with expected output
-            if not result_df.equals(expected_df):
-                return {
-                    'success': False,
-                    'error': "Your result doesn't match the expected output"
-                }
-            
-            return {'success': True}
+            # Load the sample data, then run the submission in this process
+            state = _prepare_pandas(problem_data)
+            return _grade_pandas(state, user_code, self.capture_output)
             
         except Exception as e:
             return {
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional
+
+class CohortAnalytics:
+    """
+    Vectorized performance analytics over many users at once.
+
+    Works on a columnar attempts table with one row per attempt and columns
+    user_id, problem_id, type, difficulty, passed and execution_time (plus an
+    optional timestamp used for ordering). Rolling success rates, trend slopes
+    and difficulty distributions are computed for every user in a single pass
+    with grouped cumulative sums and closed-form least squares. Results match
+    DifficultyAnalyzer.analyze_performance_patterns, except that slopes lying
+    exactly on the trend threshold are classified by their exact value rather
+    than by np.polyfit's rounding.
+    """
+
+    def __init__(self, window_size: int = 3, min_trend_attempts: int = 5, trend_threshold: float = 0.1):
+        self.difficulty_levels = ['easy', 'medium', 'hard']
+        self.window_size = window_size
+        self.min_trend_attempts = min_trend_attempts
+        self.trend_threshold = trend_threshold
+
+    @staticmethod
+    def from_histories(histories: Dict[str, List[Dict[str, Any]]]) -> pd.DataFrame:
+        """Build an attempts table from {user_id: problems_history} lists."""
+        frames = [
+            pd.DataFrame(history).assign(user_id=user_id)
+            for user_id, history in histories.items() if history
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _sorted(self, attempts: pd.DataFrame) -> pd.DataFrame:
+        """Group rows by user (stable), ordering each user's attempts by timestamp if present."""
+        user_codes, _ = pd.factorize(attempts['user_id'], sort=True)
+        if 'timestamp' in attempts:
+            order = np.lexsort((attempts['timestamp'].to_numpy(), user_codes))
+        else:
+            order = np.argsort(user_codes, kind='stable')
+        return attempts.iloc[order].reset_index(drop=True)
+
+    def analyze(self, attempts: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Returns:
+            summary: one row per user with total_problems, success_rate,
+                average_time, trend_slope and performance_trend
+            difficulty_distribution: one row per (user, difficulty) with
+                count and success_rate
+            rolling: the sorted attempts table with a rolling_success_rate column
+        """
+        if attempts.empty:
+            return {
+                'summary': pd.DataFrame(),
+                'difficulty_distribution': pd.DataFrame(),
+                'rolling': attempts
+            }
+
+        attempts = self._sorted(attempts)
+        user_codes, users = pd.factorize(attempts['user_id'], sort=True)
+        n_users = len(users)
+        passed = attempts['passed'].to_numpy(dtype=np.float64)
+        times = attempts['execution_time'].to_numpy(dtype=np.float64)
+
+        counts = np.bincount(user_codes, minlength=n_users)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        position = np.arange(len(attempts)) - np.repeat(starts, counts)
+
+        rolling = self._rolling_success(passed, position)
+        slopes = self._trend_slopes(rolling, position, user_codes, n_users)
+
+        successes = np.bincount(user_codes, weights=passed, minlength=n_users)
+        total_time = np.bincount(user_codes, weights=times, minlength=n_users)
+        enough = counts >= self.min_trend_attempts
+        trend = np.full(n_users, 'stable', dtype=object)
+        trend[slopes > self.trend_threshold] = 'improving'
+        trend[slopes < -self.trend_threshold] = 'declining'
+        trend[~enough] = 'not_enough_data'
+
+        summary = pd.DataFrame({
+            'total_problems': counts,
+            'success_rate': successes / counts,
+            'average_time': total_time / counts,
+            'trend_slope': np.where(enough, slopes, np.nan),
+            'performance_trend': trend
+        }, index=pd.Index(users, name='user_id'))
+
+        return {
+            'summary': summary,
+            'difficulty_distribution': self._difficulty_distribution(
+                attempts['difficulty'], user_codes, users, passed
+            ),
+            'rolling': attempts.assign(rolling_success_rate=rolling)
+        }
+
+    def _rolling_success(self, passed: np.ndarray, position: np.ndarray) -> np.ndarray:
+        """Per-user trailing-window success rate; NaN until a user has a full window."""
+        w = self.window_size
+        cumulative = np.concatenate(([0.0], np.cumsum(passed)))
+        idx = np.arange(len(passed))
+        window_sums = cumulative[idx + 1] - cumulative[np.maximum(idx + 1 - w, 0)]
+        return np.where(position >= w - 1, window_sums / w, np.nan)
+
+    def _trend_slopes(
+        self,
+        rolling: np.ndarray,
+        position: np.ndarray,
+        user_codes: np.ndarray,
+        n_users: int
+    ) -> np.ndarray:
+        """Least-squares slope of each user's rolling success rates against window index."""
+        valid = ~np.isnan(rolling)
+        codes = user_codes[valid]
+        x = (position[valid] - (self.window_size - 1)).astype(np.float64)
+        y = rolling[valid]
+
+        n = np.bincount(codes, minlength=n_users).astype(np.float64)
+        sum_x = np.bincount(codes, weights=x, minlength=n_users)
+        sum_y = np.bincount(codes, weights=y, minlength=n_users)
+        sum_xx = np.bincount(codes, weights=x * x, minlength=n_users)
+        sum_xy = np.bincount(codes, weights=x * y, minlength=n_users)
+
+        denominator = n * sum_xx - sum_x ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = (n * sum_xy - sum_x * sum_y) / denominator
+        # Round away float noise so slopes sitting exactly on the threshold classify consistently
+        return np.where(denominator > 0, np.round(slopes, 12), 0.0)
+
+    def _difficulty_distribution(
+        self,
+        difficulties: pd.Series,
+        user_codes: np.ndarray,
+        users: pd.Index,
+        passed: np.ndarray
+    ) -> pd.DataFrame:
+        levels = pd.Categorical(difficulties, categories=self.difficulty_levels)
+        known = levels.codes >= 0
+        n_levels = len(self.difficulty_levels)
+        cells = user_codes[known] * n_levels + levels.codes[known]
+        size = len(users) * n_levels
+        counts = np.bincount(cells, minlength=size)
+        successes = np.bincount(cells, weights=passed[known], minlength=size)
+
+        present = np.flatnonzero(counts)
+        return pd.DataFrame({
+            'user_id': np.asarray(users)[present // n_levels],
+            'difficulty': np.asarray(self.difficulty_levels)[present % n_levels],
+            'count': counts[present],
+            'success_rate': successes[present] / counts[present]
+        })
+
+    def user_report(self, results: Dict[str, pd.DataFrame], user_id: str) -> Optional[Dict[str, Any]]:
+        """Reshape one user's rows into the analyze_performance_patterns dict format."""
+        summary = results['summary']
+        if user_id not in summary.index:
+            return None
+        row = summary.loc[user_id]
+        distribution = results['difficulty_distribution']
+        distribution = distribution[distribution['user_id'] == user_id]
+        return {
+            'total_problems': int(row['total_problems']),
+            'success_rate': float(row['success_rate']),
+            'average_time': float(row['average_time']),
+            'difficulty_distribution': {
+                record['difficulty']: {
+                    'count': int(record['count']),
+                    'success_rate': float(record['success_rate'])
+                }
+                for record in distribution.to_dict('records')
+            },
+            'performance_trend': row['performance_trend']
+        }
@@ -0,0 +1,106 @@
+import threading
+import numpy as np
+from typing import List, Dict, Iterable
+
+class ConceptVocabulary:
+    """Stable concept <-> integer id mapping shared by mastery and scoring arrays."""
+
+    def __init__(self):
+        self.concept_to_id: Dict[str, int] = {}
+        self.concepts: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.concepts)
+
+    def __contains__(self, concept: str) -> bool:
+        return concept in self.concept_to_id
+
+    def get_id(self, concept: str) -> int:
+        """Return the id for a concept, assigning a new one if needed."""
+        concept_id = self.concept_to_id.get(concept)
+        if concept_id is None:
+            with self._lock:
+                concept_id = self.concept_to_id.get(concept)
+                if concept_id is None:
+                    concept_id = len(self.concepts)
+                    self.concepts.append(concept)
+                    self.concept_to_id[concept] = concept_id
+        return concept_id
+
+    def get_ids(self, concepts: Iterable[str]) -> np.ndarray:
+        return np.array([self.get_id(c) for c in concepts], dtype=np.int64)
+
+
+class MasteryTracker:
+    """
+    Per-user concept attempt/success counters.
+
+    Recording an attempt touches only the problem's concept ids, and reading
+    mastery is a vector operation over the vocabulary, so neither depends on
+    how long the user's history is.
+    """
+
+    def __init__(self, vocabulary: ConceptVocabulary, min_attempts: int = 3):
+        self.vocabulary = vocabulary
+        self.min_attempts = min_attempts  # Attempts needed before mastery counts
+        self.attempts: Dict[str, np.ndarray] = {}
+        self.successes: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_user(self, user_id: str) -> None:
+        size = max(len(self.vocabulary), 1)
+        if user_id not in self.attempts:
+            self.attempts[user_id] = np.zeros(size, dtype=np.int32)
+            self.successes[user_id] = np.zeros(size, dtype=np.int32)
+        elif len(self.attempts[user_id]) < size:
+            # Grow geometrically so a burst of new concepts doesn't copy each time
+            new_size = max(size, 2 * len(self.attempts[user_id]))
+            for counters in (self.attempts, self.successes):
+                grown = np.zeros(new_size, dtype=np.int32)
+                grown[:len(counters[user_id])] = counters[user_id]
+                counters[user_id] = grown
+
+    def has_history(self, user_id: str) -> bool:
+        return user_id in self.attempts and bool(self.attempts[user_id].any())
+
+    def record(self, user_id: str, concept_ids: np.ndarray, passed: bool) -> None:
+        """Count one attempt at a problem testing the given concepts."""
+        if len(concept_ids) == 0:
+            return
+        with self._lock:
+            self._ensure_user(user_id)
+            np.add.at(self.attempts[user_id], concept_ids, 1)
+            if passed:
+                np.add.at(self.successes[user_id], concept_ids, 1)
+
+    def mastery(self, user_id: str) -> np.ndarray:
+        """
+        Mastery level (0.0 to 1.0) for every concept id. Concepts with fewer
+        than min_attempts attempts have mastery 0.0.
+        """
+        size = len(self.vocabulary)
+        if user_id not in self.attempts:
+            return np.zeros(size)
+        with self._lock:
+            self._ensure_user(user_id)
+            attempts = self.attempts[user_id][:size]
+            successes = self.successes[user_id][:size]
+        levels = np.zeros(size)
+        enough = attempts >= self.min_attempts
+        levels[enough] = successes[enough] / attempts[enough]
+        return levels
+
+    def attempted(self, user_id: str) -> np.ndarray:
+        """Boolean mask of concept ids the user has attempted at least once."""
+        size = len(self.vocabulary)
+        if user_id not in self.attempts:
+            return np.zeros(size, dtype=bool)
+        with self._lock:
+            self._ensure_user(user_id)
+            return self.attempts[user_id][:size] > 0
+
+    def reset(self, user_id: str) -> None:
+        with self._lock:
+            self.attempts.pop(user_id, None)
+            self.successes.pop(user_id, None)
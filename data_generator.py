@@ -4,14 +4,20 @@ from typing import Dict, Any, List
 import pandas as pd
 from datetime import datetime
 import uuid
+from templates.prompts.problem_templates import DATASET_GENERATION_TEMPLATE
+from utils.llm import llm_response
 
 class DataGenerator:
+    _directories_ready = False  # Directories only need creating once per process
+
     def __init__(self):
         self.data_dir = "data/generated"
         self.ensure_directories()
         
-    def ensure_directories(self):
+    def ensure_directories(self, force: bool = False):
         """Create necessary directories if they don't exist."""
+        if DataGenerator._directories_ready and not force:
+            return
         directories = [
             "data/generated/python",
             "data/generated/sql",
@@ -20,6 +26,7 @@ class DataGenerator:
         ]
         for directory in directories:
             os.makedirs(directory, exist_ok=True)
+        DataGenerator._directories_ready = True
 
     def generate_problem_data(self, problem_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Generate all necessary data for a problem."""
@@ -1,9 +1,97 @@
-from typing import List, Dict, Any
+import json
+import os
+import threading
+from typing import List, Dict, Any, Optional
 import numpy as np
 from collections import deque
 
+
+class OnlineDifficultyModel:
+    """
+    Constant-time difficulty model keyed by (user, problem type).
+
+    Each track keeps exponentially-weighted success and speed averages and a
+    continuous difficulty score in [0, 1]. An update touches only its own
+    track, never the history, and the whole state is JSON-serializable.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        learning_rate: float = 0.15,
+        target_performance: float = 0.6,
+        success_weight: float = 0.7,
+        initial_score: float = 0.5
+    ):
+        self.alpha = alpha  # EWMA weight of the newest attempt
+        self.learning_rate = learning_rate  # Max score change per attempt
+        self.target_performance = target_performance  # Performance the score steers towards
+        self.success_weight = success_weight  # Success vs speed in the performance blend
+        self.initial_score = initial_score
+        self.tracks: Dict[str, Dict[str, Dict[str, float]]] = {}  # user -> type -> track
+        self._lock = threading.Lock()
+
+    def _new_track(self) -> Dict[str, float]:
+        return {
+            'success': self.target_performance,
+            'speed': self.target_performance,
+            'score': self.initial_score,
+            'count': 0
+        }
+
+    def update(self, user_id: str, problem_type: str, passed: bool, time_score: float) -> float:
+        """Fold one attempt into the user's track and return the new score."""
+        with self._lock:
+            user_tracks = self.tracks.setdefault(user_id, {})
+            track = user_tracks.get(problem_type)
+            if track is None:
+                track = user_tracks[problem_type] = self._new_track()
+            track['success'] += self.alpha * (float(passed) - track['success'])
+            track['speed'] += self.alpha * (time_score - track['speed'])
+            performance = (
+                self.success_weight * track['success']
+                + (1 - self.success_weight) * track['speed']
+            )
+            score = track['score'] + self.learning_rate * (performance - self.target_performance)
+            track['score'] = min(1.0, max(0.0, score))
+            track['count'] += 1
+            return track['score']
+
+    def get_score(self, user_id: str, problem_type: str) -> float:
+        track = self.tracks.get(user_id, {}).get(problem_type)
+        return self.initial_score if track is None else track['score']
+
+    def get_tracks(self, user_id: str) -> Dict[str, Dict[str, float]]:
+        """Copy of one user's tracks keyed by problem type."""
+        with self._lock:
+            return {t: dict(track) for t, track in self.tracks.get(user_id, {}).items()}
+
+    def set_tracks(self, user_id: str, tracks: Dict[str, Dict[str, float]]) -> None:
+        """Restore one user's tracks, e.g. from a shared session store."""
+        with self._lock:
+            self.tracks[user_id] = {t: dict(track) for t, track in tracks.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'tracks': [
+                    {'user_id': user_id, 'problem_type': problem_type, **track}
+                    for user_id, user_tracks in self.tracks.items()
+                    for problem_type, track in user_tracks.items()
+                ]
+            }
+
+    def load_dict(self, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self.tracks = {}
+            for record in state.get('tracks', []):
+                record = dict(record)
+                user_tracks = self.tracks.setdefault(record.pop('user_id'), {})
+                user_tracks[record.pop('problem_type')] = record
+
+
 class DifficultyAnalyzer:
-    def __init__(self):
+    def __init__(self, state_file: Optional[str] = None):
         self.difficulty_levels = ['easy', 'medium', 'hard']
         self.window_size = 3  # Number of recent problems to consider
         self.performance_threshold = 0.7  # Success rate threshold for increasing difficulty
@@ -12,6 +100,71 @@ class DifficultyAnalyzer:
             'medium': {'fast': 300, 'slow': 600},
             'hard': {'fast': 900, 'slow': 1800}
         }
+        self.online_model = OnlineDifficultyModel()
+        self.calibration = None  # Optional CalibrationResult from utils.calibration
+        self.state_file = state_file
+        if state_file and os.path.exists(state_file):
+            self.load_state(state_file)
+
+    def record_attempt(
+        self,
+        user_id: str,
+        problem_type: str,
+        difficulty: str,
+        passed: bool,
+        execution_time: float,
+        problem_id: Optional[str] = None
+    ) -> float:
+        """
+        Update the online model for one attempt in O(1).
+        Returns the new continuous difficulty score for this problem type.
+        """
+        if problem_id is not None and self.calibration is not None:
+            difficulty = self.calibration.problem_level(problem_id) or difficulty
+            self.calibration.update(user_id, problem_id, passed)
+        return self.online_model.update(
+            user_id, problem_type, passed, self._time_score(difficulty, execution_time)
+        )
+
+    def apply_calibration(self, calibration) -> None:
+        """
+        Use fitted IRT parameters: calibrated levels replace the generated
+        difficulty labels of known problems and the fitted time thresholds
+        replace the defaults.
+        """
+        self.calibration = calibration
+        self.time_weights.update(calibration.time_weights)
+
+    def _problem_difficulty(self, problem: Dict[str, Any]) -> str:
+        """Calibrated level of an attempted problem, falling back to its label."""
+        if self.calibration is not None and 'problem_id' in problem:
+            return self.calibration.problem_level(problem['problem_id']) or problem['difficulty']
+        return problem['difficulty']
+
+    def get_difficulty_score(self, user_id: str, problem_type: str) -> float:
+        """Continuous difficulty in [0, 1] for the user's next problem of this type."""
+        return self.online_model.get_score(user_id, problem_type)
+
+    def get_difficulty(self, user_id: str, problem_type: str) -> str:
+        """Difficulty level for the user's next problem of this type."""
+        return self.score_to_level(self.get_difficulty_score(user_id, problem_type))
+
+    def score_to_level(self, score: float) -> str:
+        """Map a continuous difficulty score onto the discrete difficulty levels."""
+        idx = min(int(score * len(self.difficulty_levels)), len(self.difficulty_levels) - 1)
+        return self.difficulty_levels[idx]
+
+    def save_state(self, path: Optional[str] = None) -> None:
+        """Write the online model state to disk atomically."""
+        path = path or self.state_file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.online_model.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def load_state(self, path: Optional[str] = None) -> None:
+        with open(path or self.state_file) as f:
+            self.online_model.load_dict(json.load(f))
 
     def calculate_next_difficulty(self, problems_history: List[Dict[str, Any]]) -> str:
         """
@@ -52,30 +205,27 @@ class DifficultyAnalyzer:
         """
         Analyze if the user's solving time is fast or slow relative to expected times.
         """
-        time_scores = []
-        
-        for problem in problems:
-            difficulty = problem['difficulty']
-            time_taken = problem['execution_time']
-            
-            # Calculate normalized time score
-            fast_threshold = self.time_weights[difficulty]['fast']
-            slow_threshold = self.time_weights[difficulty]['slow']
-            
-            if time_taken <= fast_threshold:
-                score = 1.0
-            elif time_taken >= slow_threshold:
-                score = 0.0
-            else:
-                # Linear interpolation between fast and slow thresholds
-                score = 1.0 - (time_taken - fast_threshold) / (slow_threshold - fast_threshold)
-            
-            time_scores.append(score)
+        time_scores = [
+            self._time_score(self._problem_difficulty(problem), problem['execution_time'])
+            for problem in problems
+        ]
         
         # Average time score
-        avg_score = np.mean(time_scores)
+        avg_score = sum(time_scores) / len(time_scores)
         return 'fast' if avg_score >= 0.6 else 'slow'
 
+    def _time_score(self, difficulty: str, time_taken: float) -> float:
+        """Normalized time score: 1.0 at or below the fast threshold, 0.0 at or above slow."""
+        fast_threshold = self.time_weights[difficulty]['fast']
+        slow_threshold = self.time_weights[difficulty]['slow']
+        
+        if time_taken <= fast_threshold:
+            return 1.0
+        elif time_taken >= slow_threshold:
+            return 0.0
+        # Linear interpolation between fast and slow thresholds
+        return 1.0 - (time_taken - fast_threshold) / (slow_threshold - fast_threshold)
+
     def analyze_performance_patterns(self, problems_history: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Analyze patterns in user's problem-solving performance to provide insights.
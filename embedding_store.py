@@ -0,0 +1,214 @@
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from utils import tracing
+
+class EmbeddingStore:
+    """
+    Append-only persistent store for problem embeddings.
+
+    Vectors live in a flat float32 file that is memory-mapped for reads, and
+    problem metadata and payloads live in SQLite. Existing rows are never
+    rewritten. A row becomes visible only once its SQLite insert commits, and
+    writers serialise on SQLite's write lock (BEGIN IMMEDIATE), so several
+    processes can append safely.
+    """
+
+    def __init__(self, data_dir: str = 'data/embeddings', dim: int = 256):
+        self.data_dir = data_dir
+        self.dim = dim
+        self.vectors_file = os.path.join(data_dir, 'vectors.f32')
+        self.db_file = os.path.join(data_dir, 'metadata.db')
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._mmap_rows = 0
+
+        os.makedirs(data_dir, exist_ok=True)
+        self.conn = sqlite3.connect(
+            self.db_file,
+            timeout=30,
+            isolation_level=None,  # Explicit transactions only
+            check_same_thread=False
+        )
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS problems (
+                    row INTEGER PRIMARY KEY,
+                    problem_id TEXT UNIQUE NOT NULL,
+                    type TEXT,
+                    difficulty TEXT,
+                    concepts TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),)
+            )
+            stored_dim = int(self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'dim'"
+            ).fetchone()[0])
+        if stored_dim != self.dim:
+            raise ValueError(
+                f"Embedding store at {self.data_dir} has dimension {stored_dim}, expected {self.dim}"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+
+    def _next_row(self) -> int:
+        """
+        First row never handed out. The counter in meta keeps retired rows'
+        numbers from being reused, since readers sync by row; stores written
+        before it existed fall back to the highest row.
+        """
+        counter = self.conn.execute("SELECT value FROM meta WHERE key = 'next_row'").fetchone()
+        max_row = self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM problems").fetchone()[0]
+        return max(int(counter[0]) if counter else 0, max_row)
+
+    def _write_vectors(self, first_row: int, vectors: np.ndarray) -> None:
+        """Write contiguous rows at their offset in the vectors file."""
+        data = np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+        fd = os.open(self.vectors_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, data, first_row * self.dim * 4)
+            tracing.add('bytes_written', len(data))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append(
+        self,
+        problem_data: Dict[str, Any],
+        vector: np.ndarray,
+        concepts: List[str]
+    ) -> int:
+        """Append a single problem; returns its row."""
+        return self.append_batch([problem_data], np.atleast_2d(vector), [concepts])[0]
+
+    def append_batch(
+        self,
+        problems: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        concepts: List[List[str]]
+    ) -> List[int]:
+        """
+        Atomically append problems. Re-adding a known problem_id appends a
+        new row and retires the old one, so readers syncing by row see it.
+        """
+        if not problems:
+            return []
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape != (len(problems), self.dim):
+            raise ValueError(f"Expected vectors of shape ({len(problems)}, {self.dim})")
+
+        with tracing.span('embedding_store.append', rows=len(problems)), self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                next_row = self._next_row()
+                rows = list(range(next_row, next_row + len(problems)))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_row', ?)", (str(rows[-1] + 1),)
+                )
+
+                # Rows are invisible to readers until the insert below commits
+                self._write_vectors(next_row, vectors)
+
+                self.conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO problems (row, problem_id, type, difficulty, concepts, payload)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            row,
+                            problem['id'],
+                            problem.get('type'),
+                            problem.get('difficulty'),
+                            json.dumps(problem_concepts),
+                            json.dumps(problem, default=str)
+                        )
+                        for row, problem, problem_concepts in zip(rows, problems, concepts)
+                    ]
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return rows
+
+    def vectors(self) -> np.ndarray:
+        """Read-only memory map over every committed vector, indexed by row."""
+        with self._lock:
+            n_rows = self._next_row()
+        if n_rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self._mmap is None or n_rows != self._mmap_rows:
+            self._mmap = np.memmap(self.vectors_file, dtype=np.float32, mode='r', shape=(n_rows, self.dim))
+            self._mmap_rows = n_rows
+        return self._mmap
+
+    def iter_metadata(self, after_row: int = -1) -> List[Tuple[int, str, Optional[str], Optional[str], List[str]]]:
+        """
+        Return (row, problem_id, type, difficulty, concepts) for rows written
+        after the given row. Payloads are not loaded.
+        """
+        with self._lock:
+            records = self.conn.execute(
+                """
+                SELECT row, problem_id, type, difficulty, concepts
+                FROM problems WHERE row > ? ORDER BY row
+                """,
+                (after_row,)
+            ).fetchall()
+        return [(row, pid, ptype, diff, json.loads(concepts)) for row, pid, ptype, diff, concepts in records]
+
+    def get_problem(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        """Lazily load a single problem payload."""
+        with self._lock:
+            record = self.conn.execute(
+                "SELECT payload FROM problems WHERE problem_id = ?", (problem_id,)
+            ).fetchone()
+        return json.loads(record[0]) if record else None
+
+    def get_problems(self, problem_ids: List[str]) -> List[Dict[str, Any]]:
+        """Load several payloads, preserving the order of problem_ids."""
+        if not problem_ids:
+            return []
+        placeholders = ','.join('?' * len(problem_ids))
+        with self._lock:
+            records = self.conn.execute(
+                f"SELECT problem_id, payload FROM problems WHERE problem_id IN ({placeholders})",
+                problem_ids
+            ).fetchall()
+        payloads = {pid: json.loads(payload) for pid, payload in records}
+        return [payloads[pid] for pid in problem_ids if pid in payloads]
+
+    def retire(self, problem_ids: List[str]) -> int:
+        """
+        Drop problems from the store. Their vector rows become dead space;
+        other processes stop seeing them on their next start.
+        """
+        if not problem_ids:
+            return 0
+        placeholders = ','.join('?' * len(problem_ids))
+        with self._lock:
+            cursor = self.conn.execute(
+                f"DELETE FROM problems WHERE problem_id IN ({placeholders})", problem_ids
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
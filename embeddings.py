@@ -1,187 +1,284 @@
+import os
 import pickle
+import threading
 import numpy as np
 from typing import List, Dict, Any, Optional
-import os
+from utils import tracing
+from utils.concept_mastery import ConceptVocabulary, MasteryTracker
+from utils.embedding_store import EmbeddingStore
+from utils.prerequisite_graph import PrerequisiteGraph
+from utils.text_embeddings import ConceptCanonicalizer, TextEmbedder
+from utils.vector_index import LSHIndex
 
 class EmbeddingsManager:
-    def __init__(self):
-        self.embeddings_file = 'data/embeddings.pkl'
-        self.problems_embeddings = self._load_embeddings()
-
-    def _load_embeddings(self) -> Dict[str, Any]:
-        """Load embeddings from pickle file if it exists."""
-        if os.path.exists(self.embeddings_file):
-            with open(self.embeddings_file, 'rb') as f:
-                return pickle.load(f)
-        return {'problems': {}, 'vectors': {}}
-
-    def _save_embeddings(self) -> None:
-        """Save embeddings to pickle file."""
-        with open(self.embeddings_file, 'wb') as f:
-            pickle.dump(self.problems_embeddings, f)
+    def __init__(
+        self,
+        data_dir: str = 'data/embeddings',
+        vector_dim: int = 256,
+        n_probes: int = 2,
+        prerequisites_file: str = 'data/templates/concept_prerequisites.json'
+    ):
+        self.legacy_embeddings_file = 'data/embeddings.pkl'
+        self.vector_dim = vector_dim
+        self.store = EmbeddingStore(data_dir, vector_dim)
+        self.index = LSHIndex(vector_dim, n_probes=n_probes)
+        self.embedder = TextEmbedder(vector_dim)
+        self.canonicalizer = ConceptCanonicalizer()
+        self.problem_concepts: Dict[str, List[str]] = {}
+        self.problem_concept_ids: Dict[str, np.ndarray] = {}
+        self.problem_difficulties: Dict[str, Optional[str]] = {}
+        self.vocabulary = ConceptVocabulary()
+        self.mastery = MasteryTracker(self.vocabulary)
+        self.concept_problem_counts = np.zeros(0, dtype=np.int64)
+        self.prerequisite_graph = PrerequisiteGraph.load(prerequisites_file)
+        self.mastery_threshold = 0.6  # Minimum mastery for a prerequisite to count
+        self._last_row = -1
+        self._sync_lock = threading.Lock()
+
+        if len(self.store) == 0 and os.path.exists(self.legacy_embeddings_file):
+            self._import_legacy_pickle()
+        self.sync()
+
+    def sync(self) -> int:
+        """
+        Pull rows appended to the store since the last sync (including those
+        written by other processes) into the index. Returns rows added.
+        """
+        with self._sync_lock, tracing.span('embeddings.sync') as span:
+            records = self.store.iter_metadata(self._last_row)
+            span.set('rows', len(records))
+            if not records:
+                return 0
+            vectors = self.store.vectors()
+            rows = [record[0] for record in records]
+            self.index.add_batch(
+                [record[1] for record in records],
+                np.asarray(vectors[rows]),
+                [record[3] for record in records],
+                [record[2] for record in records]
+            )
+            for _, problem_id, _, difficulty, concepts in records:
+                self._set_problem_concepts(problem_id, concepts)
+                self.problem_difficulties[problem_id] = difficulty
+            self._last_row = rows[-1]
+            return len(records)
+
+    def _set_problem_concepts(self, problem_id: str, concepts: List[str]) -> None:
+        """Maintain the per-problem concept ids and the global concept set."""
+        previous = self.problem_concept_ids.get(problem_id)
+        concept_ids = self.vocabulary.get_ids(concepts)
+        if len(self.concept_problem_counts) < len(self.vocabulary):
+            grown = np.zeros(max(len(self.vocabulary), 2 * len(self.concept_problem_counts)), dtype=np.int64)
+            grown[:len(self.concept_problem_counts)] = self.concept_problem_counts
+            self.concept_problem_counts = grown
+        if previous is not None:
+            np.subtract.at(self.concept_problem_counts, previous, 1)
+        np.add.at(self.concept_problem_counts, concept_ids, 1)
+        self.problem_concepts[problem_id] = concepts
+        self.problem_concept_ids[problem_id] = concept_ids
+
+    def extract_concepts(self, problem_data: Dict[str, Any]) -> List[str]:
+        """
+        Canonical concepts for a problem: its concepts_tested if the generator
+        provided them, otherwise the known concepts mentioned in its text.
+        """
+        if problem_data.get('concepts_tested'):
+            return self.canonicalizer.canonicalize_all(problem_data['concepts_tested'])
+        text = f"{problem_data.get('title', '')} {problem_data.get('description', '')}"
+        return self.canonicalizer.extract(text)
+
+    def _import_legacy_pickle(self) -> None:
+        """One-off import of the old whole-file embeddings.pkl into the store."""
+        with open(self.legacy_embeddings_file, 'rb') as f:
+            legacy = pickle.load(f)
+        problems = []
+        for problem_id, data in legacy.get('vectors', {}).items():
+            problem = dict(legacy['problems'][problem_id])
+            problem.setdefault('concepts_tested', data['concepts'])
+            problems.append(problem)
+        self.add_problems(problems)
 
     def add_problem(self, problem_data: Dict[str, Any]) -> None:
         """
         Generate embedding for a new problem and add it to the database.
         """
-        # Create prompt for embedding
-        prompt = f"""
-        Generate an embedding descriptor for this problem:
-        Title: {problem_data['title']}
-        Description: {problem_data['description']}
-        Type: {problem_data['type']}
-        Difficulty: {problem_data['difficulty']}
-        
-        Return a comma-separated list of 10-15 key concepts and skills tested by this problem.
+        self.add_problems([problem_data])
+
+    def add_problems(self, problems: List[Dict[str, Any]]) -> None:
         """
+        Embed and store a batch of problems, e.g. when importing an existing
+        problem set. Runs locally without any LLM calls.
+        """
+        if not problems:
+            return
+        concepts = [self.extract_concepts(problem) for problem in problems]
+        vectors = self.embedder.embed_batch(problems, concepts)
         
-        # Get embedding concepts from LLM
-        concepts = llm_response(prompt).strip().split(',')
-        concepts = [c.strip().lower() for c in concepts]
-        
-        # Create simple one-hot encoding for concepts
-        all_concepts = set(concepts)
-        for problem_id in self.problems_embeddings['problems']:
-            all_concepts.update(self.problems_embeddings['vectors'][problem_id]['concepts'])
-        
-        vector = np.zeros(len(all_concepts))
-        concept_to_idx = {concept: idx for idx, concept in enumerate(all_concepts)}
-        
-        for concept in concepts:
-            vector[concept_to_idx[concept]] = 1
-        
-        # Store problem data and its vector
-        self.problems_embeddings['problems'][problem_data['id']] = problem_data
-        self.problems_embeddings['vectors'][problem_data['id']] = {
-            'vector': vector,
-            'concepts': concepts
-        }
-        
-        self._save_embeddings()
+        # Append to the persistent store, then pick it up in the index
+        self.store.append_batch(problems, vectors, concepts)
+        self.sync()
 
     def find_similar_problems(
         self,
         problem_id: str,
         n: int = 3,
-        difficulty_filter: Optional[str] = None
+        difficulty_filter: Optional[str] = None,
+        type_filter: Optional[str] = None,
+        exact: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Find n most similar problems to the given problem.
-        Optionally filter by difficulty level.
+        Optionally filter by difficulty level and problem type.
+        Uses the approximate index unless exact=True.
         """
-        if problem_id not in self.problems_embeddings['vectors']:
+        self.sync()
+        query_vector = self.index.get_vector(problem_id)
+        if query_vector is None:
             return []
         
-        query_vector = self.problems_embeddings['vectors'][problem_id]['vector']
-        similarities = {}
-        
-        for pid, data in self.problems_embeddings['vectors'].items():
-            if pid != problem_id:
-                if difficulty_filter and self.problems_embeddings['problems'][pid]['difficulty'] != difficulty_filter:
-                    continue
-                
-                # Calculate cosine similarity
-                similarity = np.dot(query_vector, data['vector']) / (
-                    np.linalg.norm(query_vector) * np.linalg.norm(data['vector'])
-                )
-                similarities[pid] = similarity
-        
-        # Get top n similar problems
-        similar_problem_ids = sorted(similarities.keys(), key=lambda x: similarities[x], reverse=True)[:n]
-        return [self.problems_embeddings['problems'][pid] for pid in similar_problem_ids]
+        search = self.index.search_exact if exact else self.index.search
+        matches = search(
+            query_vector,
+            n,
+            difficulty=difficulty_filter,
+            problem_type=type_filter,
+            exclude_id=problem_id
+        )
+        return self.store.get_problems([pid for pid, _ in matches])
+
+    def find_duplicate(self, problem_data: Dict[str, Any], threshold: float = 0.9) -> Optional[str]:
+        """
+        Admission check for a freshly generated problem: return the id of a
+        stored problem of the same type at least threshold-similar, if any.
+        """
+        self.sync()
+        vector = self.embedder.embed(problem_data, self.extract_concepts(problem_data))
+        matches = self.index.search(vector, 1, problem_type=problem_data.get('type'))
+        if matches and matches[0][1] >= threshold:
+            return matches[0][0]
+        return None
+
+    def find_near_duplicates(self, threshold: float = 0.9, block_size: int = 2048) -> List[List[str]]:
+        """
+        All-pairs near-duplicate detection over the whole bank. Similarities
+        are computed block by block, so memory stays at block_size**2 floats.
+        Returns clusters (oldest problem first) with more than one member.
+        """
+        self.sync()
+        rows = np.flatnonzero(self.index.alive[:self.index.size])
+        parent = np.arange(len(rows))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for start_i in range(0, len(rows), block_size):
+            block_i = self.index.vectors[rows[start_i:start_i + block_size]]
+            for start_j in range(start_i, len(rows), block_size):
+                block_j = self.index.vectors[rows[start_j:start_j + block_size]]
+                similarities = block_i @ block_j.T
+                if start_i == start_j:
+                    similarities = np.triu(similarities, k=1)
+                for i, j in zip(*np.nonzero(similarities >= threshold)):
+                    root_i, root_j = find(start_i + i), find(start_j + j)
+                    if root_i != root_j:
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        clusters: Dict[int, List[str]] = {}
+        for position, row in enumerate(rows):
+            clusters.setdefault(find(position), []).append(self.index.ids[row])
+        return [members for members in clusters.values() if len(members) > 1]
+
+    def merge_near_duplicates(self, threshold: float = 0.9, block_size: int = 2048) -> Dict[str, str]:
+        """
+        Keep the oldest problem of each near-duplicate cluster and retire the
+        rest. Returns a mapping of retired problem id -> kept problem id.
+        """
+        merged = {}
+        for members in self.find_near_duplicates(threshold, block_size):
+            for duplicate_id in members[1:]:
+                merged[duplicate_id] = members[0]
+        if not merged:
+            return merged
+
+        self.store.retire(list(merged))
+        with self._sync_lock:
+            for duplicate_id in merged:
+                self.index.remove(duplicate_id)
+                concept_ids = self.problem_concept_ids.pop(duplicate_id, None)
+                if concept_ids is not None:
+                    np.subtract.at(self.concept_problem_counts, concept_ids, 1)
+                self.problem_concepts.pop(duplicate_id, None)
+                self.problem_difficulties.pop(duplicate_id, None)
+        return merged
 
     def get_problem_concepts(self, problem_id: str) -> List[str]:
         """Get the concepts tested by a specific problem."""
-        if problem_id in self.problems_embeddings['vectors']:
-            return self.problems_embeddings['vectors'][problem_id]['concepts']
-        return []
+        return self.problem_concepts.get(problem_id, [])
 
-    def get_concept_coverage(self, user_history: List[Dict[str, Any]]) -> Dict[str, float]:
+    def record_attempt(self, user_id: str, problem_id: str, passed: bool) -> None:
+        """Update the user's concept mastery counters for one attempt."""
+        concept_ids = self.problem_concept_ids.get(problem_id)
+        if concept_ids is None:
+            self.sync()
+            concept_ids = self.problem_concept_ids.get(problem_id)
+        if concept_ids is not None:
+            self.mastery.record(user_id, concept_ids, passed)
+
+    def load_history(self, user_id: str, user_history: List[Dict[str, Any]]) -> None:
+        """Rebuild a user's mastery counters from a full history, e.g. after a restart."""
+        self.mastery.reset(user_id)
+        for problem in user_history:
+            self.record_attempt(user_id, problem['problem_id'], problem['passed'])
+
+    def get_concept_coverage(self, user_id: str) -> Dict[str, float]:
         """
         Analyze concept coverage based on user's problem-solving history.
-        Returns a dictionary of concepts and their mastery levels.
+        Returns a dictionary of attempted concepts and their mastery levels.
         """
-        concept_attempts = {}
-        concept_successes = {}
+        levels = self.mastery.mastery(user_id)
+        attempted = np.flatnonzero(self.mastery.attempted(user_id))
+        return {self.vocabulary.concepts[i]: float(levels[i]) for i in attempted}
 
-        for problem in user_history:
-            problem_id = problem['problem_id']
-            if problem_id in self.problems_embeddings['vectors']:
-                concepts = self.problems_embeddings['vectors'][problem_id]['concepts']
-                
-                for concept in concepts:
-                    concept_attempts[concept] = concept_attempts.get(concept, 0) + 1
-                    if problem['passed']:
-                        concept_successes[concept] = concept_successes.get(concept, 0) + 1
-
-        # Calculate mastery level for each concept
-        mastery_levels = {}
-        for concept in concept_attempts:
-            attempts = concept_attempts[concept]
-            successes = concept_successes.get(concept, 0)
-            
-            # Calculate mastery level (0.0 to 1.0)
-            if attempts >= 3:
-                mastery_levels[concept] = successes / attempts
-            else:
-                # Not enough attempts to determine mastery
-                mastery_levels[concept] = 0.0
-
-        return mastery_levels
-
-    def recommend_next_concepts(self, user_history: List[Dict[str, Any]], n: int = 3) -> List[str]:
+    def recommend_next_concepts(self, user_id: str, n: int = 3) -> List[str]:
         """
         Recommend next concepts for the user to practice based on their history.
         """
-        if not user_history:
+        if not self.mastery.has_history(user_id):
             return []
 
-        # Get current concept mastery levels
-        mastery_levels = self.get_concept_coverage(user_history)
-        
-        # Get all available concepts
-        all_concepts = set()
-        for data in self.problems_embeddings['vectors'].values():
-            all_concepts.update(data['concepts'])
-
-        # Score concepts based on learning value
-        concept_scores = {}
-        for concept in all_concepts:
-            current_mastery = mastery_levels.get(concept, 0.0)
-            
-            # Prioritize concepts with low mastery but not completely new
-            if current_mastery == 0.0:
-                score = 0.5  # Some priority for new concepts
-            else:
-                # Higher score for concepts that need improvement
-                score = 1.0 - current_mastery
-
-            # Adjust score based on concept prerequisites (if defined)
-            prerequisites_met = self._check_concept_prerequisites(concept, mastery_levels)
-            if not prerequisites_met:
-                score *= 0.5
-
-            concept_scores[concept] = score
-
-        # Return top N concepts
-        return sorted(concept_scores.keys(), key=lambda x: concept_scores[x], reverse=True)[:n]
-
-    def _check_concept_prerequisites(self, concept: str, mastery_levels: Dict[str, float]) -> bool:
-        """
-        Check if prerequisites for a concept are met.
-        This is a simplified version - in a real system, you'd want a proper prerequisite graph.
-        """
-        # Example prerequisite rules (could be made more sophisticated)
-        prerequisites = {
-            'dynamic_programming': ['recursion', 'arrays'],
-            'graph_traversal': ['arrays', 'recursion'],
-            'advanced_sql': ['basic_sql', 'joins'],
-            'window_functions': ['basic_sql', 'aggregations']
-        }
-
-        if concept in prerequisites:
-            required_concepts = prerequisites[concept]
-            for req_concept in required_concepts:
-                if mastery_levels.get(req_concept, 0.0) < 0.6:  # Minimum mastery threshold
-                    return False
-        return True
+        mastery_levels = self.mastery.mastery(user_id)
+        candidates = np.flatnonzero(self.concept_problem_counts[:len(mastery_levels)] > 0)
+        if len(candidates) == 0:
+            return []
+        current_mastery = mastery_levels[candidates]
+
+        # Some priority for new concepts, higher score for those needing improvement
+        scores = np.where(current_mastery == 0.0, 0.5, 1.0 - current_mastery)
+
+        # Adjust score based on concept prerequisites
+        unmet = self._unmet_prerequisites(mastery_levels)
+        scores[unmet[candidates]] *= 0.5
+
+        k = min(n, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [self.vocabulary.concepts[i] for i in candidates[top]]
+
+    def _unmet_prerequisites(self, mastery_levels: np.ndarray) -> np.ndarray:
+        """Boolean mask over concept ids with any transitive prerequisite not yet mastered."""
+        mastered = mastery_levels >= self.mastery_threshold
+        return self.prerequisite_graph.unmet_mask(self.vocabulary, mastered)
+
+    def extend_prerequisites_from_bank(self, min_support: int = 5, min_confidence: float = 0.6) -> List[tuple]:
+        """Add prerequisite edges inferred from concept co-occurrence in the stored problems."""
+        self.sync()
+        problem_ids = list(self.problem_concepts)
+        return self.prerequisite_graph.extend_from_cooccurrence(
+            [self.problem_concepts[pid] for pid in problem_ids],
+            [self.problem_difficulties.get(pid) for pid in problem_ids],
+            min_support=min_support,
+            min_confidence=min_confidence
+        )
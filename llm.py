@@ -0,0 +1,38 @@
+from typing import Callable, Optional
+from utils import tracing
+
+_backend: Optional[Callable[[str], str]] = None
+_scheduler = None
+
+
+def set_llm_backend(backend: Optional[Callable[[str], str]]) -> None:
+    """
+    Register the function used for all LLM calls. It takes a prompt string and
+    returns the completion text. Pass None to unset it.
+    """
+    global _backend
+    _backend = backend
+
+
+def set_llm_scheduler(scheduler) -> None:
+    """
+    Route LLM calls through a FairScheduler, attributed to the caller's
+    request_context(). Pass None to call the backend directly.
+    """
+    global _scheduler
+    _scheduler = scheduler
+
+
+def llm_response(prompt: str) -> str:
+    """Send a prompt to the configured LLM backend and return its response text."""
+    if _backend is None:
+        raise RuntimeError("No LLM backend configured; call utils.llm.set_llm_backend() first")
+    with tracing.span('llm') as span:
+        # Token counts are estimated at ~4 characters per token
+        span.add('prompt_tokens', len(prompt) // 4)
+        if _scheduler is not None:
+            response = _scheduler.run(_backend, prompt)
+        else:
+            response = _backend(prompt)
+        span.add('completion_tokens', len(response) // 4)
+    return response
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Set, Tuple
+from utils import tracing
+from utils.concept_mastery import ConceptVocabulary
+
+# Used when no prerequisites file is available
+DEFAULT_PREREQUISITES = {
+    'dynamic_programming': ['recursion', 'arrays'],
+    'graph_traversal': ['arrays', 'recursion'],
+    'advanced_sql': ['basic_sql', 'joins'],
+    'window_functions': ['basic_sql', 'aggregations']
+}
+
+DIFFICULTY_RANKS = {'easy': 0, 'medium': 1, 'hard': 2}
+
+
+class PrerequisiteCycleError(ValueError):
+    """Raised when prerequisite rules contain a cycle."""
+
+
+class PrerequisiteGraph:
+    """
+    Prerequisite DAG over concepts.
+
+    compile() precomputes, for the concepts that have prerequisites, the
+    vocabulary ids of all their transitive prerequisites as one flat
+    (CSR-style) array, so readiness of the whole vocabulary is a gather and
+    a segmented reduction. Concepts outside the graph need no entries, so
+    vocabulary growth doesn't invalidate it.
+    """
+
+    def __init__(self, prerequisites: Optional[Dict[str, List[str]]] = None):
+        self.edges: Dict[str, Set[str]] = {}
+        self.version = 0
+        self._compiled_key: Optional[Tuple[int, int]] = None
+        self._closure: Tuple[np.ndarray, np.ndarray, np.ndarray] = (
+            np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        )
+        self._lock = threading.Lock()
+        for concept, required in (prerequisites or {}).items():
+            self.edges.setdefault(concept, set()).update(required)
+        self.topological_layers()  # Fail fast on cyclic input
+
+    @classmethod
+    def load(cls, path: str = 'data/templates/concept_prerequisites.json') -> 'PrerequisiteGraph':
+        """Load {concept: [prerequisites]} from a JSON file, falling back to the defaults."""
+        if os.path.exists(path):
+            with open(path) as f:
+                return cls(json.load(f))
+        return cls(DEFAULT_PREREQUISITES)
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump({c: sorted(r) for c, r in sorted(self.edges.items())}, f, indent=4)
+
+    def concepts(self) -> Set[str]:
+        nodes = set(self.edges)
+        for required in self.edges.values():
+            nodes.update(required)
+        return nodes
+
+    def _depends_on(self, concept: str, target: str) -> bool:
+        """True if target is a (transitive) prerequisite of concept."""
+        stack, seen = [concept], set()
+        while stack:
+            node = stack.pop()
+            for required in self.edges.get(node, ()):
+                if required == target:
+                    return True
+                if required not in seen:
+                    seen.add(required)
+                    stack.append(required)
+        return False
+
+    def add_prerequisite(self, concept: str, required: str) -> bool:
+        """Add an edge unless it would create a cycle. Returns whether it was added."""
+        with self._lock:
+            if concept == required or self._depends_on(required, concept):
+                return False
+            if required not in self.edges.get(concept, ()):
+                self.edges.setdefault(concept, set()).add(required)
+                self.version += 1
+            return True
+
+    def topological_layers(self) -> List[List[str]]:
+        """
+        Group concepts into layers where each concept's prerequisites all sit
+        in earlier layers (Kahn's algorithm). Raises on cycles.
+        """
+        nodes = self.concepts()
+        remaining = {node: len(self.edges.get(node, ())) for node in nodes}
+        dependents: Dict[str, List[str]] = {}
+        for concept, required in self.edges.items():
+            for r in required:
+                dependents.setdefault(r, []).append(concept)
+
+        layers = []
+        layer = sorted(node for node, count in remaining.items() if count == 0)
+        while layer:
+            layers.append(layer)
+            next_layer = []
+            for node in layer:
+                for dependent in dependents.get(node, ()):
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        next_layer.append(dependent)
+            layer = sorted(next_layer)
+
+        placed = sum(len(layer) for layer in layers)
+        if placed != len(nodes):
+            cyclic = sorted(node for node, count in remaining.items() if count > 0)
+            raise PrerequisiteCycleError(f"Prerequisite cycle among: {', '.join(cyclic)}")
+        return layers
+
+    def compile(self, vocabulary: ConceptVocabulary) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return (owners, offsets, prerequisite_ids): owners[k] is the id of the
+        k-th concept with prerequisites, and prerequisite_ids[offsets[k]:
+        offsets[k + 1]] the ids of all its transitive prerequisites.
+        Recomputed only when the graph changed or for another vocabulary.
+        """
+        with self._lock:
+            key = (self.version, id(vocabulary))
+            if key == self._compiled_key:
+                tracing.add('closure_cache_hits')
+                return self._closure
+            tracing.add('closure_cache_misses')
+
+            closure: Dict[str, Set[str]] = {}
+            for layer in self.topological_layers():
+                for concept in layer:
+                    required = self.edges.get(concept, set())
+                    closure[concept] = set(required).union(*(closure[r] for r in required))
+
+            owners, offsets, prerequisite_ids = [], [0], []
+            for concept in sorted(closure):
+                if closure[concept]:
+                    owners.append(vocabulary.get_ids([concept])[0])
+                    prerequisite_ids.extend(vocabulary.get_ids(sorted(closure[concept])))
+                    offsets.append(len(prerequisite_ids))
+
+            self._closure = (
+                np.asarray(owners, dtype=np.int64),
+                np.asarray(offsets, dtype=np.int64),
+                np.asarray(prerequisite_ids, dtype=np.int64)
+            )
+            self._compiled_key = key
+            return self._closure
+
+    def unmet_mask(self, vocabulary: ConceptVocabulary, mastered: np.ndarray) -> np.ndarray:
+        """
+        Boolean mask over concept ids that have at least one transitive
+        prerequisite not in the mastered mask.
+        """
+        owners, offsets, prerequisite_ids = self.compile(vocabulary)
+        n = len(vocabulary)
+        unmet = np.zeros(n, dtype=bool)
+        if len(owners) == 0:
+            return unmet
+        mastered_full = np.zeros(n, dtype=bool)
+        mastered_full[:min(n, len(mastered))] = mastered[:n]
+        missing = ~mastered_full[prerequisite_ids]
+        unmet[owners] = np.logical_or.reduceat(missing, offsets[:-1])
+        return unmet
+
+    def extend_from_cooccurrence(
+        self,
+        problem_concepts: List[List[str]],
+        difficulties: List[Optional[str]],
+        min_support: int = 5,
+        min_confidence: float = 0.6,
+        min_difficulty_gap: float = 0.5
+    ) -> List[Tuple[str, str]]:
+        """
+        Infer edges from the problem bank: concept A becomes a prerequisite of
+        B when A appears in most problems testing B (confidence), the pair
+        occurs often enough (support), and problems with A are easier on
+        average than problems with B. Edges that would form cycles are skipped.
+        Returns the edges added.
+        """
+        vocabulary = ConceptVocabulary()
+        concept_ids, ranks, first, second = [], [], [], []
+        for concepts, difficulty in zip(problem_concepts, difficulties):
+            ids = sorted(set(vocabulary.get_ids(concepts)))
+            concept_ids.extend(ids)
+            ranks.extend([DIFFICULTY_RANKS.get(difficulty, 1)] * len(ids))
+            # Ordered pairs of distinct concepts tested together
+            for a in ids:
+                for b in ids:
+                    if a != b:
+                        first.append(a)
+                        second.append(b)
+        if not first:
+            return []
+
+        n = len(vocabulary)
+        counts = np.bincount(concept_ids, minlength=n)
+        mean_rank = np.bincount(concept_ids, weights=ranks, minlength=n) / np.maximum(counts, 1)
+
+        # Sparse co-occurrence: only pairs that actually occur, never n x n
+        pair_codes, pair_counts = np.unique(
+            np.asarray(first, dtype=np.int64) * n + np.asarray(second, dtype=np.int64), return_counts=True
+        )
+        required_ids, concept_ids = np.divmod(pair_codes, n)
+
+        # confidence = P(problem tests required | problem tests concept)
+        confidence = pair_counts / np.maximum(counts[concept_ids], 1)
+        keep = (
+            (pair_counts >= min_support)
+            & (confidence >= min_confidence)
+            & (mean_rank[concept_ids] - mean_rank[required_ids] >= min_difficulty_gap)
+        )
+        required_ids, concept_ids, confidence = required_ids[keep], concept_ids[keep], confidence[keep]
+
+        added = []
+        order = np.argsort(-confidence, kind='stable')
+        for i in order:
+            required = vocabulary.concepts[required_ids[i]]
+            concept = vocabulary.concepts[concept_ids[i]]
+            already = required in self.edges.get(concept, ())
+            if not already and self.add_prerequisite(concept, required):
+                added.append((concept, required))
+        return added
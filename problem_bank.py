@@ -0,0 +1,391 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+
+def _artifact_paths(problem_data: Dict[str, Any]) -> List[str]:
+    """Data files a problem depends on (sample datasets and expected output)."""
+    paths = [dataset['file'] for dataset in problem_data.get('sample_data', []) if dataset.get('file')]
+    if problem_data.get('expected_output'):
+        paths.append(problem_data['expected_output'])
+    return paths
+
+
+class ProblemBank:
+    """
+    Shared, persistent catalogue of generated problems in SQLite (WAL mode,
+    safe across app processes). Problems are indexed by type, difficulty,
+    concepts and company, with FTS5 full-text search over their text (LIKE
+    matching where SQLite lacks FTS5). It also keeps per-problem performance,
+    which problems each user has been served, and reference counts of the
+    data files problems share.
+    """
+
+    def __init__(self, db_file: str = 'data/problem_bank.db'):
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+        self.has_fts = self._create_fts()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS problems (
+                    problem_id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    company TEXT,
+                    title TEXT,
+                    description TEXT,
+                    concepts TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    retired INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_problems_lookup ON problems (type, difficulty, retired);
+                CREATE INDEX IF NOT EXISTS idx_problems_company ON problems (company);
+
+                CREATE TABLE IF NOT EXISTS problem_concepts (
+                    problem_id TEXT NOT NULL,
+                    concept TEXT NOT NULL,
+                    PRIMARY KEY (problem_id, concept)
+                );
+                CREATE INDEX IF NOT EXISTS idx_problem_concepts_concept ON problem_concepts (concept);
+
+                CREATE TABLE IF NOT EXISTS problem_stats (
+                    problem_id TEXT PRIMARY KEY,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    passes INTEGER NOT NULL DEFAULT 0,
+                    total_time REAL NOT NULL DEFAULT 0,
+                    served INTEGER NOT NULL DEFAULT 0,
+                    calibrated_difficulty REAL,
+                    calibrated_level TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS user_seen (
+                    user_id TEXT NOT NULL,
+                    problem_id TEXT NOT NULL,
+                    served_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, problem_id)
+                );
+
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    path TEXT PRIMARY KEY,
+                    refcount INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS problem_artifacts (
+                    problem_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (problem_id, path)
+                );
+            """)
+            # Banks created before calibration was stored
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(problem_stats)")}
+            if 'calibrated_difficulty' not in columns:
+                self.conn.execute("ALTER TABLE problem_stats ADD COLUMN calibrated_difficulty REAL")
+                self.conn.execute("ALTER TABLE problem_stats ADD COLUMN calibrated_level TEXT")
+
+    def _create_fts(self) -> bool:
+        with self._lock:
+            try:
+                self.conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS problems_fts
+                    USING fts5(problem_id UNINDEXED, title, description, concepts, company)
+                """)
+                return True
+            except sqlite3.OperationalError:  # SQLite built without FTS5
+                return False
+
+    def add_problem(
+        self,
+        problem_data: Dict[str, Any],
+        concepts: Optional[List[str]] = None,
+        company: Optional[str] = None
+    ) -> None:
+        """
+        Store (or replace) a problem with its canonical concepts and the
+        company it was generated for, taking a reference on its data files.
+        """
+        problem_id = problem_data['id']
+        concepts = concepts if concepts is not None else problem_data.get('concepts_tested', [])
+        company = company or problem_data.get('company')
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                if self.conn.execute("SELECT 1 FROM problems WHERE problem_id = ?", (problem_id,)).fetchone():
+                    self._drop_problem(problem_id)
+                self.conn.execute(
+                    """
+                    INSERT INTO problems
+                        (problem_id, type, difficulty, company, title, description, concepts, payload, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        problem_id,
+                        problem_data['type'],
+                        problem_data['difficulty'],
+                        company,
+                        problem_data.get('title'),
+                        problem_data.get('description'),
+                        json.dumps(concepts),
+                        json.dumps(problem_data, default=str),
+                        time.time()
+                    )
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO problem_concepts (problem_id, concept) VALUES (?, ?)",
+                    [(problem_id, concept) for concept in concepts]
+                )
+                self.conn.execute("INSERT OR IGNORE INTO problem_stats (problem_id) VALUES (?)", (problem_id,))
+                if self.has_fts:
+                    self.conn.execute(
+                        "INSERT INTO problems_fts (problem_id, title, description, concepts, company) VALUES (?, ?, ?, ?, ?)",
+                        (problem_id, problem_data.get('title'), problem_data.get('description'),
+                         ' '.join(concepts), company)
+                    )
+                for path in _artifact_paths(problem_data):
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO problem_artifacts (problem_id, path) VALUES (?, ?)", (problem_id, path)
+                    )
+                    self.conn.execute(
+                        """
+                        INSERT INTO artifacts (path, refcount) VALUES (?, 1)
+                        ON CONFLICT (path) DO UPDATE SET refcount = refcount + 1
+                        """,
+                        (path,)
+                    )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def _drop_problem(self, problem_id: str) -> List[str]:
+        """Delete a problem's rows and references; returns artifacts no longer referenced. Caller holds the transaction."""
+        orphaned = self._release_artifacts(problem_id)
+        self.conn.execute("DELETE FROM problems WHERE problem_id = ?", (problem_id,))
+        self.conn.execute("DELETE FROM problem_concepts WHERE problem_id = ?", (problem_id,))
+        if self.has_fts:
+            self.conn.execute("DELETE FROM problems_fts WHERE problem_id = ?", (problem_id,))
+        return orphaned
+
+    def _release_artifacts(self, problem_id: str) -> List[str]:
+        paths = [
+            path for (path,) in self.conn.execute(
+                "SELECT path FROM problem_artifacts WHERE problem_id = ?", (problem_id,)
+            )
+        ]
+        self.conn.execute("DELETE FROM problem_artifacts WHERE problem_id = ?", (problem_id,))
+        orphaned = []
+        for path in paths:
+            self.conn.execute("UPDATE artifacts SET refcount = refcount - 1 WHERE path = ?", (path,))
+            refcount = self.conn.execute("SELECT refcount FROM artifacts WHERE path = ?", (path,)).fetchone()
+            if refcount is not None and refcount[0] <= 0:
+                self.conn.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+                orphaned.append(path)
+        return orphaned
+
+    def retire(self, problem_id: str, delete_files: bool = True) -> List[str]:
+        """
+        Stop serving a problem and drop its artifact references. Files no
+        other problem references are deleted (if delete_files) and returned.
+        """
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute("UPDATE problems SET retired = 1 WHERE problem_id = ?", (problem_id,))
+                orphaned = self._release_artifacts(problem_id)
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        if delete_files:
+            for path in orphaned:
+                if os.path.exists(path):
+                    os.remove(path)
+        return orphaned
+
+    def get_problem(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self.conn.execute(
+                "SELECT payload FROM problems WHERE problem_id = ?", (problem_id,)
+            ).fetchone()
+        return json.loads(record[0]) if record else None
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        problem_type: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        concepts: Optional[List[str]] = None,
+        company: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Live problems matching every given filter; with text, best full-text
+        matches first, otherwise those covering the most concepts.
+        """
+        clauses, params = ["p.retired = 0"], []
+        joins, order = "", "p.created_at DESC"
+        if problem_type:
+            clauses.append("p.type = ?")
+            params.append(problem_type)
+        if difficulty:
+            clauses.append("p.difficulty = ?")
+            params.append(difficulty)
+        if company:
+            clauses.append("p.company = ? COLLATE NOCASE")
+            params.append(company)
+        if concepts:
+            clauses.append(
+                f"p.problem_id IN (SELECT problem_id FROM problem_concepts WHERE concept IN ({','.join('?' * len(concepts))}))"
+            )
+            params.extend(concepts)
+        if text:
+            if self.has_fts:
+                joins = "JOIN problems_fts f ON f.problem_id = p.problem_id"
+                clauses.append("problems_fts MATCH ?")
+                params.append(' OR '.join('"' + word.replace('"', '""') + '"' for word in text.split()))
+                order = "f.rank"
+            else:
+                for word in text.split():
+                    clauses.append("(p.title LIKE ? OR p.description LIKE ? OR p.concepts LIKE ?)")
+                    params.extend([f"%{word}%"] * 3)
+        with self._lock:
+            records = self.conn.execute(
+                f"SELECT p.payload FROM problems p {joins} WHERE {' AND '.join(clauses)} ORDER BY {order} LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in records]
+
+    def find_unseen(
+        self,
+        user_id: str,
+        problem_type: str,
+        difficulty: str,
+        concepts: Optional[List[str]] = None,
+        company: Optional[str] = None,
+        target_difficulty: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        The best live problem of this type and difficulty (and company, if
+        given) the user hasn't been served: most recommended concepts covered
+        first, then (with a target_difficulty on the calibration's logit
+        scale) the closest calibrated difficulty, then the least served.
+        Calibrated levels take precedence over generated difficulty labels;
+        uncalibrated problems count as average (0).
+        """
+        concepts = concepts or []
+        company_clause = "AND p.company = ? COLLATE NOCASE" if company else ""
+        overlap = (
+            f"(SELECT COUNT(*) FROM problem_concepts c WHERE c.problem_id = p.problem_id "
+            f"AND c.concept IN ({','.join('?' * len(concepts))})) DESC, "
+            if concepts else ""
+        )
+        closeness = "ABS(COALESCE(s.calibrated_difficulty, 0.0) - ?) ASC, " if target_difficulty is not None else ""
+        with self._lock:
+            record = self.conn.execute(
+                f"""
+                SELECT p.payload FROM problems p
+                JOIN problem_stats s ON s.problem_id = p.problem_id
+                WHERE p.type = ? AND p.retired = 0 AND COALESCE(s.calibrated_level, p.difficulty) = ?
+                  {company_clause}
+                  AND NOT EXISTS (
+                      SELECT 1 FROM user_seen u WHERE u.user_id = ? AND u.problem_id = p.problem_id
+                  )
+                ORDER BY {overlap}{closeness}s.served ASC, p.created_at ASC
+                LIMIT 1
+                """,
+                [problem_type, difficulty] + ([company] if company else []) + [user_id] + concepts
+                + ([float(target_difficulty)] if target_difficulty is not None else [])
+            ).fetchone()
+        return json.loads(record[0]) if record else None
+
+    def mark_seen(self, user_id: str, problem_id: str) -> None:
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                inserted = self.conn.execute(
+                    "INSERT OR IGNORE INTO user_seen (user_id, problem_id, served_at) VALUES (?, ?, ?)",
+                    (user_id, problem_id, time.time())
+                ).rowcount
+                if inserted:
+                    self.conn.execute(
+                        "UPDATE problem_stats SET served = served + 1 WHERE problem_id = ?", (problem_id,)
+                    )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def record_result(self, problem_id: str, passed: bool, execution_time: float) -> None:
+        with self._lock:
+            self.conn.execute(
+                """
+                UPDATE problem_stats
+                SET attempts = attempts + 1, passes = passes + ?, total_time = total_time + ?
+                WHERE problem_id = ?
+                """,
+                (int(bool(passed)), float(execution_time), problem_id)
+            )
+
+    def set_calibration(self, problem_difficulty: Dict[str, float], levels: Dict[str, str]) -> None:
+        """Store fitted IRT difficulties and the levels derived from them (see utils.calibration)."""
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.executemany(
+                    "UPDATE problem_stats SET calibrated_difficulty = ?, calibrated_level = ? WHERE problem_id = ?",
+                    [(float(b), levels.get(pid), pid) for pid, b in problem_difficulty.items()]
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def get_stats(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self.conn.execute(
+                """
+                SELECT attempts, passes, total_time, served, calibrated_difficulty, calibrated_level
+                FROM problem_stats WHERE problem_id = ?
+                """,
+                (problem_id,)
+            ).fetchone()
+        if record is None:
+            return None
+        attempts, passes, total_time, served, calibrated_difficulty, calibrated_level = record
+        return {
+            'attempts': attempts,
+            'passes': passes,
+            'pass_rate': passes / attempts if attempts else None,
+            'mean_time': total_time / attempts if attempts else None,
+            'served': served,
+            'calibrated_difficulty': calibrated_difficulty,
+            'calibrated_level': calibrated_level
+        }
+
+    def artifact_refcount(self, path: str) -> int:
+        with self._lock:
+            record = self.conn.execute("SELECT refcount FROM artifacts WHERE path = ?", (path,)).fetchone()
+        return record[0] if record else 0
+
+    def counts(self) -> Dict[str, int]:
+        """Live problems per 'type/difficulty'."""
+        with self._lock:
+            records = self.conn.execute(
+                "SELECT type, difficulty, COUNT(*) FROM problems WHERE retired = 0 GROUP BY type, difficulty"
+            ).fetchall()
+        return {f"{problem_type}/{difficulty}": count for problem_type, difficulty, count in records}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
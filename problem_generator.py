@@ -1,16 +1,37 @@
 import json
 import uuid
 import pandas as pd
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from utils import tracing
+from utils.data_generator import DataGenerator
+from utils.llm import llm_response
+from utils.sql_engines import SQL_ENGINES
+
+DIALECT_NAMES = {'sqlite': 'SQLite', 'duckdb': 'DuckDB (PostgreSQL-compatible)'}
+
+
+class DuplicateProblemError(ValueError):
+    """Raised when a generated problem is a near-duplicate of a stored one."""
+
+    def __init__(self, message: str, title: Optional[str] = None, concepts: Optional[List[str]] = None):
+        super().__init__(message)
+        self.title = title
+        self.concepts = concepts or []
+
 
 class ProblemGenerator:
-    def __init__(self):
+    def __init__(self, embeddings_manager=None, problem_bank=None):
         self.problem_types = {
             'Python': self._generate_python_problem,
             'SQL': self._generate_sql_problem,
             'Pandas': self._generate_pandas_problem
         }
         self.data_generator = DataGenerator()
+        self.embeddings_manager = embeddings_manager  # Enables duplicate rejection
+        self.problem_bank = problem_bank  # Enables reuse of stored problems before generating
+        self.duplicate_threshold = 0.9
+        self.max_generation_attempts = 3
+        self.sql_engine = 'sqlite'  # Grading engine recorded on new SQL problems (see utils.sql_engines)
         self.load_templates()
 
     def generate_problem(
@@ -18,13 +39,100 @@ class ProblemGenerator:
         problem_type: str,
         difficulty: str,
         company_name: Optional[str] = None,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        user_id: Optional[str] = None,
+        concepts: Optional[List[str]] = None,
+        target_difficulty: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Generate a new problem based on the given parameters."""
+        """
+        Get a problem for the given parameters. With a problem bank and a
+        user, an unseen bank problem at this difficulty (for this company,
+        covering the most of the given or recommended concepts, closest to
+        the user's calibrated target_difficulty) is served first; a new one
+        is generated only on a miss. Requests with a job description are
+        tailored, so they are always generated.
+        """
         if problem_type not in self.problem_types:
             raise ValueError(f"Invalid problem type: {problem_type}")
         
-        return self.problem_types[problem_type](difficulty, company_name, job_description)
+        if self.problem_bank is not None and user_id and not job_description:
+            problem_data = self._serve_from_bank(
+                user_id, problem_type, difficulty, company_name, concepts, target_difficulty
+            )
+            if problem_data is not None:
+                return problem_data
+        
+        with tracing.span('generate_problem', type=problem_type, difficulty=difficulty) as span:
+            # Near-duplicates are rejected before their datasets are built; retry a
+            # few times, telling the model what to steer away from
+            avoid = []
+            for attempt in range(self.max_generation_attempts):
+                try:
+                    problem_data = self.problem_types[problem_type](
+                        difficulty, company_name, job_description, avoid=avoid
+                    )
+                    break
+                except DuplicateProblemError as e:
+                    span.add('duplicates_rejected')
+                    if attempt == self.max_generation_attempts - 1:
+                        raise
+                    rejected = e.title or 'untitled'
+                    if e.concepts:
+                        rejected += f" (concepts: {', '.join(e.concepts)})"
+                    avoid.append(rejected)
+            # The model's echo of the difficulty may be missing or a placeholder
+            problem_data['difficulty'] = difficulty
+            
+            if self.embeddings_manager is not None:
+                with tracing.span('embeddings.add_problem'):
+                    self.embeddings_manager.add_problem(problem_data)
+            if self.problem_bank is not None:
+                self._add_to_bank(problem_data, company_name)
+                if user_id:
+                    self.problem_bank.mark_seen(user_id, problem_data['id'])
+        return problem_data
+
+    def _serve_from_bank(
+        self,
+        user_id: str,
+        problem_type: str,
+        difficulty: str,
+        company_name: Optional[str],
+        concepts: Optional[List[str]],
+        target_difficulty: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        with tracing.span('problem_bank.find_unseen') as span:
+            if concepts is None and self.embeddings_manager is not None:
+                concepts = self.embeddings_manager.recommend_next_concepts(user_id)
+            problem_data = self.problem_bank.find_unseen(
+                user_id, problem_type, difficulty, concepts, company_name or None, target_difficulty
+            )
+            span.add('bank_hits' if problem_data else 'bank_misses')
+        if problem_data is not None:
+            self.problem_bank.mark_seen(user_id, problem_data['id'])
+        return problem_data
+
+    def _add_to_bank(self, problem_data: Dict[str, Any], company_name: Optional[str]) -> None:
+        # Index by canonical concepts so they match recommend_next_concepts()
+        concepts = (
+            self.embeddings_manager.extract_concepts(problem_data)
+            if self.embeddings_manager is not None
+            else problem_data.get('concepts_tested', [])
+        )
+        self.problem_bank.add_problem(problem_data, concepts, company_name or None)
+
+    def _check_duplicate(self, problem_data: Dict[str, Any]) -> None:
+        """Raise DuplicateProblemError if the problem is too close to a stored one."""
+        if self.embeddings_manager is None:
+            return
+        with tracing.span('check_duplicate'):
+            duplicate_id = self.embeddings_manager.find_duplicate(problem_data, self.duplicate_threshold)
+        if duplicate_id is not None:
+            raise DuplicateProblemError(
+                f"Generated problem '{problem_data.get('title')}' duplicates problem {duplicate_id}",
+                title=problem_data.get('title'),
+                concepts=self.embeddings_manager.extract_concepts(problem_data)
+            )
 
     def load_templates(self):
         """Load problem generation templates."""
@@ -54,10 +162,20 @@ class ProblemGenerator:
         difficulty: str,
         company_name: Optional[str],
         job_description: Optional[str],
-        user_history: Optional[List[Dict[str, Any]]] = None
+        user_history: Optional[List[Dict[str, Any]]] = None,
+        avoid: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Generate a unique Python coding problem."""
-, and examples
+        context = self._build_context(difficulty, company_name, job_description, avoid)
+        if user_history:
+            previous_topics = self._get_previous_topics(user_history, 'Python')
+            context += f"\nPreviously covered topics: {', '.join(previous_topics)}"
+        
+        prompt = f"""
+        Generate a Python coding problem with the following specifications:
+        - Difficulty: {difficulty}
+        - Should be a completely new and unique problem
+        - Include clear problem statement, constraints, and examples
         - Provide test cases including edge cases
         - Include hints that help with problem-solving approach
         
@@ -84,6 +202,7 @@ class ProblemGenerator:
         
         response = llm_response(prompt)
         problem_data = json.loads(response)
+        self._check_duplicate(problem_data)
         problem_data['id'] = str(uuid.uuid4())
         return problem_data
 
@@ -91,10 +210,11 @@ class ProblemGenerator:
         self,
         difficulty: str,
         company_name: Optional[str],
-        job_description: Optional[str]
+        job_description: Optional[str],
+        avoid: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Generate a SQL problem."""
-        context = self._build_context(difficulty, company_name, job_description)
+        context = self._build_context(difficulty, company_name, job_description, avoid)
         
         prompt = f"""
         Generate a SQL problem with the following specifications:
@@ -103,6 +223,7 @@ class ProblemGenerator:
         - Include sample data structure and sample records
         - Must test important SQL concepts based on difficulty
         - Include expected output format
+        - Use {DIALECT_NAMES.get(self.sql_engine, self.sql_engine)} SQL syntax
         
         Additional context:
         {context}
@@ -118,6 +239,7 @@ class ProblemGenerator:
                 {{"table_name": "table_name", "file": "path_to_csv", "schema": "table_schema"}}
             ],
             "expected_output": "path_to_expected_output_csv",
+            "reference_query": "correct_and_efficient_solution_query",
             "hints": ["list_of_hints"],
             "constraints": ["list_of_constraints"],
             "examples": ["list_of_examples"]
@@ -126,21 +248,25 @@ class ProblemGenerator:
         
         response = llm_response(prompt)
         problem_data = json.loads(response)
+        problem_data['sql_engine'] = self.sql_engine
+        problem_data['sql_dialect'] = SQL_ENGINES[self.sql_engine].dialect
+        self._check_duplicate(problem_data)
+        # The id names the data files, so it must be set before they are written
+        problem_data['id'] = str(uuid.uuid4())
         
         # Generate sample data CSVs based on the schema
         self._generate_sample_data(problem_data)
-        
-        problem_data['id'] = str(uuid.uuid4())
         return problem_data
 
     def _generate_pandas_problem(
         self,
         difficulty: str,
         company_name: Optional[str],
-        job_description: Optional[str]
+        job_description: Optional[str],
+        avoid: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Generate a Pandas data manipulation problem."""
-        context = self._build_context(difficulty, company_name, job_description)
+        context = self._build_context(difficulty, company_name, job_description, avoid)
         
         prompt = f"""
         Generate a Pandas data manipulation problem with the following specifications:
@@ -172,18 +298,21 @@ class ProblemGenerator:
         
         response = llm_response(prompt)
         problem_data = json.loads(response)
+        self._check_duplicate(problem_data)
+        # The id names the data files, so it must be set before they are written
+        problem_data['id'] = str(uuid.uuid4())
         
         # Generate sample datasets based on the problem
         self._generate_sample_data(problem_data)
-        
-        problem_data['id'] = str(uuid.uuid4())
         return problem_data
 
+    @tracing.traced('build_context')
     def _build_context(
         self,
         difficulty: str,
         company_name: Optional[str],
-        job_description: Optional[str]
+        job_description: Optional[str],
+        avoid: Optional[List[str]] = None
     ) -> str:
         """Build context string for LLM prompt based on available information."""
         context_parts = [f"Difficulty level: {difficulty}"]
@@ -208,8 +337,15 @@ class ProblemGenerator:
             skills = llm_response(prompt)
             context_parts.append(f"Required skills: {skills}")
         
+        if avoid:
+            # Earlier attempts that duplicated stored problems
+            context_parts.append(
+                "Avoid: problems similar to these, which already exist: " + "; ".join(avoid)
+            )
+        
         return "\n".join(context_parts)
 
+    @tracing.traced('generate_sample_data')
     def _generate_sample_data(self, problem_data: Dict[str, Any]) -> None:
         """Generate sample datasets based on problem requirements."""
         if problem_data['type'] in ['SQL', 'Pandas']:
@@ -230,6 +366,7 @@ class ProblemGenerator:
                 filename = f"data/sample_data/{problem_data['id']}_{dataset['table_name'] if 'table_name' in dataset else dataset['variable_name']}.csv"
                 with open(filename, 'w') as f:
                     f.write(csv_data)
+                tracing.add('bytes_written', len(csv_data))
                 dataset['file'] = filename
             
             # Generate expected output data
@@ -247,4 +384,5 @@ class ProblemGenerator:
             filename = f"data/sample_data/{problem_data['id']}_expected_output.csv"
             with open(filename, 'w') as f:
                 f.write(expected_output)
+            tracing.add('bytes_written', len(expected_output))
             problem_data['expected_output'] = filename
@@ -0,0 +1,228 @@
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Any
+
+_instances: Dict[str, Any] = {}
+_factories: Dict[str, Callable[[], Any]] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def register(name: str, factory: Callable[[], Any]) -> None:
+    """Register (or replace) the factory for a shared resource."""
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name: str) -> Any:
+    """
+    Return the process-wide instance of a resource, constructing it on first
+    use. Construction runs under a per-resource lock, so concurrent sessions
+    wait for one build rather than each building their own copy.
+    """
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _registry_lock:
+        if name not in _factories:
+            raise KeyError(f"Unknown shared resource: {name}")
+        lock = _locks[name]
+    with lock:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = _factories[name]()
+            _instances[name] = instance
+    return instance
+
+
+def reset(name: str = None) -> None:
+    """Drop one (or every) constructed instance; the next get() rebuilds it."""
+    with _registry_lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def _code_executor():
+    from utils.code_executor import CodeExecutor
+    return CodeExecutor()
+
+
+def _problem_generator():
+    from utils.problem_generator import ProblemGenerator
+    return ProblemGenerator(embeddings_manager=get_embeddings_manager(), problem_bank=get_problem_bank())
+
+
+def _difficulty_analyzer():
+    from utils.difficulty_analyzer import DifficultyAnalyzer
+    return DifficultyAnalyzer()
+
+
+def _embeddings_manager():
+    from utils.embeddings import EmbeddingsManager
+    return EmbeddingsManager()
+
+
+def _problem_bank():
+    from utils.problem_bank import ProblemBank
+    return ProblemBank()
+
+
+def _session_store():
+    from utils.session_store import SessionStore
+    return SessionStore()
+
+
+def _execution_scheduler():
+    from utils.scheduler import FairScheduler
+    return FairScheduler(max_concurrency=4, name='executions')
+
+
+def _llm_scheduler():
+    from utils.scheduler import FairScheduler
+    return FairScheduler(max_concurrency=8, name='llm')
+
+
+def _service():
+    import os
+    from utils.llm import set_llm_scheduler
+    from utils.service import AdaptiveService, ServiceClient
+    url = os.environ.get('ADAPTIVE_SERVICE_URL')
+    if url:
+        return ServiceClient(url)
+    set_llm_scheduler(get_llm_scheduler())
+    return AdaptiveService()
+
+
+register('code_executor', _code_executor)
+register('problem_generator', _problem_generator)
+register('difficulty_analyzer', _difficulty_analyzer)
+register('embeddings_manager', _embeddings_manager)
+register('problem_bank', _problem_bank)
+register('session_store', _session_store)
+register('execution_scheduler', _execution_scheduler)
+register('llm_scheduler', _llm_scheduler)
+register('service', _service)
+
+
+def get_code_executor():
+    return get('code_executor')
+
+
+def get_problem_generator():
+    return get('problem_generator')
+
+
+def get_difficulty_analyzer():
+    return get('difficulty_analyzer')
+
+
+def get_embeddings_manager():
+    return get('embeddings_manager')
+
+
+def get_problem_bank():
+    return get('problem_bank')
+
+
+def get_session_store():
+    return get('session_store')
+
+
+def get_execution_scheduler():
+    return get('execution_scheduler')
+
+
+def get_llm_scheduler():
+    return get('llm_scheduler')
+
+
+def get_service():
+    """AdaptiveService in-process, or a ServiceClient when ADAPTIVE_SERVICE_URL is set."""
+    return get('service')
+
+
+def profile_imports(modules=None) -> Dict[str, float]:
+    """
+    Cumulative import time (ms) of each module, each measured in a fresh
+    interpreter with -X importtime so earlier imports don't hide costs.
+    """
+    modules = modules or [
+        'utils.code_executor', 'utils.problem_generator', 'utils.difficulty_analyzer',
+        'utils.embeddings', 'utils.session_store'
+    ]
+    results = {}
+    for module in modules:
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True
+        )
+        pattern = re.compile(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*' + re.escape(module) + r'\s*$')
+        for line in completed.stderr.splitlines():
+            match = pattern.match(line)
+            if match:
+                results[module] = int(match.group(1)) / 1000
+    return results
+
+
+# Releases what a throwaway instance holds (connections, template processes)
+_closers: Dict[str, Callable[[Any], None]] = {
+    'code_executor': lambda executor: executor.snapshots and executor.snapshots.close(),
+    'embeddings_manager': lambda manager: manager.store.close(),
+    'session_store': lambda store: store.close()
+}
+
+
+def profile_initialization(reruns: int = 20) -> Dict[str, Any]:
+    """
+    Per-rerun cost of obtaining the app's components: constructing them all
+    fresh (the old behaviour of every Streamlit rerun) versus fetching the
+    shared instances, plus the one-off cold construction of each. The
+    freshly constructed instances are closed afterwards.
+    """
+    names = ['code_executor', 'embeddings_manager', 'problem_generator', 'difficulty_analyzer', 'session_store']
+    reset()
+    cold = {}
+    for name in names:
+        start = time.perf_counter()
+        get(name)
+        cold[name] = (time.perf_counter() - start) * 1000
+
+    built = []
+    start = time.perf_counter()
+    for _ in range(reruns):
+        for name in names:
+            built.append((name, _factories[name]()))
+    fresh = (time.perf_counter() - start) * 1000 / reruns
+    for name, instance in built:
+        if name in _closers:
+            _closers[name](instance)
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        for name in names:
+            get(name)
+    shared = (time.perf_counter() - start) * 1000 / reruns
+
+    return {
+        'cold_construction_ms': cold,
+        'per_rerun_ms_fresh': fresh,
+        'per_rerun_ms_shared': shared
+    }
+
+
+if __name__ == "__main__":
+    print("Import time (ms):")
+    for module, ms in profile_imports().items():
+        print(f"  {module:32s} {ms:10.1f}")
+    profile = profile_initialization()
+    print("Cold construction (ms):")
+    for name, ms in profile['cold_construction_ms'].items():
+        print(f"  {name:32s} {ms:10.1f}")
+    print(f"Per-rerun overhead before (fresh construction): {profile['per_rerun_ms_fresh']:.2f} ms")
+    print(f"Per-rerun overhead after (shared instances):    {profile['per_rerun_ms_shared']:.4f} ms")
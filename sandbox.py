@@ -0,0 +1,307 @@
+import concurrent.futures
+import gc
+import itertools
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+from utils import tracing
+
+# Imported once in the fork server, so every template starts with them loaded
+PRELOAD_MODULES = ['datetime', 'json', 're', 'math', 'collections', 'numpy', 'pandas']
+POLL_INTERVAL = 0.05  # seconds between a template's checks for finished or overdue runs
+STARTUP_TIMEOUT = 60  # seconds a template may take to load its problem
+RESULT_GRACE = 2  # seconds past the run timeout before the caller stops waiting
+
+_context = None
+_context_lock = threading.Lock()
+
+
+class SnapshotError(RuntimeError):
+    """A template process couldn't be started or exited with runs outstanding."""
+
+
+def supported() -> bool:
+    """Snapshots need os.fork and the forkserver start method (not on Windows)."""
+    return hasattr(os, 'fork') and 'forkserver' in multiprocessing.get_all_start_methods()
+
+
+def _get_context():
+    # Templates come from the single-threaded fork server rather than being
+    # forked from this (possibly multi-threaded) process
+    global _context
+    with _context_lock:
+        if _context is None:
+            _context = multiprocessing.get_context('forkserver')
+            _context.set_forkserver_preload(PRELOAD_MODULES)
+        return _context
+
+
+def _send(conn, send_lock, message) -> None:
+    with send_lock:
+        conn.send(message)
+
+
+def _run_child(conn, send_lock, request_id, state, user_code, grade) -> None:
+    """Body of a forked run: grade, report, and exit without running any cleanup."""
+    status = 1
+    try:
+        try:
+            result = grade(state, user_code)
+        except BaseException as e:
+            result = {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
+        _send(conn, send_lock, (request_id, result))
+        status = 0
+    finally:
+        os._exit(status)
+
+
+def _fork_spare(conn, send_lock, state, grade) -> tuple:
+    """
+    Fork the next run's child ahead of time, blocked reading its request
+    from a pipe, so a run doesn't wait for the fork. Returns (pid, write fd).
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as requests:
+            data = requests.read()
+        if not data:  # Closed unused at shutdown
+            os._exit(0)
+        request_id, user_code = pickle.loads(data)
+        _run_child(conn, send_lock, request_id, state, user_code, grade)
+    os.close(read_fd)
+    return pid, write_fd
+
+
+def _reap(children: Dict[int, tuple], conn, send_lock) -> None:
+    """Collect finished runs, kill overdue ones, and report runs that died without a result."""
+    now = time.monotonic()
+    for pid, (request_id, deadline, timeout) in list(children.items()):
+        finished, status = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            del children[pid]
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                _send(conn, send_lock, (request_id, {
+                    'success': False,
+                    'error': f"Execution crashed (exit status {code})"
+                }))
+        elif now > deadline:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            del children[pid]
+            _send(conn, send_lock, (request_id, {
+                'success': False,
+                'error': f"Execution timed out after {timeout} seconds"
+            }))
+
+
+def _template_main(conn, send_lock, problem_data, prepare, grade) -> None:
+    """
+    Template process: load the problem once, then hand each run to a child
+    forked from it (always keeping one spare forked in advance). Children
+    write their results straight to conn; the template only reaps them. On
+    shutdown (None) it lets outstanding runs finish first.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The owning process handles Ctrl-C
+    try:
+        state = prepare(problem_data)
+    except BaseException:
+        _send(conn, send_lock, ('failed', traceback.format_exc()))
+        return
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the children don't write to (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    _send(conn, send_lock, ('ready', None))
+
+    children: Dict[int, tuple] = {}
+    spare = _fork_spare(conn, send_lock, state, grade)
+    accepting = True
+    while accepting or children:
+        if accepting:
+            try:
+                message = conn.recv() if conn.poll(POLL_INTERVAL) else False
+            except (EOFError, OSError):
+                message = None
+            if message is None:
+                accepting = False
+                os.close(spare[1])
+                children[spare[0]] = (None, float('inf'), None)
+            elif message:
+                request_id, user_code, timeout = message
+                pid, write_fd = spare
+                with os.fdopen(write_fd, 'wb') as request:
+                    request.write(pickle.dumps((request_id, user_code)))
+                children[pid] = (request_id, time.monotonic() + timeout, timeout)
+                spare = _fork_spare(conn, send_lock, state, grade)
+        else:
+            time.sleep(POLL_INTERVAL)
+        _reap(children, conn, send_lock)
+
+
+class _Template:
+    """Owner-side handle of one template process: submits runs and matches results to futures."""
+
+    def __init__(self, problem_data: Dict[str, Any], prepare: Callable, grade: Callable, version: Any = None):
+        self.version = version  # What the problem's state was loaded from
+        context = _get_context()
+        self.conn, child_conn = context.Pipe()
+        self._send_lock = context.Lock()  # Shared by the template and its children
+        self.process = context.Process(
+            target=_template_main,
+            args=(child_conn, self._send_lock, problem_data, prepare, grade),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        try:
+            if not self.conn.poll(STARTUP_TIMEOUT):
+                raise SnapshotError('Template process timed out loading the problem')
+            status, detail = self.conn.recv()
+        except (EOFError, OSError):
+            status, detail = 'failed', 'Template process exited while loading the problem'
+        except SnapshotError as e:
+            status, detail = 'failed', str(e)
+        if status != 'ready':
+            self.process.kill()
+            self.conn.close()
+            raise SnapshotError(detail)
+
+        self.alive = True
+        self._lock = threading.Lock()
+        self._pending: Dict[int, concurrent.futures.Future] = {}
+        self._ids = itertools.count()
+        threading.Thread(target=self._read_results, daemon=True).start()
+
+    def submit(self, user_code: str, timeout: float) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._lock:
+            if not self.alive:
+                raise SnapshotError('Template process has exited')
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            self.conn.send((request_id, user_code, timeout))
+        return future
+
+    def _read_results(self) -> None:
+        while True:
+            try:
+                request_id, result = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is not None:
+                future.set_result(result)
+        with self._lock:
+            self.alive = False
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(SnapshotError('Template process exited with runs outstanding'))
+
+    def close(self, wait: float = 5) -> None:
+        with self._lock:
+            if self.alive:
+                try:
+                    self.conn.send(None)
+                except OSError:
+                    pass
+        self.process.join(wait)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class SnapshotPool:
+    """
+    Pre-warmed template processes, one per problem, each with the common
+    modules imported and the problem's state (datasets, expected output)
+    loaded by prepare(problem_data). Every run executes grade(state, code)
+    in a copy-on-write fork of its problem's template, so runs skip loading
+    the problem, concurrent runs of a problem share its memory, in-place
+    changes to the datasets never outlive a run, and a run can be killed at
+    its timeout. A template is replaced when its problem's version (e.g.
+    the data files' mtimes) changes. The least recently used templates are
+    closed beyond max_templates.
+
+    prepare and grade must be module-level functions (they are pickled by
+    reference), and grade's result must be picklable.
+    """
+
+    def __init__(self, timeout: float = 10, max_templates: int = 8):
+        self.timeout = timeout
+        self.max_templates = max_templates
+        self._templates: 'OrderedDict[str, _Template]' = OrderedDict()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _template(
+        self,
+        key: str,
+        version: Any,
+        problem_data: Dict[str, Any],
+        prepare: Callable,
+        grade: Callable
+    ) -> _Template:
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent first runs of a problem start a single template
+        with key_lock:
+            with self._lock:
+                template = self._templates.get(key)
+                if template is not None and template.alive and template.version == version:
+                    self._templates.move_to_end(key)
+                    tracing.add('snapshot_hits')
+                    return template
+            with tracing.span('sandbox.start_template'):
+                template = _Template(problem_data, prepare, grade, version)
+            with self._lock:
+                closing = [self._templates.pop(key)] if key in self._templates else []
+                self._templates[key] = template
+                while len(self._templates) > self.max_templates:
+                    closing.append(self._templates.popitem(last=False)[1])
+        for stale in closing:
+            stale.close()
+        return template
+
+    def run(
+        self,
+        key: str,
+        problem_data: Dict[str, Any],
+        user_code: str,
+        prepare: Callable,
+        grade: Callable,
+        version: Any = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Grade user_code in a fork of the template for key, starting it if
+        needed (or if the one running was prepared for another version).
+        Returns None if no template could be used, in which case the caller
+        should grade in-process.
+        """
+        try:
+            template = self._template(key, version, problem_data, prepare, grade)
+            future = template.submit(user_code, self.timeout)
+        except (SnapshotError, OSError):
+            return None
+        try:
+            return future.result(self.timeout + RESULT_GRACE)
+        except concurrent.futures.TimeoutError:
+            return {'success': False, 'error': f"Execution timed out after {self.timeout} seconds"}
+        except SnapshotError:
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            templates = list(self._templates.values())
+            self._templates.clear()
+        for template in templates:
+            template.close()
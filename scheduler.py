@@ -0,0 +1,251 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+PRIORITIES = ['interactive', 'batch']  # Strict order: interactive always dispatches first
+
+_request_context: contextvars.ContextVar = contextvars.ContextVar(
+    'scheduler_request', default={'user_id': 'anonymous', 'org_id': 'default', 'priority': 'interactive'}
+)
+
+
+class AdmissionError(RuntimeError):
+    """Raised when the scheduler rejects a request instead of queueing it."""
+
+
+@contextmanager
+def request_context(user_id: Optional[str], org_id: Optional[str] = None, priority: str = 'interactive'):
+    """Attribute scheduled work done inside the block (e.g. LLM calls) to this user."""
+    token = _request_context.set({
+        'user_id': user_id or 'anonymous',
+        'org_id': org_id or 'default',
+        'priority': priority
+    })
+    try:
+        yield
+    finally:
+        _request_context.reset(token)
+
+
+def current_request() -> Dict[str, str]:
+    return _request_context.get()
+
+
+class _Task:
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'user_id', 'org_id', 'priority', 'enqueued_at', 'context')
+
+    def __init__(self, fn, args, kwargs, user_id, org_id, priority):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.user_id = user_id
+        self.org_id = org_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.context = contextvars.copy_context()
+
+
+class FairScheduler:
+    """
+    Runs submitted work on max_concurrency threads in weighted fair order.
+
+    Each (org, user) flow gets a virtual finish tag of
+    max(virtual_time, flow's last tag) + cost / weight, where the weight is
+    the org's weight split across its active users times the user's weight.
+    The smallest tag runs next, so a user with many queued requests only
+    gets their fair share. Interactive work always goes before batch.
+
+    Admission fails fast with AdmissionError when the scheduler, the org or
+    the user already has too much outstanding (queued + running) work.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_pending: int = 256,
+        user_quota: int = 8,
+        org_quota: int = 64,
+        user_weights: Optional[Dict[str, float]] = None,
+        org_weights: Optional[Dict[str, float]] = None,
+        metrics_window: int = 10000,
+        name: str = 'scheduler'
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending  # Queued (not yet running) requests across everyone
+        self.user_quota = user_quota  # Outstanding requests per user
+        self.org_quota = org_quota  # Outstanding requests per organization
+        self.user_weights = user_weights or {}
+        self.org_weights = org_weights or {}
+        self.name = name
+
+        self._queues = {priority: [] for priority in PRIORITIES}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._last_tag: Dict[tuple, float] = {}
+        self._user_outstanding: Dict[str, int] = {}
+        self._org_outstanding: Dict[str, int] = {}
+        self._org_users: Dict[str, Dict[str, int]] = {}
+        self._pending = 0
+        self._running = 0
+        self._seq = itertools.count()
+
+        self._waits = {priority: deque(maxlen=metrics_window) for priority in PRIORITIES}
+        self._completed = 0
+        self._rejected: Dict[str, int] = {}
+
+        self._cond = threading.Condition()
+        self._workers = []
+        self._shutdown = False
+
+    def _start_workers(self) -> None:
+        while len(self._workers) < self.max_concurrency:
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"{self.name}-{len(self._workers)}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _reject(self, reason: str, message: str) -> None:
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        raise AdmissionError(message)
+
+    def submit(
+        self,
+        fn,
+        *args,
+        user_id: Optional[str] = None,
+        org_id: Optional[str] = None,
+        priority: Optional[str] = None,
+        cost: float = 1.0,
+        **kwargs
+    ) -> Future:
+        """
+        Queue fn(*args, **kwargs) and return its Future. Unspecified user, org
+        and priority come from the enclosing request_context().
+        """
+        context = current_request()
+        user_id = user_id or context['user_id']
+        org_id = org_id or context['org_id']
+        priority = priority or context['priority']
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            if self._pending >= self.max_pending:
+                self._reject('scheduler_full', "Scheduler full, retry later")
+            if self._org_outstanding.get(org_id, 0) >= self.org_quota:
+                self._reject('org_quota', f"Organization {org_id} has too many requests in flight")
+            if self._user_outstanding.get(user_id, 0) >= self.user_quota:
+                self._reject('user_quota', f"User {user_id} has too many requests in flight")
+
+            users = self._org_users.setdefault(org_id, {})
+            users[user_id] = users.get(user_id, 0) + 1
+            weight = (
+                self.org_weights.get(org_id, 1.0) / len(users)
+                * self.user_weights.get(user_id, 1.0)
+            )
+            flow = (org_id, user_id)
+            tag = max(self._virtual_time[priority], self._last_tag.get(flow, 0.0)) + cost / weight
+            self._last_tag[flow] = tag
+
+            task = _Task(fn, args, kwargs, user_id, org_id, priority)
+            heapq.heappush(self._queues[priority], (tag, next(self._seq), task))
+            self._user_outstanding[user_id] = self._user_outstanding.get(user_id, 0) + 1
+            self._org_outstanding[org_id] = self._org_outstanding.get(org_id, 0) + 1
+            self._pending += 1
+            self._start_workers()
+            self._cond.notify()
+        return task.future
+
+    def run(self, fn, *args, **kwargs) -> Any:
+        """Submit and wait for the result."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _next_task(self) -> Optional[_Task]:
+        with self._cond:
+            while not self._shutdown and self._pending == 0:
+                self._cond.wait()
+            if self._pending == 0:
+                return None
+            for priority in PRIORITIES:
+                queue = self._queues[priority]
+                if queue:
+                    tag, _, task = heapq.heappop(queue)
+                    self._virtual_time[priority] = max(self._virtual_time[priority], tag)
+                    break
+            self._pending -= 1
+            self._running += 1
+            self._waits[task.priority].append(time.monotonic() - task.enqueued_at)
+            return task
+
+    def _finish(self, task: _Task) -> None:
+        with self._cond:
+            self._running -= 1
+            self._completed += 1
+            for counts, key in ((self._user_outstanding, task.user_id), (self._org_outstanding, task.org_id)):
+                counts[key] -= 1
+                if counts[key] == 0:
+                    del counts[key]
+            users = self._org_users[task.org_id]
+            users[task.user_id] -= 1
+            if users[task.user_id] == 0:
+                del users[task.user_id]
+                self._last_tag.pop((task.org_id, task.user_id), None)
+                if not users:
+                    del self._org_users[task.org_id]
+
+    def _worker_loop(self) -> None:
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        result = task.context.run(task.fn, *task.args, **task.kwargs)
+                    except BaseException as e:
+                        task.future.set_exception(e)
+                    else:
+                        task.future.set_result(result)
+            finally:
+                self._finish(task)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, rejections and queue-wait percentiles (ms) per priority."""
+        with self._cond:
+            waits = {priority: np.asarray(samples) * 1000 for priority, samples in self._waits.items()}
+            return {
+                'max_concurrency': self.max_concurrency,
+                'running': self._running,
+                'queued': {priority: len(queue) for priority, queue in self._queues.items()},
+                'completed': self._completed,
+                'rejected': dict(self._rejected),
+                'active_users': len(self._user_outstanding),
+                'queue_wait_ms': {
+                    priority: {
+                        'p50': float(np.percentile(samples, 50)) if len(samples) else 0.0,
+                        'p95': float(np.percentile(samples, 95)) if len(samples) else 0.0,
+                        'p99': float(np.percentile(samples, 99)) if len(samples) else 0.0,
+                        'samples': len(samples)
+                    }
+                    for priority, samples in waits.items()
+                }
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work; queued tasks still run before the workers exit."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,536 @@
+import argparse
+import importlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+from utils import resources, tracing
+from utils.llm import set_llm_backend
+from utils.scheduler import AdmissionError, FairScheduler, request_context
+
+# Relative scheduling cost: LLM-bound generation occupies a worker far longer than grading
+GENERATION_COST = 5.0
+EXECUTION_COST = 1.0
+CALIBRATION_INTERVAL = 500  # Attempts recorded between IRT refits
+
+
+class QueueFullError(RuntimeError):
+    """Raised by ServiceClient when the service rejects a request as over capacity."""
+
+
+class AdaptiveService:
+    """
+    In-process implementation of the service API: problem generation, code
+    grading, attempt recording, difficulty and concept recommendations.
+    ServiceClient exposes the same methods over HTTP.
+    """
+
+    def __init__(self, calibration_interval: int = CALIBRATION_INTERVAL):
+        self._loaded_users = set()
+        self._lock = threading.Lock()
+        self.calibration_interval = calibration_interval
+        self._attempts_since_calibration = 0
+        self._calibration_lock = threading.Lock()
+
+    def _ensure_user_loaded(self, user_id: str, force: bool = False) -> None:
+        """Restore a user's difficulty tracks and concept mastery the first time this process sees them."""
+        if user_id in self._loaded_users and not force:
+            return
+        with self._lock:
+            if user_id in self._loaded_users and not force:
+                return
+            store = resources.get_session_store()
+            resources.get_difficulty_analyzer().online_model.set_tracks(
+                user_id, store.load_difficulty_state(user_id)
+            )
+            resources.get_embeddings_manager().load_history(user_id, store.get_history(user_id))
+            self._loaded_users.add(user_id)
+
+    def start_session(self, user_id: str) -> Dict[str, Any]:
+        """
+        Reload the user's state from the store (another replica may have served
+        them since) and return their saved session state, if any.
+        """
+        self._ensure_user_loaded(user_id, force=True)
+        return resources.get_session_store().load_user_state(user_id) or {}
+
+    def save_user_state(
+        self,
+        user_id: str,
+        current_problem_id: Optional[str],
+        difficulty_level: str,
+        start_time: Optional[float]
+    ) -> Dict[str, Any]:
+        """Persist the user's session state so a reload (or another replica) resumes it."""
+        resources.get_session_store().save_user_state(user_id, current_problem_id, difficulty_level, start_time)
+        return {'saved': True}
+
+    def save_problem(self, user_id: str, problem_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a problem served to the user, so their saved state can resolve it."""
+        resources.get_session_store().save_problem(user_id, problem_data)
+        return {'saved': True}
+
+    def get_history_frame(self, user_id: str):
+        """The user's attempts as a DataFrame."""
+        return resources.get_session_store().get_history_frame(user_id)
+
+    def generate_problem(
+        self,
+        problem_type: str,
+        difficulty: str,
+        company_name: Optional[str] = None,
+        job_description: Optional[str] = None,
+        user_id: Optional[str] = None,
+        org_id: Optional[str] = None,
+        priority: str = 'interactive'
+    ) -> Dict[str, Any]:
+        # A user's unseen bank problem is served if one fits their recommended
+        # concepts, preferring the one closest to their calibrated target
+        if user_id:
+            self._ensure_user_loaded(user_id)
+        # LLM calls made during generation are queued on the LLM scheduler under this user
+        with request_context(user_id, org_id, priority):
+            return resources.get_problem_generator().generate_problem(
+                problem_type, difficulty, company_name, job_description, user_id=user_id,
+                target_difficulty=self.target_difficulty(user_id) if user_id else None
+            )
+
+    def execute_code(
+        self,
+        user_code: str,
+        problem_data: Dict[str, Any],
+        user_id: Optional[str] = None,
+        org_id: Optional[str] = None,
+        priority: str = 'interactive'
+    ) -> Dict[str, Any]:
+        return resources.get_execution_scheduler().run(
+            resources.get_code_executor().execute_code, user_code, problem_data,
+            user_id=user_id, org_id=org_id, priority=priority, cost=EXECUTION_COST
+        )
+
+    def scheduler_metrics(self) -> Dict[str, Any]:
+        return {
+            'executions': resources.get_execution_scheduler().metrics(),
+            'llm': resources.get_llm_scheduler().metrics()
+        }
+
+    def record_attempt(self, user_id: str, attempt: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Record a graded attempt (problem_id, type, difficulty, passed,
+        execution_time) and return the user's next difficulty for that type.
+        """
+        self._ensure_user_loaded(user_id)
+        analyzer = resources.get_difficulty_analyzer()
+        store = resources.get_session_store()
+        problem_type = attempt['type']
+
+        store.record_attempt(user_id, attempt)
+        analyzer.record_attempt(
+            user_id,
+            problem_type,
+            attempt['difficulty'],
+            attempt['passed'],
+            attempt['execution_time'],
+            problem_id=attempt['problem_id']
+        )
+        resources.get_embeddings_manager().record_attempt(user_id, attempt['problem_id'], attempt['passed'])
+        resources.get_problem_bank().record_result(attempt['problem_id'], attempt['passed'], attempt['execution_time'])
+        store.save_difficulty_state(user_id, problem_type, analyzer.online_model.get_tracks(user_id)[problem_type])
+        with self._lock:
+            self._attempts_since_calibration += 1
+            due = self._attempts_since_calibration >= self.calibration_interval
+        if due:
+            self.recalibrate()
+        return {'difficulty_level': analyzer.get_difficulty(user_id, problem_type)}
+
+    def recalibrate(self) -> Dict[str, Any]:
+        """
+        Refit IRT abilities and problem difficulties on every stored attempt,
+        apply them to the difficulty analyzer and store the problems'
+        calibrated difficulties in the bank for selection. Skipped while
+        another refit is running.
+        """
+        from utils.calibration import IRTCalibrator
+        if not self._calibration_lock.acquire(blocking=False):
+            return {'skipped': True}
+        try:
+            with self._lock:
+                self._attempts_since_calibration = 0
+            attempts = resources.get_session_store().get_attempts_frame()
+            if attempts.empty:
+                return {'users': 0, 'problems': 0}
+            analyzer = resources.get_difficulty_analyzer()
+            with tracing.span('service.recalibrate'):
+                calibration = IRTCalibrator().fit(attempts, analyzer.time_weights)
+                analyzer.apply_calibration(calibration)
+                resources.get_problem_bank().set_calibration(
+                    calibration.problem_difficulty, calibration.problem_levels()
+                )
+            return {'users': len(calibration.user_ability), 'problems': len(calibration.problem_difficulty)}
+        finally:
+            self._calibration_lock.release()
+
+    def target_difficulty(self, user_id: str) -> Optional[float]:
+        """The user's calibrated target problem difficulty, or None before the first fit."""
+        calibration = resources.get_difficulty_analyzer().calibration
+        return calibration.target_difficulty(user_id) if calibration is not None else None
+
+    def get_difficulty(self, user_id: str, problem_type: str) -> str:
+        self._ensure_user_loaded(user_id)
+        return resources.get_difficulty_analyzer().get_difficulty(user_id, problem_type)
+
+    def recommend_next_concepts(self, user_id: str, n: int = 3) -> List[str]:
+        self._ensure_user_loaded(user_id)
+        return resources.get_embeddings_manager().recommend_next_concepts(user_id, n)
+
+
+# Worker-process entry points; module-level so the process pool can pickle them
+
+def _init_worker(llm_backend: Optional[str]) -> None:
+    if llm_backend:
+        set_llm_backend(load_backend(llm_backend))
+
+
+def _task_generate_problem(problem_type, difficulty, company_name, job_description, user_id=None, concepts=None,
+                           target_difficulty=None):
+    return resources.get_problem_generator().generate_problem(
+        problem_type, difficulty, company_name, job_description, user_id=user_id, concepts=concepts,
+        target_difficulty=target_difficulty
+    )
+
+
+def _task_execute_code(user_code, problem_data):
+    return resources.get_code_executor().execute_code(user_code, problem_data)
+
+
+def _traced_task(fn, *args):
+    """Run fn and return its result with the metrics it recorded in this worker."""
+    result = fn(*args)
+    return result, tracing.drain() if tracing.is_enabled() else None
+
+
+def load_backend(path: str):
+    """Resolve a 'module:function' path to the LLM backend callable."""
+    module_name, _, attr = path.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _run_in_process_pool(pool: ProcessPoolExecutor, fn, *args):
+    """Scheduler task: occupy a scheduler slot while a pool worker runs fn."""
+    result, metrics = pool.submit(_traced_task, fn, *args).result()
+    if metrics is not None:
+        tracing.merge(metrics)
+    return result
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON HTTP routes; server.service, server.scheduler and server.pool are set by make_server()."""
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, status: int, text: str, content_type: str = 'text/plain; version=0.0.4') -> None:
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _run_in_pool(self, body: Dict[str, Any], cost: float, fn, *args) -> None:
+        """Queue fn on the fair scheduler, which hands it to the process pool when its turn comes."""
+        try:
+            future = self.server.scheduler.submit(
+                _run_in_process_pool, self.server.pool, fn, *args,
+                user_id=body.get('user_id'),
+                org_id=body.get('org_id') or self.headers.get('X-Org-Id'),
+                priority=body.get('priority', 'interactive'),
+                cost=cost
+            )
+        except AdmissionError as e:
+            self._send(429, {'error': str(e)}, {'Retry-After': '1'})
+            return
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        try:
+            self._send(200, future.result(timeout=self.server.request_timeout))
+        except FutureTimeoutError:
+            # Still queued: it is dropped. Already on a pool worker: a process
+            # can't be interrupted mid-task, so it runs to completion (holding
+            # its scheduler slot) and the result is discarded
+            future.cancel()
+            self._send(504, {'error': 'Timed out waiting for a worker'})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+        service = self.server.service
+        try:
+            if url.path == '/health':
+                self._send(200, {'status': 'ok', 'uptime': time.time() - self.server.started_at})
+            elif url.path == '/metrics':
+                self._send_text(200, tracing.prometheus_text())
+            elif url.path == '/traces':
+                self._send(200, tracing.recent_spans(int(query.get('limit', 100))))
+            elif url.path == '/queue':
+                self._send(200, {'pool': self.server.scheduler.metrics()})
+            elif url.path == '/difficulty':
+                self._send(200, {
+                    'difficulty_level': service.get_difficulty(query['user_id'], query['problem_type'])
+                })
+            elif url.path == '/recommendations':
+                self._send(200, {
+                    'concepts': service.recommend_next_concepts(query['user_id'], int(query.get('n', 3)))
+                })
+            elif url.path == '/history':
+                self._send(200, service.get_history_frame(query['user_id']).to_dict(orient='records'))
+            else:
+                self._send(404, {'error': f"Unknown path: {url.path}"})
+        except KeyError as e:
+            self._send(400, {'error': f"Missing parameter: {e.args[0]}"})
+        except ValueError as e:
+            self._send(400, {'error': f"Bad request: {e}"})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        try:
+            body = self._read_json()
+            if path == '/problems':
+                self._run_in_pool(
+                    body, GENERATION_COST, _task_generate_problem,
+                    body['problem_type'],
+                    body['difficulty'],
+                    body.get('company_name'),
+                    body.get('job_description'),
+                    body.get('user_id'),
+                    # Workers don't hold users' mastery or the calibration, so the
+                    # bank lookup gets the concepts and target difficulty from here
+                    self.server.service.recommend_next_concepts(body['user_id']) if body.get('user_id') else None,
+                    self.server.service.target_difficulty(body['user_id']) if body.get('user_id') else None
+                )
+            elif path == '/executions':
+                self._run_in_pool(body, EXECUTION_COST, _task_execute_code, body['user_code'], body['problem_data'])
+            elif path == '/sessions':
+                self._send(200, self.server.service.start_session(body['user_id']))
+            elif path == '/sessions/state':
+                self._send(200, self.server.service.save_user_state(
+                    body['user_id'], body.get('current_problem_id'), body['difficulty_level'], body.get('start_time')
+                ))
+            elif path == '/sessions/problems':
+                self._send(200, self.server.service.save_problem(body['user_id'], body['problem_data']))
+            elif path == '/attempts':
+                self._send(200, self.server.service.record_attempt(body['user_id'], body['attempt']))
+            elif path == '/calibration':
+                self._send(200, self.server.service.recalibrate())
+            else:
+                self._send(404, {'error': f"Unknown path: {path}"})
+        except (KeyError, ValueError) as e:  # ValueError covers malformed JSON
+            self._send(400, {'error': f"Bad request: {e}"})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(
+    host: str = '127.0.0.1',
+    port: int = 8765,
+    workers: int = 4,
+    max_queue: int = 32,
+    request_timeout: float = 120.0,
+    llm_backend: Optional[str] = None,
+    verbose: bool = False,
+    user_quota: int = 8,
+    org_quota: int = 64
+) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = AdaptiveService()
+    server.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(llm_backend,))
+    server.scheduler = FairScheduler(
+        max_concurrency=workers,
+        max_pending=max_queue,
+        user_quota=user_quota,
+        org_quota=org_quota,
+        name='service'
+    )
+    server.request_timeout = request_timeout
+    server.started_at = time.time()
+    server.verbose = verbose
+    if llm_backend:
+        set_llm_backend(load_backend(llm_backend))
+    return server
+
+
+class ServiceClient:
+    """HTTP client exposing the same methods as AdaptiveService."""
+
+    def __init__(self, base_url: str, timeout: float = 130.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None, **query) -> Any:
+        url = f"{self.base_url}{path}"
+        if query:
+            url += '?' + urllib.parse.urlencode(query)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            error = json.loads(e.read() or b'{}').get('error', e.reason)
+            if e.code == 429:
+                raise QueueFullError(error) from e
+            raise RuntimeError(f"Service error {e.code}: {error}") from e
+
+    def health(self) -> Dict[str, Any]:
+        return self._request('GET', '/health')
+
+    def start_session(self, user_id):
+        return self._request('POST', '/sessions', {'user_id': user_id})
+
+    def scheduler_metrics(self) -> Dict[str, Any]:
+        return self._request('GET', '/queue')
+
+    def save_user_state(self, user_id, current_problem_id, difficulty_level, start_time):
+        return self._request('POST', '/sessions/state', {
+            'user_id': user_id,
+            'current_problem_id': current_problem_id,
+            'difficulty_level': difficulty_level,
+            'start_time': start_time
+        })
+
+    def save_problem(self, user_id, problem_data):
+        return self._request('POST', '/sessions/problems', {'user_id': user_id, 'problem_data': problem_data})
+
+    def get_history_frame(self, user_id):
+        import pandas as pd
+        return pd.DataFrame(self._request('GET', '/history', user_id=user_id))
+
+    def generate_problem(self, problem_type, difficulty, company_name=None, job_description=None,
+                         user_id=None, org_id=None, priority='interactive'):
+        return self._request('POST', '/problems', {
+            'problem_type': problem_type,
+            'difficulty': difficulty,
+            'company_name': company_name,
+            'job_description': job_description,
+            'user_id': user_id,
+            'org_id': org_id,
+            'priority': priority
+        })
+
+    def execute_code(self, user_code, problem_data, user_id=None, org_id=None, priority='interactive'):
+        return self._request('POST', '/executions', {
+            'user_code': user_code,
+            'problem_data': problem_data,
+            'user_id': user_id,
+            'org_id': org_id,
+            'priority': priority
+        })
+
+    def record_attempt(self, user_id, attempt):
+        return self._request('POST', '/attempts', {'user_id': user_id, 'attempt': attempt})
+
+    def recalibrate(self):
+        return self._request('POST', '/calibration', {})
+
+    def get_difficulty(self, user_id, problem_type):
+        return self._request('GET', '/difficulty', user_id=user_id, problem_type=problem_type)['difficulty_level']
+
+    def recommend_next_concepts(self, user_id, n=3):
+        return self._request('GET', '/recommendations', user_id=user_id, n=n)['concepts']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless problem generation and grading service")
+    parser.add_argument('--llm-backend', default=os.environ.get('ADAPTIVE_LLM_BACKEND'),
+                        help="LLM backend as module:function")
+    parser.add_argument('--url', help="Talk to a running service instead of working in-process")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="Run the HTTP API")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    serve.add_argument('--max-queue', type=int, default=32)
+    serve.add_argument('--timeout', type=float, default=120.0)
+    serve.add_argument('--user-quota', type=int, default=8, help="Max outstanding requests per user")
+    serve.add_argument('--org-quota', type=int, default=64, help="Max outstanding requests per organization")
+    serve.add_argument('--verbose', action='store_true')
+    serve.add_argument('--trace', action='store_true', help="Record spans for /metrics and /traces")
+    serve.add_argument('--trace-file', help="Also append spans to this JSONL file")
+
+    generate = subparsers.add_parser('generate', help="Generate a problem and print it as JSON")
+    generate.add_argument('--type', required=True, choices=['Python', 'SQL', 'Pandas'])
+    generate.add_argument('--difficulty', default='medium', choices=['easy', 'medium', 'hard'])
+    generate.add_argument('--company')
+    generate.add_argument('--job-description')
+
+    execute = subparsers.add_parser('execute', help="Grade a solution against a problem JSON file")
+    execute.add_argument('--problem', required=True, help="Path to the problem JSON")
+    execute.add_argument('--code', required=True, help="Path to the solution source")
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        if args.trace or args.trace_file:
+            # Set before the pool starts so worker processes enable tracing too
+            os.environ['ADAPTIVE_TRACING'] = '1'
+            if args.trace_file:
+                os.environ['ADAPTIVE_TRACE_FILE'] = args.trace_file
+            tracing.enable(args.trace_file)
+        server = make_server(
+            args.host, args.port, args.workers, args.max_queue, args.timeout, args.llm_backend, args.verbose,
+            args.user_quota, args.org_quota
+        )
+        print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.scheduler.shutdown(wait=False)
+            server.pool.shutdown()
+        return
+
+    if args.llm_backend:
+        set_llm_backend(load_backend(args.llm_backend))
+    service = ServiceClient(args.url) if args.url else AdaptiveService()
+    if args.command == 'generate':
+        result = service.generate_problem(args.type, args.difficulty, args.company, args.job_description)
+    else:
+        with open(args.problem) as f:
+            problem_data = json.load(f)
+        with open(args.code) as f:
+            user_code = f.read()
+        result = service.execute_code(user_code, problem_data)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from typing import List, Dict, Any, Optional
+
+class SessionStore:
+    """
+    Durable store for users' problems, attempts and session state, shared by
+    every app process through one SQLite database in WAL mode.
+
+    Attempt writes are buffered and flushed in batches (on size, age, any read
+    and interpreter exit). Reads are served from a per-user in-memory cache
+    that only fetches rows newer than the last one it has seen, so other
+    replicas' writes show up without rereading the whole history.
+    """
+
+    def __init__(
+        self,
+        db_file: str = 'data/sessions.db',
+        batch_size: int = 50,
+        flush_interval: float = 2.0
+    ):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Max seconds a buffered attempt waits
+        self._pending: List[tuple] = []
+        self._last_flush = time.monotonic()
+        self._history_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._last_attempt_id: Dict[str, int] = {}
+        self._frame_cache: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+        atexit.register(self.flush)
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS problems (
+                    problem_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_problems_user_time ON problems (user_id, created_at);
+
+                CREATE TABLE IF NOT EXISTS attempts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    problem_id TEXT NOT NULL,
+                    problem_type TEXT,
+                    difficulty TEXT NOT NULL,
+                    passed INTEGER NOT NULL,
+                    execution_time REAL NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_attempts_user_time ON attempts (user_id, created_at);
+                CREATE INDEX IF NOT EXISTS idx_attempts_user_id ON attempts (user_id, id);
+
+                CREATE TABLE IF NOT EXISTS user_state (
+                    user_id TEXT PRIMARY KEY,
+                    current_problem_id TEXT,
+                    difficulty_level TEXT,
+                    start_time REAL,
+                    updated_at REAL NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS difficulty_state (
+                    user_id TEXT NOT NULL,
+                    problem_type TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (user_id, problem_type)
+                );
+            """)
+
+    def save_problem(self, user_id: str, problem_data: Dict[str, Any]) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO problems (problem_id, user_id, payload, created_at) VALUES (?, ?, ?, ?)",
+                (problem_data['id'], user_id, json.dumps(problem_data, default=str), time.time())
+            )
+
+    def get_problem(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self.conn.execute(
+                "SELECT payload FROM problems WHERE problem_id = ?", (problem_id,)
+            ).fetchone()
+        return json.loads(record[0]) if record else None
+
+    def save_user_state(
+        self,
+        user_id: str,
+        current_problem_id: Optional[str],
+        difficulty_level: str,
+        start_time: Optional[float]
+    ) -> None:
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO user_state
+                    (user_id, current_problem_id, difficulty_level, start_time, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (user_id, current_problem_id, difficulty_level, start_time, time.time())
+            )
+
+    def load_user_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the user's saved session state with current_problem resolved, if any."""
+        with self._lock:
+            record = self.conn.execute(
+                "SELECT current_problem_id, difficulty_level, start_time FROM user_state WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        if record is None:
+            return None
+        problem_id, difficulty_level, start_time = record
+        return {
+            'current_problem': self.get_problem(problem_id) if problem_id else None,
+            'difficulty_level': difficulty_level,
+            'start_time': start_time
+        }
+
+    def save_difficulty_state(self, user_id: str, problem_type: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO difficulty_state (user_id, problem_type, state) VALUES (?, ?, ?)",
+                (user_id, problem_type, json.dumps(state))
+            )
+
+    def load_difficulty_state(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            records = self.conn.execute(
+                "SELECT problem_type, state FROM difficulty_state WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return {problem_type: json.loads(state) for problem_type, state in records}
+
+    def record_attempt(self, user_id: str, attempt: Dict[str, Any]) -> None:
+        """
+        Buffer one attempt (difficulty, passed, execution_time, problem_id and
+        optionally type). It is written with the next batch.
+        """
+        with self._lock:
+            self._pending.append((
+                user_id,
+                attempt['problem_id'],
+                attempt.get('type'),
+                attempt['difficulty'],
+                int(bool(attempt['passed'])),
+                float(attempt['execution_time']),
+                attempt.get('created_at', time.time())
+            ))
+            if (
+                len(self._pending) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered attempts in a single transaction."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.executemany(
+                    """
+                    INSERT INTO attempts
+                        (user_id, problem_id, problem_type, difficulty, passed, execution_time, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    pending
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                self._pending = pending + self._pending
+                raise
+
+    def _new_attempts(self, user_id: str) -> List[Dict[str, Any]]:
+        """Fetch attempts written since the last read of this user's history."""
+        self.flush()
+        records = self.conn.execute(
+            """
+            SELECT id, problem_id, problem_type, difficulty, passed, execution_time, created_at
+            FROM attempts WHERE user_id = ? AND id > ? ORDER BY id
+            """,
+            (user_id, self._last_attempt_id.get(user_id, 0))
+        ).fetchall()
+        if records:
+            self._last_attempt_id[user_id] = records[-1][0]
+        return [
+            {
+                'problem_id': problem_id,
+                'type': problem_type,
+                'difficulty': difficulty,
+                'passed': bool(passed),
+                'execution_time': execution_time,
+                'created_at': created_at
+            }
+            for _, problem_id, problem_type, difficulty, passed, execution_time, created_at in records
+        ]
+
+    def get_history(self, user_id: str) -> List[Dict[str, Any]]:
+        """The user's attempts in order, in the problems_history format."""
+        with self._lock:
+            new = self._new_attempts(user_id)
+            history = self._history_cache.setdefault(user_id, [])
+            history.extend(new)
+            if new and user_id in self._frame_cache:
+                self._frame_cache[user_id] = pd.concat(
+                    [self._frame_cache[user_id], pd.DataFrame(new)], ignore_index=True
+                )
+            return history
+
+    def get_history_frame(self, user_id: str) -> pd.DataFrame:
+        """The user's attempts as a DataFrame, extended incrementally between calls."""
+        with self._lock:
+            history = self.get_history(user_id)
+            if user_id not in self._frame_cache:
+                self._frame_cache[user_id] = pd.DataFrame(history)
+            return self._frame_cache[user_id]
+
+    def get_attempts_frame(self) -> pd.DataFrame:
+        """Every user's attempts (user_id, problem_id, difficulty, passed, execution_time), e.g. for calibration."""
+        with self._lock:
+            self.flush()
+            return pd.read_sql_query(
+                "SELECT user_id, problem_id, difficulty, passed, execution_time FROM attempts ORDER BY id",
+                self.conn
+            )
+
+    def close(self) -> None:
+        self.flush()
+        atexit.unregister(self.flush)
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+from utils.difficulty_analyzer import DifficultyAnalyzer
+from utils.embeddings import EmbeddingsManager
+from utils.llm import set_llm_backend
+from utils.problem_bank import ProblemBank
+from utils.problem_generator import ProblemGenerator
+
+PROBLEM_TYPES = ['Python', 'SQL', 'Pandas']
+
+TYPE_CONCEPTS = {
+    'Python': ['arrays', 'strings', 'hash_maps', 'sorting', 'recursion', 'two_pointers',
+               'dynamic_programming', 'graph_traversal', 'trees', 'heaps'],
+    'SQL': ['basic_sql', 'joins', 'aggregations', 'subqueries', 'ctes', 'window_functions',
+            'advanced_sql', 'indexing'],
+    'Pandas': ['data_cleaning', 'merging', 'aggregations', 'pivoting', 'time_series',
+               'vectorization']
+}
+
+# Position of each difficulty level on the same [0, 1] scale as learner skill
+LEVEL_VALUES = {'easy': 1 / 6, 'medium': 0.5, 'hard': 5 / 6}
+
+TITLE_WORDS = ['order', 'customer', 'inventory', 'ledger', 'session', 'route', 'schedule',
+               'invoice', 'sensor', 'playlist', 'shipment', 'review', 'budget', 'cohort']
+
+
+class StubLLM:
+    """Deterministic offline stand-in for the LLM that returns well-formed problem JSON."""
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        problem_type = next((t for t in PROBLEM_TYPES if f'"type": "{t}"' in prompt), None)
+        if problem_type is None:
+            return "column_a,column_b\n1,2\n"
+
+        difficulty = next((d for d in LEVEL_VALUES if f"Difficulty: {d}" in prompt), 'medium')
+        words = self.rng.sample(TITLE_WORDS, 3)
+        concepts = self.rng.sample(TYPE_CONCEPTS[problem_type], 3)
+        return json.dumps({
+            'id': 'unique_id',
+            'type': problem_type,
+            'difficulty': difficulty,
+            'title': ' '.join(words).title(),
+            'description': f"Process {' and '.join(words)} records using {', '.join(concepts)}.",
+            'function_name': 'solve',
+            'constraints': [],
+            'examples': [],
+            'test_cases': [{'input': [1], 'output': 1}],
+            'hints': [],
+            'edge_cases': [],
+            'concepts_tested': concepts
+        })
+
+
+class SyntheticLearner:
+    """A learner with a latent skill per problem type and per concept, in [0, 1]."""
+
+    def __init__(self, learner_id: str, rng: np.random.Generator):
+        self.learner_id = learner_id
+        self.type_skill = {t: float(rng.beta(2, 2)) for t in PROBLEM_TYPES}
+        self.concept_skill = {
+            concept: float(np.clip(rng.normal(0, 0.1), -0.2, 0.2))
+            for concepts in TYPE_CONCEPTS.values() for concept in concepts
+        }
+        self.speed = float(rng.lognormal(0, 0.3))  # >1 is slower than typical
+        self.rng = rng
+
+    def attempt(self, problem: Dict[str, Any], concepts: List[str], time_weights: Dict) -> Dict[str, Any]:
+        """Simulate solving a problem: pass probability falls as difficulty exceeds skill."""
+        skill = self.type_skill[problem['type']]
+        if concepts:
+            skill += np.mean([self.concept_skill.get(c, 0.0) for c in concepts])
+        gap = LEVEL_VALUES[problem['difficulty']] - skill
+        passed = self.rng.random() < 1.0 / (1.0 + np.exp(8.0 * gap))
+
+        thresholds = time_weights[problem['difficulty']]
+        typical = (thresholds['fast'] + thresholds['slow']) / 2
+        execution_time = typical * self.speed * np.exp(2.0 * gap) * self.rng.lognormal(0, 0.2)
+        return {'passed': bool(passed), 'execution_time': float(execution_time)}
+
+
+class AdaptiveLoopSimulator:
+    """
+    Replays synthetic learner sessions through DifficultyAnalyzer,
+    EmbeddingsManager and ProblemGenerator's bank-first problem selection,
+    timing each component.
+    """
+
+    def __init__(
+        self,
+        n_learners: int = 1000,
+        attempts_per_learner: int = 30,
+        problems_per_cell: int = 20,
+        seed: int = 0,
+        data_dir: Optional[str] = None
+    ):
+        self.n_learners = n_learners
+        self.attempts_per_learner = attempts_per_learner
+        self.problems_per_cell = problems_per_cell  # Bank size per (type, difficulty)
+        self.rng = np.random.default_rng(seed)
+        self.stub_llm = StubLLM(seed)
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix='adaptive_sim_')
+        self.timings: Dict[str, List[float]] = {}
+
+    def _timed(self, component: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.timings.setdefault(component, []).append(time.perf_counter() - start)
+        return result
+
+    def _build_generator(self, embeddings: EmbeddingsManager, problem_bank: ProblemBank) -> ProblemGenerator:
+        generator = ProblemGenerator(embeddings_manager=embeddings, problem_bank=problem_bank)
+        generator.duplicate_threshold = 0.999
+        # SQL/Pandas generation writes datasets to disk; the simulation only needs their specs
+        for problem_type in ('SQL', 'Pandas'):
+            generator.problem_types[problem_type] = self._spec_generator(problem_type)
+        return generator
+
+    def _spec_generator(self, problem_type: str):
+        def generate(difficulty, company_name, job_description, avoid=None):
+            problem = json.loads(self.stub_llm(f'"type": "{problem_type}" Difficulty: {difficulty}'))
+            problem['id'] = f"{problem_type}-{difficulty}-{self.stub_llm.calls}"
+            return problem
+        return generate
+
+    def _build_bank(self, generator: ProblemGenerator) -> None:
+        """Fill the problem bank through ProblemGenerator with the stub LLM."""
+        for problem_type in PROBLEM_TYPES:
+            for difficulty in LEVEL_VALUES:
+                for _ in range(self.problems_per_cell):
+                    self._timed('generate_problem', generator.generate_problem, problem_type, difficulty)
+
+    def run(self) -> Dict[str, Any]:
+        set_llm_backend(self.stub_llm)
+        embeddings = EmbeddingsManager(data_dir=f"{self.data_dir}/embeddings")
+        problem_bank = ProblemBank(f"{self.data_dir}/problem_bank.db")
+        analyzer = DifficultyAnalyzer()
+        generator = self._build_generator(embeddings, problem_bank)
+        self._build_bank(generator)
+        bank_calls = self.stub_llm.calls
+
+        learners = [SyntheticLearner(f"learner-{i}", self.rng) for i in range(self.n_learners)]
+        histories: Dict[str, List[Dict[str, Any]]] = {l.learner_id: [] for l in learners}
+        errors = np.zeros((self.attempts_per_learner, self.n_learners))
+
+        start = time.perf_counter()
+        for step in range(self.attempts_per_learner):
+            for col, learner in enumerate(learners):
+                user_id = learner.learner_id
+                problem_type = PROBLEM_TYPES[int(self.rng.integers(len(PROBLEM_TYPES)))]
+
+                difficulty = self._timed('get_difficulty', analyzer.get_difficulty, user_id, problem_type)
+                recommended = self._timed('recommend_next_concepts', embeddings.recommend_next_concepts, user_id)
+                # Served from the bank when the learner has an unseen problem
+                # at this level, generated otherwise
+                problem = self._timed(
+                    'select_problem', generator.generate_problem,
+                    problem_type, difficulty, user_id=user_id, concepts=recommended
+                )
+                problem_id = problem['id']
+
+                outcome = learner.attempt(problem, embeddings.get_problem_concepts(problem_id), analyzer.time_weights)
+                histories[user_id].append({
+                    'difficulty': difficulty,
+                    'passed': outcome['passed'],
+                    'execution_time': outcome['execution_time'],
+                    'problem_id': problem_id
+                })
+
+                self._timed('calculate_next_difficulty', analyzer.calculate_next_difficulty, histories[user_id])
+                self._timed(
+                    'record_attempt', analyzer.record_attempt,
+                    user_id, problem_type, difficulty, outcome['passed'], outcome['execution_time']
+                )
+                self._timed('record_concepts', embeddings.record_attempt, user_id, problem_id, outcome['passed'])
+                self._timed('get_concept_coverage', embeddings.get_concept_coverage, user_id)
+
+                errors[step, col] = np.mean([
+                    abs(analyzer.get_difficulty_score(user_id, t) - learner.type_skill[t])
+                    for t in PROBLEM_TYPES
+                ])
+        elapsed = time.perf_counter() - start
+        misses = self.stub_llm.calls - bank_calls
+        problem_bank.close()
+        embeddings.store.close()
+
+        return self._report(elapsed, errors, misses)
+
+    def _report(
+        self,
+        elapsed: float,
+        errors: np.ndarray,
+        bank_misses: int = 0,
+        tolerance: float = 0.15
+    ) -> Dict[str, Any]:
+        decisions = self.n_learners * self.attempts_per_learner
+        mean_error = errors.mean(axis=1)
+        within = np.flatnonzero(mean_error <= tolerance)
+        return {
+            'learners': self.n_learners,
+            'attempts_per_learner': self.attempts_per_learner,
+            'decisions_per_second': decisions / elapsed,
+            'latency_ms': {
+                component: {
+                    'p50': float(np.percentile(samples, 50) * 1000),
+                    'p99': float(np.percentile(samples, 99) * 1000),
+                    'calls': len(samples)
+                }
+                for component, samples in self.timings.items()
+            },
+            'convergence': {
+                'mean_abs_error_by_attempt': [round(float(e), 4) for e in mean_error],
+                'final_mean_abs_error': float(mean_error[-1]),
+                'attempts_to_tolerance': int(within[0]) + 1 if len(within) else None,
+                'tolerance': tolerance
+            },
+            'llm_calls': self.stub_llm.calls,
+            'bank_miss_llm_calls': bank_misses
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate synthetic learners through the adaptive loop")
+    parser.add_argument('--learners', type=int, default=1000)
+    parser.add_argument('--attempts', type=int, default=30)
+    parser.add_argument('--problems-per-cell', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = AdaptiveLoopSimulator(
+        n_learners=args.learners,
+        attempts_per_learner=args.attempts,
+        problems_per_cell=args.problems_per_cell,
+        seed=args.seed
+    ).run()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
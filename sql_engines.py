@@ -0,0 +1,334 @@
+import re
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional
+
+try:
+    import duckdb
+except ImportError:  # Optional dependency; only needed for sql_engine='duckdb'
+    duckdb = None
+
+# Efficiency-score penalties for plan features the reference query avoids
+PLAN_PENALTIES = {
+    'correlated_subquery': 20,
+    'missing_index': 15,
+    'full_scan': 5,
+    'temp_btree': 5
+}
+# FROM/JOIN <source> [AS] <alias>; the plan names scans by alias
+_SOURCE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?', re.IGNORECASE)
+_NOT_ALIASES = {
+    'where', 'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural', 'on', 'using',
+    'group', 'order', 'limit', 'having', 'window', 'union', 'intersect', 'except', 'as'
+}
+PROGRESS_STEP = 1000  # SQLite VM instructions between progress-handler calls
+
+# Engine to use for a problem that names a dialect but no engine
+DIALECT_ENGINES = {
+    'sqlite': 'sqlite',
+    'duckdb': 'duckdb',
+    'postgres': 'duckdb'  # DuckDB's SQL is PostgreSQL-flavoured
+}
+
+
+class SQLEngine:
+    """
+    In-process database a SQL problem is graded against. Subclasses load the
+    problem's tables from files, run the user's query and compare its result
+    with the expected output.
+    """
+
+    name = ''
+    dialect = ''
+
+    def load_tables(self, sample_data: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def query(self, sql: str):
+        raise NotImplementedError
+
+    def load_expected(self, path: str):
+        raise NotImplementedError
+
+    def results_match(self, result, expected) -> bool:
+        raise NotImplementedError
+
+    def profile(self, sql: str) -> Optional[Dict[str, Any]]:
+        """
+        Execution stats and plan analysis of the most recent query(sql), or
+        None if the engine doesn't support it.
+        """
+        return None
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _read_table_file(path: str) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class SQLiteEngine(SQLEngine):
+    """The original grading path: tables loaded through pandas into in-memory SQLite."""
+
+    name = 'sqlite'
+    dialect = 'sqlite'
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.last_run: Dict[str, Any] = {}
+
+    def load_tables(self, sample_data: List[Dict[str, Any]]) -> None:
+        for table_info in sample_data:
+            df = _read_table_file(table_info['file'])
+            df.to_sql(table_info['table_name'], self.conn, index=False)
+            # Problems may declare indexes, e.g. "indexes": [["customer_id"], ["region", "date"]]
+            for columns in table_info.get('indexes', []):
+                index_name = f"idx_{table_info['table_name']}_{'_'.join(columns)}"
+                self.conn.execute(
+                    f"CREATE INDEX {_quote_identifier(index_name)} ON {_quote_identifier(table_info['table_name'])} "
+                    f"({', '.join(_quote_identifier(column) for column in columns)})"
+                )
+
+    def query(self, sql: str) -> pd.DataFrame:
+        """Run the query, recording elapsed time and VM steps (a proxy for rows scanned) in last_run."""
+        steps = [0]
+
+        def count_steps():
+            steps[0] += 1
+            return 0
+
+        self.conn.set_progress_handler(count_steps, PROGRESS_STEP)
+        start = time.perf_counter()
+        try:
+            result = pd.read_sql_query(sql, self.conn)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.conn.set_progress_handler(None, 0)
+        self.last_run = {
+            'sql': sql,
+            'elapsed_ms': elapsed * 1000,
+            'vm_steps': steps[0] * PROGRESS_STEP,
+            'result_rows': len(result)
+        }
+        return result
+
+    def explain(self, sql: str) -> List[Dict[str, Any]]:
+        """EXPLAIN QUERY PLAN rows as {id, parent, detail}."""
+        return [
+            {'id': node_id, 'parent': parent, 'detail': detail}
+            for node_id, parent, _, detail in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}")
+        ]
+
+    def profile(self, sql: str) -> Dict[str, Any]:
+        if self.last_run.get('sql') != sql:
+            self.query(sql)
+        plan = self.explain(sql)
+        stats = {key: value for key, value in self.last_run.items() if key != 'sql'}
+        stats['plan'] = [node['detail'] for node in plan]
+        stats.update(analyze_sqlite_plan(plan, sql_aliases(sql)))
+        return stats
+
+    def load_expected(self, path: str) -> pd.DataFrame:
+        return _read_table_file(path)
+
+    def results_match(self, result: pd.DataFrame, expected: pd.DataFrame) -> bool:
+        return result.equals(expected)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _quote_identifier(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+class DuckDBEngine(SQLEngine):
+    """
+    Columnar in-process engine. Tables are views over read_csv_auto /
+    read_parquet, so files are scanned directly (in parallel, only the
+    columns a query needs) with no pandas round trip. Results are Arrow
+    tables.
+    """
+
+    name = 'duckdb'
+    dialect = 'duckdb'
+
+    def __init__(self, threads: Optional[int] = None):
+        if duckdb is None:
+            raise RuntimeError("The duckdb SQL engine needs the 'duckdb' and 'pyarrow' packages installed")
+        self.conn = duckdb.connect(':memory:')
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+
+    def _scan(self, path: str) -> str:
+        reader = 'read_parquet' if path.endswith('.parquet') else 'read_csv_auto'
+        return f"{reader}({_quote_literal(path)})"
+
+    def load_tables(self, sample_data: List[Dict[str, Any]]) -> None:
+        for table_info in sample_data:
+            self.conn.execute(
+                f"CREATE VIEW {_quote_identifier(table_info['table_name'])} AS "
+                f"SELECT * FROM {self._scan(table_info['file'])}"
+            )
+
+    def query(self, sql: str):
+        return self.conn.execute(sql).arrow()
+
+    def load_expected(self, path: str):
+        return self.conn.execute(f"SELECT * FROM {self._scan(path)}").arrow()
+
+    def results_match(self, result, expected) -> bool:
+        """
+        Same column names and row order, with values compared by type family:
+        numbers numerically (aggregates widen types, e.g. SUM to HUGEINT) and
+        everything else as text, since the expected CSV's types are inferred.
+        """
+        if result.column_names != expected.column_names or result.num_rows != expected.num_rows:
+            return False
+        for name in result.column_names:
+            actual = pd.Series(result.column(name).to_pylist(), dtype=object)
+            wanted = pd.Series(expected.column(name).to_pylist(), dtype=object)
+            actual_numbers = pd.to_numeric(actual, errors='coerce')
+            wanted_numbers = pd.to_numeric(wanted, errors='coerce')
+            numeric = actual_numbers.notna() | actual.isna()
+            if numeric.all() and (wanted_numbers.notna() | wanted.isna()).all():
+                if not np.allclose(
+                    actual_numbers.to_numpy(dtype=float), wanted_numbers.to_numpy(dtype=float), equal_nan=True
+                ):
+                    return False
+            elif not actual.astype(str).equals(wanted.astype(str)):
+                return False
+        return True
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def sql_aliases(sql: str) -> Dict[str, str]:
+    """Map the aliases in a query's FROM/JOIN clauses to the tables, views or CTEs they name."""
+    aliases = {}
+    for source, alias in _SOURCE_ALIAS.findall(sql):
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = source
+    return aliases
+
+
+def analyze_sqlite_plan(plan: List[Dict[str, Any]], aliases: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Flag inefficiencies in an EXPLAIN QUERY PLAN:
+    - full scans: SCAN of a table without an index, as opposed to a SEARCH,
+      a constant row or a scan of a subquery's or CTE's result (aliases maps
+      plan names back to their sources; see sql_aliases)
+    - missing index use: a full scan repeated per outer row (an inner join
+      loop or inside a correlated subquery), or an automatic index SQLite
+      had to build on the fly
+    - temp B-trees built for GROUP BY / ORDER BY / DISTINCT
+    - correlated subqueries, re-run for each outer row
+    """
+    aliases = aliases or {}
+    full_scans, missing_index, temp_btrees, correlated = [], [], [], []
+    correlated_ids = set()
+    subqueries = set()  # Results of FROM subqueries and CTEs, named by CO-ROUTINE / MATERIALIZE
+    loops_seen: Dict[int, int] = {}  # Table loops already opened under each parent
+    for node in plan:
+        detail = node['detail']
+        words = detail.split()
+        if detail.startswith('CORRELATED '):
+            correlated.append(detail)
+            correlated_ids.add(node['id'])
+        elif detail.startswith('USE TEMP B-TREE FOR '):
+            temp_btrees.append(detail[len('USE TEMP B-TREE FOR '):])
+        elif words and words[0] in ('CO-ROUTINE', 'MATERIALIZE') and len(words) > 1:
+            subqueries.add(words[1])
+        elif words and words[0] in ('SCAN', 'SEARCH') and 'CONSTANT ROW' not in detail:
+            table = words[1] if len(words) > 1 else ''
+            inner = loops_seen.get(node['parent'], 0) > 0 or node['parent'] in correlated_ids
+            loops_seen[node['parent']] = loops_seen.get(node['parent'], 0) + 1
+            if 'AUTOMATIC' in detail:
+                missing_index.append(detail)
+            elif words[0] == 'SCAN' and 'INDEX' not in words[2:]:
+                source = aliases.get(table, table)
+                if table in subqueries or source in subqueries:
+                    continue
+                full_scans.append(source)
+                if inner:
+                    missing_index.append(detail)
+    return {
+        'full_scans': full_scans,
+        'missing_index': missing_index,
+        'temp_btrees': temp_btrees,
+        'correlated_subqueries': correlated
+    }
+
+
+def _plan_flags(stats: Dict[str, Any]) -> Dict[str, int]:
+    return {
+        'correlated_subquery': len(stats['correlated_subqueries']),
+        'missing_index': len(stats['missing_index']),
+        'full_scan': len(stats['full_scans']),
+        'temp_btree': len(stats['temp_btrees'])
+    }
+
+
+def efficiency_score(stats: Dict[str, Any], reference: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Score (0-100) a submission's efficiency. With a reference query's stats,
+    the base loses a third for every tenfold more VM steps than the
+    reference, and only plan issues beyond the reference's are penalised;
+    without one, every flagged issue is.
+    """
+    flags = _plan_flags(stats)
+    baseline = _plan_flags(reference) if reference else {}
+    base = 100.0
+    if reference:
+        ratio = max(stats['vm_steps'], PROGRESS_STEP) / max(reference['vm_steps'], PROGRESS_STEP)
+        base = 100.0 * max(0.0, 1.0 - np.log10(max(ratio, 1.0)) / 3)
+    penalties = {
+        flag: PLAN_PENALTIES[flag] * (count - baseline.get(flag, 0))
+        for flag, count in flags.items()
+        if count > baseline.get(flag, 0)
+    }
+    return {
+        'score': max(0, round(base - sum(penalties.values()))),
+        'step_ratio': stats['vm_steps'] / max(reference['vm_steps'], 1) if reference else None,
+        'penalties': penalties
+    }
+
+
+SQL_ENGINES = {
+    'sqlite': SQLiteEngine,
+    'duckdb': DuckDBEngine
+}
+
+
+def register_sql_engine(name: str, engine_class) -> None:
+    """Make an SQLEngine subclass selectable through problem_data['sql_engine']."""
+    SQL_ENGINES[name] = engine_class
+
+
+def engine_for_problem(problem_data: Dict[str, Any]) -> str:
+    """The engine name a problem asks for: sql_engine, else by sql_dialect, else sqlite."""
+    engine = problem_data.get('sql_engine')
+    if engine:
+        return engine
+    return DIALECT_ENGINES.get(problem_data.get('sql_dialect', 'sqlite'), 'sqlite')
+
+
+def available_engines() -> List[str]:
+    return [name for name, engine in SQL_ENGINES.items() if engine is not DuckDBEngine or duckdb is not None]
@@ -0,0 +1,39 @@
+import sys
+import threading
+import time
+import pytest
+from utils.code_executor import CodeExecutor
+
+PYTHON_PROBLEM = {
+    'type': 'Python',
+    'function_name': 'add',
+    'test_cases': [{'input': [1, 2], 'output': 3}]
+}
+
+
+@pytest.fixture
+def executor():
+    return CodeExecutor(snapshots=False)
+
+
+def test_python_submission_passes(executor):
+    assert executor.execute_code("def add(a, b):\n    return a + b", PYTHON_PROBLEM) == {'success': True}
+
+
+def test_concurrent_submissions_capture_their_own_output(executor, capsys):
+    code = "import time\nprint('noise')\ntime.sleep(0.3)\ndef add(a, b):\n    return a + b"
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(executor.execute_code(code, PYTHON_PROBLEM)))
+        for _ in range(4)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Runs overlap rather than queueing behind a process-wide lock
+    assert time.monotonic() - start < 1.0
+    assert results == [{'success': True}] * 4
+    print('after', file=sys.stdout)
+    assert capsys.readouterr().out == 'after\n'
@@ -0,0 +1,60 @@
+import random
+import pytest
+from utils.cohort_analytics import CohortAnalytics
+from utils.difficulty_analyzer import DifficultyAnalyzer
+
+
+def _attempt(difficulty, passed, execution_time):
+    return {'difficulty': difficulty, 'passed': passed, 'execution_time': execution_time}
+
+
+def _random_histories(n_users, seed=0):
+    rng = random.Random(seed)
+    return {
+        f"u{i}": [
+            _attempt(rng.choice(['easy', 'medium', 'hard']), rng.random() < 0.6, rng.uniform(10, 900))
+            for _ in range(rng.randint(0, 12))
+        ]
+        for i in range(n_users)
+    }
+
+
+def test_summary_and_trends_per_user():
+    histories = {
+        'improving': [_attempt('easy', passed, 100.0) for passed in (False, False, False, True, True, True)],
+        'declining': [_attempt('hard', passed, 300.0) for passed in (True, True, True, False, False, False)],
+        'new': [_attempt('medium', True, 50.0), _attempt('hard', False, 150.0)]
+    }
+    results = CohortAnalytics().analyze(CohortAnalytics.from_histories(histories))
+    summary = results['summary']
+    assert summary['performance_trend'].to_dict() == {
+        'declining': 'declining', 'improving': 'improving', 'new': 'not_enough_data'
+    }
+    assert summary.loc['new', 'total_problems'] == 2
+    assert summary.loc['new', 'average_time'] == 100.0
+    assert summary.loc['improving', 'success_rate'] == 0.5
+
+    distribution = results['difficulty_distribution']
+    new = distribution[distribution['user_id'] == 'new'].set_index('difficulty')
+    assert new['count'].to_dict() == {'medium': 1, 'hard': 1}
+    assert new['success_rate'].to_dict() == {'medium': 1.0, 'hard': 0.0}
+
+
+def test_user_report_matches_the_per_user_analyzer():
+    histories = _random_histories(40)
+    analytics = CohortAnalytics()
+    results = analytics.analyze(CohortAnalytics.from_histories(histories))
+    analyzer = DifficultyAnalyzer()
+    for user_id, history in histories.items():
+        report = analytics.user_report(results, user_id)
+        if not history:
+            assert report is None
+            continue
+        expected = analyzer.analyze_performance_patterns(history)
+        assert report['total_problems'] == expected['total_problems']
+        assert report['success_rate'] == pytest.approx(expected['success_rate'])
+        assert report['average_time'] == pytest.approx(expected['average_time'])
+        assert report['performance_trend'] == expected['performance_trend']
+        assert report['difficulty_distribution'].keys() == expected['difficulty_distribution'].keys()
+        for difficulty, cell in expected['difficulty_distribution'].items():
+            assert report['difficulty_distribution'][difficulty] == pytest.approx(cell)
@@ -0,0 +1,32 @@
+import numpy as np
+from utils.concept_mastery import ConceptVocabulary, MasteryTracker
+
+
+def test_mastery_counts_only_after_min_attempts():
+    vocabulary = ConceptVocabulary()
+    tracker = MasteryTracker(vocabulary, min_attempts=3)
+    joins, ctes = vocabulary.get_ids(['joins', 'ctes'])
+    for passed in (True, False):
+        tracker.record('u1', np.array([joins, ctes]), passed)
+    tracker.record('u1', np.array([joins]), True)
+    assert np.allclose(tracker.mastery('u1'), [2 / 3, 0.0])
+    assert tracker.attempted('u1').tolist() == [True, True]
+    assert not tracker.has_history('u2')
+    assert tracker.mastery('u2').tolist() == [0.0, 0.0]
+
+
+def test_counters_grow_with_the_vocabulary():
+    vocabulary = ConceptVocabulary()
+    tracker = MasteryTracker(vocabulary, min_attempts=1)
+    tracker.record('u1', vocabulary.get_ids(['arrays']), True)
+    # Concepts added after the user's arrays were sized
+    new_ids = vocabulary.get_ids([f"concept_{i}" for i in range(10)])
+    assert vocabulary.get_id('arrays') == 0 and len(vocabulary) == 11
+    assert tracker.mastery('u1').tolist() == [1.0] + [0.0] * 10
+    tracker.record('u1', new_ids[-1:], False)
+    assert tracker.attempted('u1').nonzero()[0].tolist() == [0, 10]
+    assert tracker.mastery('u1')[10] == 0.0
+
+    tracker.reset('u1')
+    assert not tracker.has_history('u1')
+    assert not tracker.attempted('u1').any()
@@ -0,0 +1,56 @@
+import pytest
+from utils.difficulty_analyzer import DifficultyAnalyzer, OnlineDifficultyModel
+
+
+def _levels(analyzer, problem_type, attempts, passed, execution_time):
+    levels = []
+    for _ in range(attempts):
+        difficulty = analyzer.get_difficulty('u1', problem_type)
+        analyzer.record_attempt('u1', problem_type, difficulty, passed, execution_time)
+        levels.append(analyzer.get_difficulty('u1', problem_type))
+    return levels
+
+
+def test_run_of_fast_passes_moves_up_one_level_at_a_time():
+    analyzer = DifficultyAnalyzer()
+    assert analyzer.get_difficulty('u1', 'SQL') == 'medium'
+    levels = _levels(analyzer, 'SQL', 12, passed=True, execution_time=30)
+    # Smoothed: a single pass doesn't change the level, a sustained run does
+    assert levels[0] == 'medium'
+    assert levels[-1] == 'hard'
+    assert levels == sorted(levels, key=['medium', 'hard'].index)
+    # Other types and users keep their own tracks
+    assert analyzer.get_difficulty('u1', 'Python') == 'medium'
+    assert analyzer.get_difficulty('u2', 'SQL') == 'medium'
+
+
+def test_run_of_slow_failures_moves_down():
+    analyzer = DifficultyAnalyzer()
+    levels = _levels(analyzer, 'Pandas', 12, passed=False, execution_time=3600)
+    assert levels[0] == 'medium' and levels[-1] == 'easy'
+
+
+def test_update_is_bounded_by_the_learning_rate():
+    model = OnlineDifficultyModel(learning_rate=0.15)
+    score = model.initial_score
+    for _ in range(50):
+        new_score = model.update('u1', 'SQL', True, 1.0)
+        assert 0 <= new_score - score <= 0.15
+        score = new_score
+    assert score == 1.0
+    assert model.get_tracks('u1')['SQL']['count'] == 50
+
+
+def test_state_round_trips_through_disk(tmp_path):
+    analyzer = DifficultyAnalyzer()
+    _levels(analyzer, 'SQL', 5, passed=True, execution_time=30)
+    _levels(analyzer, 'Python', 3, passed=False, execution_time=900)
+    path = tmp_path / 'difficulty.json'
+    analyzer.save_state(str(path))
+
+    restored = DifficultyAnalyzer(state_file=str(path))
+    for problem_type in ('SQL', 'Python', 'Pandas'):
+        assert restored.get_difficulty_score('u1', problem_type) == pytest.approx(
+            analyzer.get_difficulty_score('u1', problem_type)
+        )
+    assert restored.online_model.get_tracks('u1') == analyzer.online_model.get_tracks('u1')
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from utils.embedding_store import EmbeddingStore
+from utils.embeddings import EmbeddingsManager
+
+
+def _problem(problem_id, title, description, concepts, problem_type='SQL'):
+    return {
+        'id': problem_id,
+        'type': problem_type,
+        'difficulty': 'medium',
+        'title': title,
+        'description': description,
+        'concepts_tested': concepts
+    }
+
+
+ORDERS = ('Top customers', 'Rank customers by total order amount per region.', ['joins', 'aggregations'])
+INVENTORY = ('Restock report', 'List products whose stock fell below the reorder level.', ['filtering'])
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = EmbeddingsManager(data_dir=str(tmp_path / 'embeddings'))
+    yield manager
+    manager.store.close()
+
+
+def test_retired_rows_are_not_reused(tmp_path):
+    store = EmbeddingStore(str(tmp_path / 'embeddings'), dim=4)
+    vectors = np.eye(4, dtype=np.float32)
+    assert store.append_batch([{'id': 'a'}, {'id': 'b'}], vectors[:2], [[], []]) == [0, 1]
+    store.retire(['b'])
+    assert store.append({'id': 'c'}, vectors[2], []) == 2
+    assert [record[1] for record in store.iter_metadata(1)] == ['c']
+    assert np.array_equal(store.vectors()[2], vectors[2])
+    store.close()
+
+
+def test_live_manager_sees_problems_added_after_a_merge(manager, tmp_path):
+    manager.add_problems([_problem('a', *ORDERS), _problem('b', *ORDERS)])
+    assert manager.merge_near_duplicates() == {'b': 'a'}
+
+    manager.add_problem(_problem('c', *INVENTORY))
+
+    assert 'c' in manager.index
+    assert 'b' not in manager.index
+    fresh = EmbeddingsManager(data_dir=str(tmp_path / 'embeddings'))
+    assert 'c' in fresh.index
+    fresh.store.close()
+
+
+def test_duplicate_detection_works_after_a_merge(manager):
+    manager.add_problems([_problem('a', *ORDERS), _problem('b', *ORDERS)])
+    manager.merge_near_duplicates()
+    manager.add_problems([_problem('c', *INVENTORY), _problem('d', *INVENTORY, problem_type='Pandas')])
+
+    assert manager.find_duplicate(_problem('new', *INVENTORY)) == 'c'
+    assert [p['id'] for p in manager.find_similar_problems('c', n=1, exact=True)] == ['d']
+    assert [p['id'] for p in manager.find_similar_problems('c', n=1)] == ['d']
@@ -0,0 +1,40 @@
+import pytest
+from utils.problem_bank import ProblemBank
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = ProblemBank(str(tmp_path / 'problem_bank.db'))
+    yield bank
+    bank.close()
+
+
+def _add(bank, problem_id, difficulty='medium'):
+    bank.add_problem({'id': problem_id, 'type': 'SQL', 'difficulty': difficulty, 'title': problem_id})
+
+
+def test_find_unseen_prefers_closest_calibrated_difficulty(bank):
+    for problem_id in ('a', 'b', 'c'):
+        _add(bank, problem_id)
+    bank.set_calibration({'a': -1.5, 'b': 0.2, 'c': 1.4}, {'a': 'medium', 'b': 'medium', 'c': 'medium'})
+
+    assert bank.find_unseen('u1', 'SQL', 'medium', target_difficulty=1.0)['id'] == 'c'
+    assert bank.find_unseen('u1', 'SQL', 'medium', target_difficulty=-1.0)['id'] == 'a'
+    # Without a target, the least served (then oldest) problem wins
+    assert bank.find_unseen('u1', 'SQL', 'medium')['id'] == 'a'
+
+
+def test_calibrated_level_overrides_generated_label(bank):
+    _add(bank, 'labelled_hard', difficulty='hard')
+    _add(bank, 'labelled_easy', difficulty='easy')
+    bank.set_calibration({'labelled_hard': -2.0}, {'labelled_hard': 'easy'})
+
+    assert bank.find_unseen('u1', 'SQL', 'hard') is None
+    assert bank.find_unseen('u1', 'SQL', 'easy', target_difficulty=-2.0)['id'] == 'labelled_hard'
+
+
+def test_find_unseen_skips_served_problems(bank):
+    _add(bank, 'a')
+    bank.mark_seen('u1', 'a')
+    assert bank.find_unseen('u1', 'SQL', 'medium') is None
+    assert bank.find_unseen('u2', 'SQL', 'medium')['id'] == 'a'
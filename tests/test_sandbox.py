@@ -0,0 +1,75 @@
+import time
+import pandas as pd
+import pytest
+from utils import code_executor, sandbox
+from utils.code_executor import CodeExecutor
+
+pytestmark = pytest.mark.skipif(not sandbox.supported(), reason="Snapshots need fork and forkserver")
+
+
+# Templates pickle prepare and grade by reference, so they live at module level
+def _prepare(problem_data):
+    return {'value': problem_data['value']}
+
+
+def _prepare_failing(problem_data):
+    raise ValueError('cannot load problem')
+
+
+def _grade(state, user_code):
+    namespace = dict(state)
+    exec(user_code, namespace)
+    return {'success': True, 'result': namespace.get('result')}
+
+
+@pytest.fixture
+def pool():
+    pool = sandbox.SnapshotPool(timeout=1, max_templates=2)
+    yield pool
+    pool.close()
+
+
+def test_overdue_run_is_killed_and_the_template_keeps_serving(pool):
+    start = time.monotonic()
+    result = pool.run('p1', {'value': 1}, "while True:\n    pass", _prepare, _grade)
+    assert result == {'success': False, 'error': 'Execution timed out after 1 seconds'}
+    # Reported by the template's reaper, not by the caller giving up waiting
+    assert time.monotonic() - start < 1 + sandbox.RESULT_GRACE
+    assert pool.run('p1', {'value': 1}, "result = value", _prepare, _grade) == {'success': True, 'result': 1}
+
+
+def test_template_is_replaced_when_its_version_changes(pool):
+    assert pool.run('p1', {'value': 1}, "result = value", _prepare, _grade, version=1)['result'] == 1
+    # Same version: the loaded state is reused
+    assert pool.run('p1', {'value': 2}, "result = value", _prepare, _grade, version=1)['result'] == 1
+    assert pool.run('p1', {'value': 2}, "result = value", _prepare, _grade, version=2)['result'] == 2
+
+
+def test_least_recently_used_template_is_closed_past_max_templates(pool):
+    for key in ('a', 'b', 'a'):
+        pool.run(key, {'value': key}, "result = value", _prepare, _grade)
+    evicted = pool._templates['b'].process
+    pool.run('c', {'value': 'c'}, "result = value", _prepare, _grade)
+    assert list(pool._templates) == ['a', 'c']
+    assert not evicted.is_alive()
+
+
+def test_template_that_fails_to_load_falls_back_to_in_process_grading(tmp_path, monkeypatch):
+    assert sandbox.SnapshotPool().run('p1', {}, "result = 1", _prepare_failing, _grade) is None
+
+    sales = tmp_path / 'sales.csv'
+    pd.DataFrame({'amount': [1, 2, 3]}).to_csv(sales, index=False)
+    problem = {
+        'id': 'p1',
+        'type': 'Pandas',
+        'sample_data': [{'variable_name': 'sales', 'file': str(sales)}],
+        'expected_output': str(sales)
+    }
+    monkeypatch.setattr(code_executor, '_prepare_pandas_snapshot', _prepare_failing)
+    executor = CodeExecutor(snapshots=True)
+    executor.snapshot_min_bytes = 0
+    try:
+        assert executor.execute_code("result = sales", problem) == {'success': True}
+        assert not executor.snapshots._templates
+    finally:
+        executor.snapshots.close()
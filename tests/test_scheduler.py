@@ -0,0 +1,79 @@
+import threading
+import pytest
+from utils.scheduler import AdmissionError, FairScheduler
+
+
+def _block(scheduler):
+    """Occupy the single worker until the returned event is set, so later submissions queue."""
+    release, started = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait()
+
+    scheduler.submit(blocker, user_id='blocker', org_id='blocker')
+    started.wait()
+    return release
+
+
+def _run_queued(scheduler, release):
+    release.set()
+    scheduler.shutdown()
+
+
+def test_backlogged_user_only_gets_a_fair_share():
+    scheduler = FairScheduler(max_concurrency=1)
+    release = _block(scheduler)
+    order = []
+    for _ in range(4):
+        scheduler.submit(order.append, 'a', user_id='a', org_id='org-a')
+    for _ in range(2):
+        scheduler.submit(order.append, 'b', user_id='b', org_id='org-b')
+    _run_queued(scheduler, release)
+    assert order == ['a', 'b', 'a', 'b', 'a', 'a']
+
+
+def test_user_weight_scales_the_share():
+    scheduler = FairScheduler(max_concurrency=1, user_weights={'b': 2.0})
+    release = _block(scheduler)
+    order = []
+    for user in ('a', 'b'):
+        for _ in range(4):
+            scheduler.submit(order.append, user, user_id=user, org_id=f"org-{user}")
+    _run_queued(scheduler, release)
+    assert order[:6].count('b') == 4
+    assert sorted(order) == ['a'] * 4 + ['b'] * 4
+
+
+def test_user_quota_rejects_only_that_user():
+    scheduler = FairScheduler(max_concurrency=1, user_quota=2)
+    release = _block(scheduler)
+    futures = [scheduler.submit(lambda: 'done', user_id='u1') for _ in range(2)]
+    with pytest.raises(AdmissionError, match='u1'):
+        scheduler.submit(lambda: 'done', user_id='u1')
+    futures.append(scheduler.submit(lambda: 'done', user_id='u2'))
+    _run_queued(scheduler, release)
+    assert [future.result() for future in futures] == ['done'] * 3
+    assert scheduler.metrics()['rejected'] == {'user_quota': 1}
+
+
+def test_overload_is_rejected_instead_of_queued():
+    scheduler = FairScheduler(max_concurrency=1, max_pending=2)
+    release = _block(scheduler)
+    for user in ('u1', 'u2'):
+        scheduler.submit(lambda: None, user_id=user)
+    with pytest.raises(AdmissionError, match='full'):
+        scheduler.submit(lambda: None, user_id='u3')
+    _run_queued(scheduler, release)
+    assert scheduler.metrics()['rejected'] == {'scheduler_full': 1}
+
+
+def test_interactive_work_runs_before_batch():
+    scheduler = FairScheduler(max_concurrency=1)
+    release = _block(scheduler)
+    order = []
+    for i in range(3):
+        scheduler.submit(order.append, f"batch-{i}", user_id='u1', priority='batch')
+    scheduler.submit(order.append, 'interactive', user_id='u2', priority='interactive')
+    _run_queued(scheduler, release)
+    assert order == ['interactive', 'batch-0', 'batch-1', 'batch-2']
@@ -0,0 +1,110 @@
+import threading
+import pytest
+from utils import resources
+from utils.difficulty_analyzer import DifficultyAnalyzer
+from utils.embeddings import EmbeddingsManager
+from utils.problem_bank import ProblemBank
+from utils.service import AdaptiveService, ServiceClient, make_server
+from utils.session_store import SessionStore
+
+
+@pytest.fixture
+def service(tmp_path):
+    resources.register('session_store', lambda: SessionStore(str(tmp_path / 'sessions.db')))
+    resources.register('problem_bank', lambda: ProblemBank(str(tmp_path / 'problem_bank.db')))
+    resources.register('embeddings_manager', lambda: EmbeddingsManager(data_dir=str(tmp_path / 'embeddings')))
+    resources.register('difficulty_analyzer', DifficultyAnalyzer)
+    resources.reset()
+    yield AdaptiveService()
+    resources.get_session_store().close()
+    resources.reset()
+
+
+def _attempt(passed, execution_time=30.0):
+    return {
+        'problem_id': 'p1',
+        'type': 'SQL',
+        'difficulty': 'medium',
+        'passed': passed,
+        'execution_time': execution_time
+    }
+
+
+def test_failed_attempt_moves_difficulty_down(service):
+    analyzer = resources.get_difficulty_analyzer()
+    before = analyzer.get_difficulty_score('u1', 'SQL')
+    service.record_attempt('u1', _attempt(False))
+    assert analyzer.get_difficulty_score('u1', 'SQL') < before
+
+
+def test_repeated_failures_lower_the_level(service):
+    for _ in range(4):
+        result = service.record_attempt('u1', _attempt(False, execution_time=900.0))
+    assert result['difficulty_level'] == 'easy'
+    history = resources.get_session_store().get_history('u1')
+    assert [attempt['passed'] for attempt in history] == [False] * 4
+
+
+def test_recalibrate_applies_calibration_and_stores_bank_difficulties(service):
+    bank = resources.get_problem_bank()
+    for problem_id in ('p1', 'p2'):
+        bank.add_problem({'id': problem_id, 'type': 'SQL', 'difficulty': 'medium', 'title': problem_id})
+    for user in ('u1', 'u2', 'u3'):
+        service.record_attempt(user, dict(_attempt(True), problem_id='p1'))
+        service.record_attempt(user, dict(_attempt(False), problem_id='p2'))
+
+    summary = service.recalibrate()
+
+    assert summary == {'users': 3, 'problems': 2}
+    assert resources.get_difficulty_analyzer().calibration is not None
+    assert service.target_difficulty('u1') is not None
+    assert bank.get_stats('p2')['calibrated_difficulty'] > bank.get_stats('p1')['calibrated_difficulty']
+
+
+def test_refit_runs_every_calibration_interval(service):
+    service.calibration_interval = 2
+    service.record_attempt('u1', _attempt(True))
+    assert resources.get_difficulty_analyzer().calibration is None
+    service.record_attempt('u1', _attempt(False))
+    assert resources.get_difficulty_analyzer().calibration is not None
+
+
+@pytest.fixture
+def client(service):
+    server = make_server(port=0, workers=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield ServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    server.shutdown()
+    server.scheduler.shutdown(wait=False)
+    server.pool.shutdown()
+
+
+def test_client_persists_session_state_through_the_service(client):
+    problem = {'id': 'p1', 'type': 'SQL', 'difficulty': 'medium', 'description': 'Count orders'}
+    client.save_problem('u1', problem)
+    client.save_user_state('u1', 'p1', 'hard', 123.0)
+
+    state = client.start_session('u1')
+    assert state == {'current_problem': problem, 'difficulty_level': 'hard', 'start_time': 123.0}
+
+
+def test_client_reads_history_through_the_service(client):
+    assert client.get_history_frame('u1').empty
+    client.record_attempt('u1', _attempt(False))
+    frame = client.get_history_frame('u1')
+    assert frame['passed'].tolist() == [False]
+    assert frame['problem_id'].tolist() == ['p1']
+
+
+def test_bad_parameters_are_client_errors(client):
+    with pytest.raises(RuntimeError, match='Service error 400'):
+        client.recommend_next_concepts('u1', n='many')
+
+
+def test_handler_failures_return_a_json_500(client, monkeypatch):
+    def fail(self, user_id, attempt):
+        raise RuntimeError('store unavailable')
+    monkeypatch.setattr(AdaptiveService, 'record_attempt', fail)
+    with pytest.raises(RuntimeError, match='Service error 500: store unavailable'):
+        client.record_attempt('u1', _attempt(True))
+    assert client.health()['status'] == 'ok'
@@ -0,0 +1,82 @@
+import time
+import pytest
+from utils.session_store import SessionStore
+
+
+def _attempt(problem_id, passed=True):
+    return {'problem_id': problem_id, 'type': 'SQL', 'difficulty': 'medium', 'passed': passed, 'execution_time': 120.0}
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / 'sessions.db')
+
+
+def _written(replica):
+    """Attempts another replica can see, i.e. already flushed to the database."""
+    return replica.get_attempts_frame()['problem_id'].tolist()
+
+
+def test_attempts_are_buffered_until_the_batch_fills(db_file):
+    store, replica = SessionStore(db_file, batch_size=3, flush_interval=60), SessionStore(db_file)
+    try:
+        store.record_attempt('u1', _attempt('p1'))
+        store.record_attempt('u1', _attempt('p2'))
+        assert _written(replica) == []
+        store.record_attempt('u1', _attempt('p3'))
+        assert _written(replica) == ['p1', 'p2', 'p3']
+    finally:
+        store.close()
+        replica.close()
+
+
+def test_buffered_attempts_are_flushed_once_they_are_old_enough(db_file):
+    store, replica = SessionStore(db_file, batch_size=100, flush_interval=0.2), SessionStore(db_file)
+    try:
+        store.record_attempt('u1', _attempt('p1'))
+        assert _written(replica) == []
+        time.sleep(0.25)
+        # The age check runs when the next attempt arrives
+        store.record_attempt('u1', _attempt('p2'))
+        assert _written(replica) == ['p1', 'p2']
+    finally:
+        store.close()
+        replica.close()
+
+
+def test_reads_and_close_flush_pending_attempts(db_file):
+    store = SessionStore(db_file, batch_size=100, flush_interval=60)
+    store.record_attempt('u1', _attempt('p1', passed=False))
+    assert [a['problem_id'] for a in store.get_history('u1')] == ['p1']
+    assert store.get_history('u1')[0]['passed'] is False
+    store.record_attempt('u1', _attempt('p2'))
+    store.close()
+
+    reopened = SessionStore(db_file)
+    try:
+        assert [a['problem_id'] for a in reopened.get_history('u1')] == ['p1', 'p2']
+    finally:
+        reopened.close()
+
+
+def test_history_picks_up_other_replicas_writes_incrementally(db_file):
+    first, second = SessionStore(db_file, batch_size=1), SessionStore(db_file, batch_size=1)
+    try:
+        first.record_attempt('u1', _attempt('p1'))
+        history = first.get_history('u1')
+        frame = first.get_history_frame('u1')
+        assert len(frame) == 1
+
+        second.record_attempt('u1', _attempt('p2'))
+        second.record_attempt('u2', _attempt('p3'))
+        first.record_attempt('u1', _attempt('p4'))
+
+        # The cached list is extended in place with only the newer rows
+        assert first.get_history('u1') is history
+        assert [a['problem_id'] for a in history] == ['p1', 'p2', 'p4']
+        assert first.get_history_frame('u1')['problem_id'].tolist() == ['p1', 'p2', 'p4']
+        assert [a['problem_id'] for a in second.get_history('u1')] == ['p1', 'p2', 'p4']
+        assert [a['problem_id'] for a in first.get_history('u2')] == ['p3']
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,68 @@
+import pytest
+from utils.sql_engines import SQLiteEngine, analyze_sqlite_plan, sql_aliases
+
+
+@pytest.fixture
+def engine():
+    engine = SQLiteEngine()
+    engine.conn.executescript("""
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, amount REAL);
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE INDEX idx_orders_customer ON orders (customer_id);
+    """)
+    yield engine
+    engine.close()
+
+
+def _analyze(engine, sql):
+    return analyze_sqlite_plan(engine.explain(sql), sql_aliases(sql))
+
+
+def test_constant_rows_are_not_full_scans(engine):
+    assert _analyze(engine, "SELECT 1")['full_scans'] == []
+    assert _analyze(engine, "VALUES (1), (2)")['full_scans'] == []
+
+
+def test_plain_table_scan_is_flagged(engine):
+    assert _analyze(engine, "SELECT * FROM orders")['full_scans'] == ['orders']
+
+
+def test_aliased_table_scan_reports_the_table(engine):
+    stats = _analyze(engine, "SELECT * FROM customers c WHERE c.name = 'x'")
+    assert stats['full_scans'] == ['customers']
+
+
+def test_index_scans_are_not_full_scans(engine):
+    assert _analyze(engine, "SELECT customer_id FROM orders")['full_scans'] == []
+
+
+def test_from_subquery_result_scan_is_not_a_full_scan(engine):
+    sql = "SELECT * FROM (SELECT customer_id, SUM(amount) AS total FROM orders GROUP BY customer_id) t WHERE total > 1"
+    assert _analyze(engine, sql)['full_scans'] == []
+
+
+def test_cte_result_scans_are_not_full_scans(engine):
+    sql = """
+        WITH totals AS (SELECT customer_id, SUM(amount) AS total FROM orders GROUP BY customer_id)
+        SELECT * FROM totals JOIN customers c ON c.id = totals.customer_id
+    """
+    assert _analyze(engine, sql)['full_scans'] == []
+    aliased = """
+        WITH totals AS (SELECT customer_id, SUM(amount) AS total FROM orders GROUP BY customer_id)
+        SELECT * FROM totals t1 JOIN totals t2 ON t1.customer_id = t2.customer_id
+    """
+    assert _analyze(engine, aliased)['full_scans'] == []
+
+
+def test_scalar_subquery_scan_of_a_table_is_flagged(engine):
+    stats = _analyze(engine, "SELECT * FROM orders WHERE amount > (SELECT AVG(amount) FROM orders)")
+    assert stats['full_scans'] == ['orders', 'orders']
+
+
+def test_unindexed_inner_join_loop_is_missing_index(engine):
+    stats = analyze_sqlite_plan([
+        {'id': 2, 'parent': 0, 'detail': 'SCAN o'},
+        {'id': 9, 'parent': 0, 'detail': 'SCAN c'}
+    ], {'o': 'orders', 'c': 'customers'})
+    assert stats['full_scans'] == ['orders', 'customers']
+    assert stats['missing_index'] == ['SCAN c']
@@ -0,0 +1,45 @@
+import numpy as np
+from utils.text_embeddings import ConceptCanonicalizer, TextEmbedder
+
+WINDOW_PROBLEM = {
+    'title': 'Rank Employees By Salary',
+    'description': 'Use a window function with partition by department to rank salaries.'
+}
+
+
+def test_synonyms_collapse_onto_canonical_concepts():
+    canonicalizer = ConceptCanonicalizer()
+    concepts = ['Dictionary', 'hash_map', 'GROUP BY', 'aggregations', 'Left Join', 'Bit Manipulation', ' ']
+    assert canonicalizer.canonicalize_all(concepts) == ['hash_maps', 'aggregations', 'joins', 'bit_manipulation']
+
+
+def test_extract_finds_the_longest_known_phrase():
+    canonicalizer = ConceptCanonicalizer()
+    text = "Write a CTE, then use ROW_NUMBER() over a recursive CTE and a left join."
+    assert canonicalizer.extract(text) == ['ctes', 'window_functions', 'advanced_sql', 'joins']
+
+
+def test_embeddings_are_deterministic_and_unit_length():
+    embedder = TextEmbedder(dim=64)
+    first = embedder.embed(WINDOW_PROBLEM, ['window_functions'])
+    assert first.shape == (64,)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert np.array_equal(first, TextEmbedder(dim=64).embed(WINDOW_PROBLEM, ['window_functions']))
+
+
+def test_related_problems_score_higher_than_unrelated_ones():
+    embedder = TextEmbedder()
+    related = {
+        'title': 'Rank Products By Revenue',
+        'description': 'Use a window function with partition by category to rank revenue.'
+    }
+    unrelated = {
+        'title': 'Reverse A Linked List',
+        'description': 'Reverse the nodes of a singly linked list in place.'
+    }
+    vectors = embedder.embed_batch(
+        [WINDOW_PROBLEM, related, unrelated],
+        [['window_functions'], ['window_functions'], ['arrays']]
+    )
+    scores = vectors[1:] @ vectors[0]
+    assert scores[0] > 0.5 > scores[1]
@@ -0,0 +1,92 @@
+import itertools
+import numpy as np
+from types import SimpleNamespace
+from utils import vector_index
+from utils.vector_index import LSHIndex
+
+DIM = 32
+
+
+def _clustered(n_items, seed=0, noise=0.3):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n_items // 50, 1), DIM))
+    return (centers[rng.integers(0, len(centers), n_items)] + noise * rng.standard_normal((n_items, DIM))).astype(np.float32)
+
+
+def _brute_force(data, ids, query, n, exclude_id=None):
+    unit = data / np.linalg.norm(data, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    order = [i for i in np.argsort(-scores, kind='stable') if ids[i] != exclude_id]
+    return [ids[i] for i in order[:n]]
+
+
+def _recall(index, data, ids, query_rows, n=3):
+    hits = total = 0
+    for row in query_rows:
+        expected = set(_brute_force(data, ids, data[row], n, exclude_id=ids[row]))
+        found = {item_id for item_id, _ in index.search(data[row], n, exclude_id=ids[row])}
+        hits += len(expected & found)
+        total += len(expected)
+    return hits / total
+
+
+def test_search_is_exact_at_or_below_exact_threshold():
+    data = np.random.default_rng(0).standard_normal((500, DIM)).astype(np.float32)
+    ids = [f"p{i}" for i in range(len(data))]
+    # A single probe without the scan fallback would miss neighbours if LSH were used
+    index = LSHIndex(DIM, n_probes=1, exact_threshold=len(data), recall_target=None)
+    index.min_candidates = 0
+    index.add_batch(ids, data)
+    for row in range(0, len(data), 25):
+        found = [item_id for item_id, _ in index.search(data[row], 5, exclude_id=ids[row])]
+        assert found == _brute_force(data, ids, data[row], 5, exclude_id=ids[row])
+
+
+def test_tune_raises_n_probes_to_the_recall_target(monkeypatch):
+    # Unclustered data, so a single probe misses most neighbours
+    data = np.random.default_rng(0).standard_normal((3000, DIM)).astype(np.float32)
+    ids = [f"p{i}" for i in range(len(data))]
+    index = LSHIndex(DIM, n_probes=1, exact_threshold=0, recall_target=None)
+    index.min_candidates = 0  # Measure the buckets alone, without the scan fallback
+    index.add_batch(ids, data)
+    query_rows = np.random.default_rng(1).choice(len(data), 200, replace=False)
+    assert _recall(index, data, ids, query_rows) < 0.5
+
+    # Pin tune()'s clock so LSH always counts as faster than the exact scan;
+    # only recall then decides n_probes
+    ticks = itertools.chain([0.0, 1.0], itertools.count(2.0, 1e-6))
+    monkeypatch.setattr(vector_index, 'time', SimpleNamespace(perf_counter=lambda: next(ticks)))
+    report = index.tune(target_recall=0.9, n_queries=200)
+
+    assert report['use_lsh'] and index.use_lsh
+    assert report['recall'] >= 0.9
+    assert index.n_probes > 1
+    assert _recall(index, data, ids, query_rows) >= 0.85
+
+
+def test_add_and_remove_keep_the_index_consistent():
+    data = _clustered(300, seed=2)
+    ids = [f"p{i}" for i in range(len(data))]
+    difficulties = ['easy' if i % 2 else 'hard' for i in range(len(data))]
+    for exact_threshold in (len(data), 0):
+        index = LSHIndex(DIM, exact_threshold=exact_threshold, recall_target=None)
+        index.add_batch(ids, data, difficulties, ['SQL'] * len(data))
+
+        removed = set(ids[::3])
+        for item_id in removed:
+            index.remove(item_id)
+        replacement = np.random.default_rng(3).standard_normal(DIM).astype(np.float32)
+        index.add('p1', replacement, 'hard', 'SQL')
+
+        live = set(ids) - removed
+        assert len(index) == len(live)
+        assert 'p0' not in index and 'p1' in index
+        assert np.allclose(index.get_vector('p1'), replacement / np.linalg.norm(replacement))
+
+        everything = {item_id for item_id, _ in index.search(data[0], len(data))}
+        assert everything == live
+        easy = {item_id for item_id, _ in index.search_exact(data[0], len(data), difficulty='easy')}
+        assert easy == {item_id for item_id in live if item_id != 'p1' and int(item_id[1:]) % 2}
+
+        best_id, best_score = index.search(replacement, 1)[0]
+        assert best_id == 'p1' and best_score > 0.999
@@ -0,0 +1,145 @@
+import re
+import zlib
+import numpy as np
+from typing import List, Dict, Any, Optional, Iterable
+
+# Canonical concept -> spellings and near-synonyms seen in generated problems
+CONCEPT_SYNONYMS = {
+    'arrays': ['array', 'list', 'lists', 'python lists'],
+    'strings': ['string', 'string manipulation', 'text processing'],
+    'hash_maps': ['hash map', 'hashmap', 'hash maps', 'hashmaps', 'hash table', 'hash tables',
+                  'dictionary', 'dictionaries', 'dict', 'dicts'],
+    'sets': ['set', 'hash set', 'hashset'],
+    'sorting': ['sort', 'sorting algorithms', 'ordering'],
+    'searching': ['search', 'binary search'],
+    'two_pointers': ['two pointers', 'two pointer', 'sliding window'],
+    'recursion': ['recursive', 'recursive functions'],
+    'dynamic_programming': ['dynamic programming', 'dp', 'memoization', 'tabulation'],
+    'graph_traversal': ['graph traversal', 'bfs', 'dfs', 'breadth first search',
+                        'depth first search', 'graphs', 'graph'],
+    'trees': ['tree', 'binary tree', 'binary trees', 'bst'],
+    'heaps': ['heap', 'priority queue', 'heapq'],
+    'stacks_queues': ['stack', 'stacks', 'queue', 'queues', 'deque'],
+    'complexity_analysis': ['big o', 'time complexity', 'space complexity'],
+    'basic_sql': ['select', 'sql basics', 'basic sql', 'where clause', 'filtering'],
+    'joins': ['join', 'inner join', 'left join', 'outer join', 'self join', 'sql joins'],
+    'aggregations': ['aggregation', 'aggregate', 'aggregate functions', 'group by', 'groupby',
+                     'grouping', 'having'],
+    'window_functions': ['window function', 'window functions', 'over clause', 'row_number',
+                         'rank', 'dense_rank', 'partition by', 'lag', 'lead'],
+    'subqueries': ['subquery', 'correlated subquery', 'nested queries'],
+    'ctes': ['cte', 'common table expression', 'common table expressions', 'with clause'],
+    'advanced_sql': ['advanced sql', 'recursive cte', 'recursive ctes'],
+    'indexing': ['index', 'indexes', 'indices', 'query optimization'],
+    'data_cleaning': ['data cleaning', 'missing values', 'missing data', 'fillna', 'dropna',
+                      'null handling', 'deduplication'],
+    'merging': ['merge', 'pandas merge', 'concat', 'concatenation'],
+    'pivoting': ['pivot', 'pivot table', 'pivot tables', 'melt', 'reshaping'],
+    'time_series': ['time series', 'datetime', 'dates', 'resample', 'resampling',
+                    'rolling window', 'rolling'],
+    'vectorization': ['vectorized operations', 'vectorisation', 'apply', 'broadcasting'],
+}
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'each', 'for', 'from', 'given', 'has',
+    'have', 'in', 'into', 'is', 'it', 'its', 'of', 'on', 'or', 'return', 'returns', 'should',
+    'that', 'the', 'their', 'this', 'to', 'which', 'with', 'write', 'you', 'your'
+}
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]+')
+
+
+def _normalize(text: str) -> str:
+    """Lowercase and collapse separators so 'Hash-Map' and 'hash_map' compare equal."""
+    return ' '.join(TOKEN_PATTERN.findall(text.lower().replace('_', ' ')))
+
+
+class ConceptCanonicalizer:
+    """Map free-form concept names onto a canonical vocabulary."""
+
+    def __init__(self, synonyms: Optional[Dict[str, List[str]]] = None):
+        self.synonyms = synonyms or CONCEPT_SYNONYMS
+        self.lookup: Dict[str, str] = {}
+        for canonical, variants in self.synonyms.items():
+            self.lookup[_normalize(canonical)] = canonical
+            for variant in variants:
+                self.lookup[_normalize(variant)] = canonical
+        self.max_phrase_len = max(len(phrase.split()) for phrase in self.lookup)
+
+    def canonicalize(self, concept: str) -> str:
+        """Return the canonical name, or a normalized snake_case form if unknown."""
+        normalized = _normalize(concept)
+        if normalized in self.lookup:
+            return self.lookup[normalized]
+        if normalized.endswith('s') and normalized[:-1] in self.lookup:
+            return self.lookup[normalized[:-1]]
+        return normalized.replace(' ', '_')
+
+    def canonicalize_all(self, concepts: Iterable[str]) -> List[str]:
+        """Canonicalize and de-duplicate, keeping first-seen order."""
+        seen = {}
+        for concept in concepts:
+            if concept and concept.strip():
+                seen.setdefault(self.canonicalize(concept), None)
+        return list(seen)
+
+    def extract(self, text: str) -> List[str]:
+        """Find known concepts mentioned anywhere in free text."""
+        tokens = _normalize(text).split()
+        found = {}
+        for i in range(len(tokens)):
+            for length in range(self.max_phrase_len, 0, -1):
+                phrase = ' '.join(tokens[i:i + length])
+                if phrase in self.lookup:
+                    found.setdefault(self.lookup[phrase], None)
+                    break
+        return list(found)
+
+
+class TextEmbedder:
+    """
+    In-process problem embeddings using signed feature hashing of title,
+    description and concept tokens with sublinear term frequencies. Pure
+    function of the input, so the same problem always maps to the same vector.
+    """
+
+    def __init__(self, dim: int = 256, field_weights: Optional[Dict[str, float]] = None):
+        self.dim = dim
+        self.field_weights = field_weights or {'title': 2.0, 'description': 1.0, 'concepts': 3.0}
+
+    def _features(self, problem_data: Dict[str, Any], concepts: List[str]) -> Dict[str, float]:
+        """Weighted token counts keyed by field-prefixed feature name."""
+        features: Dict[str, float] = {}
+        for field in ('title', 'description'):
+            for token in TOKEN_PATTERN.findall(str(problem_data.get(field) or '').lower()):
+                if token not in STOPWORDS and len(token) > 1:
+                    key = f'w:{token}'
+                    features[key] = features.get(key, 0.0) + self.field_weights[field]
+        for concept in concepts:
+            key = f'c:{concept}'
+            features[key] = features.get(key, 0.0) + self.field_weights['concepts']
+        return features
+
+    def _hash(self, feature: str) -> tuple:
+        h = zlib.crc32(feature.encode('utf-8'))
+        return h % self.dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+    def embed(self, problem_data: Dict[str, Any], concepts: List[str]) -> np.ndarray:
+        """Embed a single problem."""
+        return self.embed_batch([problem_data], [concepts])[0]
+
+    def embed_batch(self, problems: List[Dict[str, Any]], concepts: List[List[str]]) -> np.ndarray:
+        """Embed many problems into an (n, dim) L2-normalized matrix."""
+        rows, cols, values = [], [], []
+        for row, (problem, problem_concepts) in enumerate(zip(problems, concepts)):
+            for feature, weight in self._features(problem, problem_concepts).items():
+                col, sign = self._hash(feature)
+                rows.append(row)
+                cols.append(col)
+                values.append(sign * (1.0 + np.log(weight)))
+
+        matrix = np.zeros((len(problems), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), values)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
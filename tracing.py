@@ -0,0 +1,294 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ADAPTIVE_TRACING=1 enables tracing at import (worker processes inherit it);
+# ADAPTIVE_TRACE_FILE additionally writes spans there as JSONL
+_enabled = os.environ.get('ADAPTIVE_TRACING', '') not in ('', '0')
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+_lock = threading.Lock()
+_histograms: Dict[str, Dict[str, Any]] = {}
+_counters: Dict[tuple, float] = {}
+_recent: deque = deque(maxlen=1000)
+_exporter = None
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled; every operation is a no-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    One timed operation. Spans nest through a context variable, so spans
+    opened inside another (in the same thread or task) record it as parent.
+    Numeric attributes accumulated with add() (bytes, tokens, cache hits) are
+    also exported as counters labelled with the span name.
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'counts',
+                 'start_time', 'duration', 'error', '_start', '_token')
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.counts: Dict[str, float] = {}
+        self.start_time = 0.0
+        self.duration = 0.0
+        self.error = None
+
+    def __enter__(self):
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _record(self)
+        return False
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.counts[key] = self.counts.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_ms': self.duration * 1000,
+            'attributes': self.attributes,
+            'counts': self.counts,
+            'error': self.error
+        }
+
+
+class JSONLExporter:
+    """Appends finished spans to a JSONL file, one object per line."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a', buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+if _enabled and os.environ.get('ADAPTIVE_TRACE_FILE'):
+    _exporter = JSONLExporter(os.environ['ADAPTIVE_TRACE_FILE'])
+
+
+def enable(jsonl_path: Optional[str] = None) -> None:
+    """Turn tracing on, optionally also writing every span to a JSONL file."""
+    global _enabled, _exporter
+    if jsonl_path:
+        if _exporter is not None:
+            _exporter.close()
+        _exporter = JSONLExporter(jsonl_path)
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled, _exporter
+    _enabled = False
+    if _exporter is not None:
+        _exporter.close()
+        _exporter = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attributes):
+    """Context manager timing a block; a shared no-op object when tracing is off."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping each call of a function in a span."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add(key: str, amount: float = 1) -> None:
+    """
+    Add to a count (bytes_read, prompt_tokens, cache_hits, ...) on the current
+    span; outside any span it goes straight to the exported counters.
+    """
+    if not _enabled:
+        return
+    current = _current_span.get()
+    if current is not None:
+        current.add(key, amount)
+    else:
+        with _lock:
+            _counters[(key, '')] = _counters.get((key, ''), 0) + amount
+
+
+def _record(finished: Span) -> None:
+    with _lock:
+        histogram = _histograms.get(finished.name)
+        if histogram is None:
+            histogram = _histograms[finished.name] = {
+                'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0, 'errors': 0
+            }
+        for i, bound in enumerate(BUCKETS):
+            if finished.duration <= bound:
+                histogram['buckets'][i] += 1
+        histogram['count'] += 1
+        histogram['sum'] += finished.duration
+        if finished.error:
+            histogram['errors'] += 1
+        for key, amount in finished.counts.items():
+            _counters[(key, finished.name)] = _counters.get((key, finished.name), 0) + amount
+        _recent.append(finished.to_dict())
+    if _exporter is not None:
+        _exporter.export(finished)
+
+
+def recent_spans(limit: int = 100) -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_recent)[-limit:]
+
+
+def summary() -> List[Dict[str, Any]]:
+    """Per-span-name call count, mean latency and error count, slowest total first."""
+    with _lock:
+        rows = [
+            {
+                'span': name,
+                'calls': h['count'],
+                'total_ms': h['sum'] * 1000,
+                'mean_ms': h['sum'] * 1000 / h['count'],
+                'errors': h['errors']
+            }
+            for name, h in _histograms.items()
+        ]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [
+        '# HELP adaptive_span_duration_seconds Duration of traced operations.',
+        '# TYPE adaptive_span_duration_seconds histogram'
+    ]
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            label = _escape(name)
+            for bound, count in zip(BUCKETS, h['buckets']):
+                lines.append(f'adaptive_span_duration_seconds_bucket{{span="{label}",le="{bound}"}} {count}')
+            lines.append(f'adaptive_span_duration_seconds_bucket{{span="{label}",le="+Inf"}} {h["count"]}')
+            lines.append(f'adaptive_span_duration_seconds_sum{{span="{label}"}} {h["sum"]}')
+            lines.append(f'adaptive_span_duration_seconds_count{{span="{label}"}} {h["count"]}')
+        lines.append('# HELP adaptive_span_errors_total Traced operations that raised.')
+        lines.append('# TYPE adaptive_span_errors_total counter')
+        for name, h in sorted(_histograms.items()):
+            lines.append(f'adaptive_span_errors_total{{span="{_escape(name)}"}} {h["errors"]}')
+        for key in sorted({key for key, _ in _counters}):
+            lines.append(f'# TYPE adaptive_{key}_total counter')
+            for (counter, name), value in sorted(_counters.items()):
+                if counter == key:
+                    lines.append(f'adaptive_{key}_total{{span="{_escape(name)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def drain() -> Dict[str, Any]:
+    """
+    Return and clear this process's metrics, for shipping from a worker
+    process to the one serving /metrics (see merge()).
+    """
+    with _lock:
+        snapshot = {
+            'histograms': {name: dict(h, buckets=list(h['buckets'])) for name, h in _histograms.items()},
+            'counters': [[key, name, value] for (key, name), value in _counters.items()],
+            'spans': list(_recent)
+        }
+        _histograms.clear()
+        _counters.clear()
+        _recent.clear()
+    return snapshot
+
+
+def merge(snapshot: Dict[str, Any]) -> None:
+    """Add metrics drained from another process into this one's."""
+    with _lock:
+        for name, other in snapshot['histograms'].items():
+            histogram = _histograms.setdefault(
+                name, {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0, 'errors': 0}
+            )
+            histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], other['buckets'])]
+            for field in ('count', 'sum', 'errors'):
+                histogram[field] += other[field]
+        for key, name, value in snapshot['counters']:
+            _counters[(key, name)] = _counters.get((key, name), 0) + value
+        _recent.extend(snapshot['spans'])
+
+
+def reset() -> None:
+    """Clear collected metrics and recent spans."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _recent.clear()
@@ -0,0 +1,435 @@
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+class LSHIndex:
+    """
+    Approximate nearest-neighbour index for cosine similarity.
+
+    Vectors are hashed with random hyperplanes into several tables, with
+    buckets kept separately per (difficulty, type) group so filtered queries
+    only see matching rows. A query probes its own bucket and the nearby
+    buckets most likely to hold neighbours (the bits with the smallest
+    projection margins flipped), then re-ranks the candidates exactly.
+    Below exact_threshold matching rows, search scans them exactly instead.
+    Once the index outgrows that, n_probes is re-tuned against exact search
+    whenever it doubles, to keep recall at recall_target; if LSH at that
+    recall is no faster than the exact scan, search stays exact.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        n_tables: int = 16,
+        n_bits: int = 10,
+        n_probes: int = 4,
+        seed: int = 42,
+        initial_capacity: int = 1024,
+        exact_threshold: int = 20000,
+        recall_target: Optional[float] = 0.95
+    ):
+        self.dim = dim
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes  # Recall/latency knob: buckets probed per table
+        self.min_candidates = 64  # Fall back to exact search below this
+        self.exact_threshold = exact_threshold
+        self.recall_target = recall_target
+        self.use_lsh = True  # Cleared by tune() when LSH can't beat the exact scan
+        self._tuned_size = 0
+
+        rng = np.random.default_rng(seed)
+        self.hyperplanes = rng.standard_normal((n_tables, n_bits, dim)).astype(np.float32)
+        self.bit_weights = (1 << np.arange(n_bits, dtype=np.int64))
+        # Flip masks for probing: every single bit, then every pair of bits
+        pairs = [(i, j) for i in range(n_bits) for j in range(i + 1, n_bits)]
+        self._flip_bits = [(i,) for i in range(n_bits)] + pairs
+        self._flip_masks = np.array([sum(1 << b for b in bits) for bits in self._flip_bits], dtype=np.int64)
+        self._flip_matrix = np.zeros((len(self._flip_bits), n_bits), dtype=np.float32)
+        for i, bits in enumerate(self._flip_bits):
+            self._flip_matrix[i, list(bits)] = 1.0
+
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(n_tables)]
+        self.vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self.difficulty_codes = np.zeros(initial_capacity, dtype=np.int16)
+        self.type_codes = np.zeros(initial_capacity, dtype=np.int16)
+        self.row_groups = np.zeros(initial_capacity, dtype=np.int32)
+        self.alive = np.zeros(initial_capacity, dtype=bool)
+        self.size = 0
+
+        self.ids: List[str] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.label_codes: Dict[str, int] = {}
+
+        # Rows of each (difficulty code, type code) group, in growable arrays
+        self.group_ids: Dict[Tuple[int, int], int] = {}
+        self.group_labels: List[Tuple[int, int]] = []
+        self.group_rows: List[np.ndarray] = []
+        self.group_sizes: List[int] = []
+        self.group_live: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.id_to_row
+
+    def _label_code(self, label: Optional[str]) -> int:
+        """Map a metadata label (difficulty or type) to a small integer code."""
+        if label is None:
+            return 0
+        if label not in self.label_codes:
+            self.label_codes[label] = len(self.label_codes) + 1
+        return self.label_codes[label]
+
+    def _group(self, difficulty_code: int, type_code: int) -> int:
+        key = (difficulty_code, type_code)
+        if key not in self.group_ids:
+            self.group_ids[key] = len(self.group_labels)
+            self.group_labels.append(key)
+            self.group_rows.append(np.zeros(64, dtype=np.int64))
+            self.group_sizes.append(0)
+            self.group_live.append(0)
+        return self.group_ids[key]
+
+    def _append_group_rows(self, group: int, rows: np.ndarray) -> None:
+        size = self.group_sizes[group]
+        if size + len(rows) > len(self.group_rows[group]):
+            grown = np.zeros(max(size + len(rows), 2 * len(self.group_rows[group])), dtype=np.int64)
+            grown[:size] = self.group_rows[group][:size]
+            self.group_rows[group] = grown
+        self.group_rows[group][size:size + len(rows)] = rows
+        self.group_sizes[group] = size + len(rows)
+        self.group_live[group] += len(rows)
+
+    def _grow(self, min_capacity: int) -> None:
+        capacity = len(self.vectors)
+        while capacity < min_capacity:
+            capacity *= 2
+        if capacity == len(self.vectors):
+            return
+        for name in ('vectors', 'difficulty_codes', 'type_codes', 'row_groups', 'alive'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """Hyperplane projections with shape (n_vectors, n_tables, n_bits)."""
+        return np.einsum('tbd,nd->ntb', self.hyperplanes, vectors)
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        """Return bucket keys with shape (n_vectors, n_tables)."""
+        return (self._project(vectors) > 0).astype(np.int64) @ self.bit_weights
+
+    def add(
+        self,
+        item_id: str,
+        vector: np.ndarray,
+        difficulty: Optional[str] = None,
+        problem_type: Optional[str] = None
+    ) -> None:
+        """Insert a single vector; re-adding an existing id replaces it."""
+        self.add_batch([item_id], np.atleast_2d(vector), [difficulty], [problem_type])
+
+    def add_batch(
+        self,
+        item_ids: List[str],
+        vectors: np.ndarray,
+        difficulties: Optional[List[Optional[str]]] = None,
+        problem_types: Optional[List[Optional[str]]] = None
+    ) -> None:
+        """Insert many vectors at once; an id repeated in the batch keeps its last vector."""
+        if not item_ids:
+            return
+        n = len(item_ids)
+        difficulties = difficulties or [None] * n
+        problem_types = problem_types or [None] * n
+        vectors = self._normalize(vectors)
+
+        last = {item_id: i for i, item_id in enumerate(item_ids)}
+        if len(last) < n:
+            keep = sorted(last.values())
+            item_ids = [item_ids[i] for i in keep]
+            difficulties = [difficulties[i] for i in keep]
+            problem_types = [problem_types[i] for i in keep]
+            vectors = vectors[keep]
+            n = len(keep)
+
+        for item_id in item_ids:
+            if item_id in self.id_to_row:
+                self.remove(item_id)
+
+        difficulty_codes = [self._label_code(d) for d in difficulties]
+        type_codes = [self._label_code(t) for t in problem_types]
+        groups = np.array([self._group(d, t) for d, t in zip(difficulty_codes, type_codes)], dtype=np.int64)
+        keys = self._hash(vectors) | (groups[:, None] << self.n_bits)
+
+        self._grow(self.size + n)
+        start = self.size
+        rows = np.arange(start, start + n)
+        self.vectors[rows] = vectors
+        self.difficulty_codes[rows] = difficulty_codes
+        self.type_codes[rows] = type_codes
+        self.row_groups[rows] = groups
+        self.alive[rows] = True
+        self.size += n
+        for group in np.unique(groups):
+            self._append_group_rows(int(group), rows[groups == group])
+
+        for offset, item_id in enumerate(item_ids):
+            row = start + offset
+            self.ids.append(item_id)
+            self.id_to_row[item_id] = row
+            for table, key in zip(self.tables, keys[offset]):
+                table.setdefault(int(key), []).append(row)
+
+        if (
+            self.recall_target is not None
+            and len(self) > self.exact_threshold
+            and len(self) >= 2 * self._tuned_size
+        ):
+            self.tune()
+
+    def remove(self, item_id: str) -> None:
+        """Tombstone an item; its bucket entries are skipped at query time."""
+        row = self.id_to_row.pop(item_id, None)
+        if row is not None:
+            self.alive[row] = False
+            self.group_live[self.row_groups[row]] -= 1
+
+    def get_vector(self, item_id: str) -> Optional[np.ndarray]:
+        row = self.id_to_row.get(item_id)
+        return None if row is None else self.vectors[row]
+
+    def _probe_keys(self, keys: np.ndarray, projections: np.ndarray) -> np.ndarray:
+        """
+        Per table, the query bucket plus the n_probes - 1 neighbouring buckets
+        whose flipped bits have the smallest total projection margin.
+        Returns shape (n_tables, n_probes).
+        """
+        extra = min(self.n_probes - 1, len(self._flip_masks))
+        if extra <= 0:
+            return keys[:, None]
+        scores = np.abs(projections) @ self._flip_matrix.T
+        nearest = np.argpartition(scores, extra - 1, axis=1)[:, :extra]
+        return np.concatenate([keys[:, None], keys[:, None] ^ self._flip_masks[nearest]], axis=1)
+
+    def _matching_groups(self, difficulty: Optional[str], problem_type: Optional[str]) -> List[int]:
+        difficulty_code = self.label_codes.get(difficulty, -1) if difficulty is not None else None
+        type_code = self.label_codes.get(problem_type, -1) if problem_type is not None else None
+        return [
+            group for group, (d, t) in enumerate(self.group_labels)
+            if (difficulty_code is None or d == difficulty_code) and (type_code is None or t == type_code)
+        ]
+
+    def _live_group_rows(self, groups: List[int]) -> np.ndarray:
+        if not groups:
+            return np.array([], dtype=np.int64)
+        rows = np.concatenate([self.group_rows[g][:self.group_sizes[g]] for g in groups])
+        return rows[self.alive[rows]]
+
+    def _top_n(
+        self,
+        query: np.ndarray,
+        rows: Optional[np.ndarray],
+        n: int,
+        exclude_id: Optional[str]
+    ) -> List[Tuple[str, float]]:
+        """Exact top-n among rows, or among every live row if rows is None."""
+        if rows is None:
+            # Score the contiguous block rather than gathering rows first
+            scores = self.vectors[:self.size] @ query
+            scores[~self.alive[:self.size]] = -np.inf
+            rows = np.arange(self.size)
+            if exclude_id is not None and exclude_id in self.id_to_row:
+                scores[self.id_to_row[exclude_id]] = -np.inf
+            candidates = min(n, len(self))
+        else:
+            if exclude_id is not None and exclude_id in self.id_to_row:
+                rows = rows[rows != self.id_to_row[exclude_id]]
+            scores = self.vectors[rows] @ query
+            candidates = min(n, len(rows))
+        if candidates <= 0:
+            return []
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top if scores[i] > -np.inf]
+
+    def _search_lsh(
+        self,
+        query: np.ndarray,
+        n: int,
+        groups: List[int],
+        exclude_id: Optional[str]
+    ) -> List[Tuple[str, float]]:
+        projections = self._project(query[None, :])[0]
+        keys = (projections > 0).astype(np.int64) @ self.bit_weights
+        probe_keys = self._probe_keys(keys, projections)
+        group_offsets = [group << self.n_bits for group in groups]
+
+        candidates = []
+        for table, table_keys in zip(self.tables, probe_keys):
+            for key in table_keys.tolist():
+                for offset in group_offsets:
+                    bucket = table.get(offset | key)
+                    if bucket:
+                        candidates.append(bucket)
+        if candidates:
+            rows = np.unique(np.concatenate(candidates))
+            rows = rows[self.alive[rows]]
+        else:
+            rows = np.array([], dtype=np.int64)
+
+        # Too few candidates to trust: scan the matching groups instead
+        if len(rows) < max(self.min_candidates, n + 1):
+            return self._top_n(query, self._live_group_rows(groups), n, exclude_id)
+        return self._top_n(query, rows, n, exclude_id)
+
+    def search(
+        self,
+        vector: np.ndarray,
+        n: int = 3,
+        difficulty: Optional[str] = None,
+        problem_type: Optional[str] = None,
+        exclude_id: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Approximate top-n search. Returns (item_id, cosine_similarity) pairs.
+        """
+        if len(self) == 0:
+            return []
+        groups = self._matching_groups(difficulty, problem_type)
+        if not self.use_lsh or sum(self.group_live[g] for g in groups) <= self.exact_threshold:
+            return self.search_exact(vector, n, difficulty, problem_type, exclude_id)
+        query = self._normalize(vector)[0]
+        return self._search_lsh(query, n, groups, exclude_id)
+
+    def search_exact(
+        self,
+        vector: np.ndarray,
+        n: int = 3,
+        difficulty: Optional[str] = None,
+        problem_type: Optional[str] = None,
+        exclude_id: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """Brute-force top-n search over the stored vectors matching the filters."""
+        if len(self) == 0:
+            return []
+        query = self._normalize(vector)[0]
+        if difficulty is None and problem_type is None:
+            return self._top_n(query, None, n, exclude_id)
+        rows = self._live_group_rows(self._matching_groups(difficulty, problem_type))
+        return self._top_n(query, rows, n, exclude_id)
+
+    def tune(self, target_recall: Optional[float] = None, n_queries: int = 50, n: int = 3, seed: int = 0) -> Dict[str, Any]:
+        """
+        Set n_probes to the smallest value (in doublings) whose top-n recall
+        against exact search, over a sample of stored vectors used as
+        queries, reaches target_recall (default recall_target), and keep
+        LSH only if it is then faster than the exact scan. Returns the
+        measured recall and per-query latencies.
+        """
+        target_recall = target_recall if target_recall is not None else self.recall_target
+        live = np.flatnonzero(self.alive[:self.size])
+        self._tuned_size = len(self)
+        if len(live) == 0 or target_recall is None:
+            return {'n_probes': self.n_probes, 'recall': None, 'use_lsh': self.use_lsh}
+        sample = np.random.default_rng(seed).choice(live, min(n_queries, len(live)), replace=False)
+        groups = list(range(len(self.group_labels)))
+
+        start = time.perf_counter()
+        truth = [
+            {item_id for item_id, _ in self._top_n(self.vectors[row], None, n, self.ids[row])}
+            for row in sample
+        ]
+        exact_ms = (time.perf_counter() - start) * 1000 / len(sample)
+
+        max_probes = 1 + len(self._flip_masks)
+        probes = 1
+        while True:
+            self.n_probes = min(probes, max_probes)
+            hits = 0
+            start = time.perf_counter()
+            for row, expected in zip(sample, truth):
+                found = self._search_lsh(self.vectors[row], n, groups, self.ids[row])
+                hits += len(expected & {item_id for item_id, _ in found})
+            approx_ms = (time.perf_counter() - start) * 1000 / len(sample)
+            recall = hits / max(sum(len(expected) for expected in truth), 1)
+            if recall >= target_recall or self.n_probes == max_probes or approx_ms >= exact_ms:
+                break
+            probes *= 2
+
+        self.use_lsh = recall >= target_recall and approx_ms < exact_ms
+        return {
+            'n_probes': self.n_probes,
+            'recall': recall,
+            'approx_ms': approx_ms,
+            'exact_ms': exact_ms,
+            'use_lsh': self.use_lsh
+        }
+
+
+def benchmark(
+    n_items: int = 100000,
+    dim: int = 256,
+    n_queries: int = 200,
+    n: int = 3,
+    noise: float = 0.3,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Compare LSHIndex.search against exact search on synthetic clustered data
+    (larger noise means looser clusters), unfiltered and filtered by
+    difficulty and type. Returns the tuned settings, mean latencies (ms)
+    and recall@n of the approximate search.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n_items // 100, 1), dim)).astype(np.float32)
+    assignments = rng.integers(0, len(centers), n_items)
+    data = centers[assignments] + noise * rng.standard_normal((n_items, dim)).astype(np.float32)
+    difficulties = list(rng.choice(['easy', 'medium', 'hard'], n_items))
+    problem_types = list(rng.choice(['SQL', 'Python', 'Pandas'], n_items))
+
+    index = LSHIndex(dim, initial_capacity=n_items)
+    start = time.perf_counter()
+    index.add_batch([str(i) for i in range(n_items)], data, difficulties, problem_types)
+    build_seconds = time.perf_counter() - start
+
+    results = {
+        'n_items': n_items,
+        'n_probes': index.n_probes,
+        'use_lsh': index.use_lsh,
+        'build_seconds': build_seconds
+    }
+    query_rows = rng.integers(0, n_items, n_queries)
+    for label, filters in (('', {}), ('filtered_', {'difficulty': 'easy', 'problem_type': 'SQL'})):
+        approx_time = exact_time = 0.0
+        hits = total = 0
+        for row in query_rows:
+            start = time.perf_counter()
+            approx = index.search(data[row], n, exclude_id=str(row), **filters)
+            approx_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact = index.search_exact(data[row], n, exclude_id=str(row), **filters)
+            exact_time += time.perf_counter() - start
+
+            hits += len({i for i, _ in approx} & {i for i, _ in exact})
+            total += len(exact)
+        results[label + 'approx_ms'] = 1000 * approx_time / n_queries
+        results[label + 'exact_ms'] = 1000 * exact_time / n_queries
+        results[label + 'recall'] = hits / max(total, 1)
+    return results
+
+
+if __name__ == "__main__":
+    for size in (1000, 100000, 300000):
+        for noise in (0.3, 1.0):
+            print(benchmark(n_items=size, noise=noise))